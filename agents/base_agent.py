@@ -14,6 +14,10 @@ from strands.models import BedrockModel
 class BaseA2AAgent(ABC):
     """Base class for all A2A service agents"""
     
+    # Shared model/boto session source injected by the host (see set_model_provider); agents
+    # build their own Bedrock clients when none is set
+    model_provider = None
+    
     def __init__(self, port: int, name: str, description: str, host: str = "0.0.0.0",
                  model_id: Optional[str] = None, agent_id: Optional[str] = None, 
                  wallet_address: Optional[str] = None):
@@ -56,13 +60,22 @@ class BaseA2AAgent(ABC):
         """Get the system prompt for this agent"""
         pass
     
+    @classmethod
+    def set_model_provider(cls, provider):
+        """Share models across agents through provider.get_bedrock_model/get_boto_session(region_name=...)"""
+        BaseA2AAgent.model_provider = provider
+    
     def get_boto_session(self) -> boto3.Session:
-        """Get AWS session for Bedrock models"""
+        """Get AWS session for Bedrock models (shared when a model provider is set)"""
+        if self.model_provider is not None:
+            return self.model_provider.get_boto_session(region_name="us-east-1")
         return boto3.Session(region_name="us-east-1")
     
     def get_model(self):
-        """Get the Bedrock model for this agent"""
+        """Get the Bedrock model for this agent (shared when a model provider is set)"""
         if self.model_id:
+            if self.model_provider is not None:
+                return self.model_provider.get_bedrock_model(self.model_id, region_name="us-east-1")
             return BedrockModel(
                 model_id=self.model_id,
                 boto_session=self.get_boto_session()
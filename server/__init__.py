@@ -2,6 +2,14 @@
 KiloMarket Web Server Package
 """
 
-from .app import start_server_thread, stop_server, app
+__all__ = ['start_server_thread', 'stop_server', 'app']
 
-__all__ = ['start_server_thread', 'stop_server', 'app']
\ No newline at end of file
+
+def __getattr__(name):
+    # The app is imported on first use, so command-line tools in this package (server.loadtest,
+    # server.session_index) do not build the app and its session store in the working directory
+    if name in __all__:
+        from .app import start_server_thread, stop_server, app
+        globals().update(start_server_thread=start_server_thread, stop_server=stop_server, app=app)
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -7,22 +7,45 @@ import logging
 import threading
 import time
 import socket
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Callable
 from strands import Agent
 from strands.multiagent.a2a import A2AServer
 
 # Import specialized agents
 from agents import AgentRegistry, VibeCodingAgent, CryptoMarketAgent, ContractAuditAgent
+from agents.base_agent import BaseA2AAgent
+
+from .model_pool import model_pool
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Service agents share the server's pooled Bedrock models and boto3 sessions
+BaseA2AAgent.set_model_provider(model_pool)
+
+# Callbacks notified with (event, ports) when A2A servers start or stop
+_a2a_listeners: List[Callable[[str, List[int]], None]] = []
+
+def register_a2a_listener(callback: Callable[[str, List[int]], None]):
+    """Register a callback for A2A server start/stop events"""
+    if callback not in _a2a_listeners:
+        _a2a_listeners.append(callback)
+
+def _notify_a2a_listeners(event: str, ports: List[int]):
+    """Notify registered listeners of an A2A server event"""
+    for callback in list(_a2a_listeners):
+        try:
+            callback(event, ports)
+        except Exception as e:
+            logger.error(f"A2A listener error on {event}: {e}")
+
+
 class A2AServerInstance:
     """Individual A2A server instance"""
     
     def __init__(self, port: int, agent_name: str, agent_description: str, tools: list, host: str = "0.0.0.0", 
-                 wallet_address: str = None, agent_instance = None):
+                 wallet_address: str = None, agent_instance = None, model = None):
         self.port = port
         self.host = host
         self.agent_name = agent_name
@@ -30,6 +53,7 @@ class A2AServerInstance:
         self.tools = tools
         self.wallet_address = wallet_address
         self.agent_instance = agent_instance
+        self.model = model  # optional model for the generic agent (e.g. a stub in load tests)
         
         self.server: Optional[A2AServer] = None
         self.agent: Optional[Agent] = None
@@ -45,12 +69,15 @@ class A2AServerInstance:
             return self.agent_instance.create_agent()
         else:
             # Fallback to generic agent creation
-            return Agent(
-                name=self.agent_name,
-                description=self.agent_description,
-                tools=self.tools,
-                callback_handler=None
-            )
+            agent_kwargs = {
+                "name": self.agent_name,
+                "description": self.agent_description,
+                "tools": self.tools,
+                "callback_handler": None
+            }
+            if self.model is not None:
+                agent_kwargs["model"] = self.model
+            return Agent(**agent_kwargs)
     
     def start(self) -> tuple[bool, str]:
         """Start this server instance"""
@@ -313,6 +340,7 @@ class MultiA2AServerManager:
             
             # Check if at least one server started successfully
             successful_servers = sum(1 for s in self.servers if s.running)
+            _notify_a2a_listeners("started", [s.port for s in self.servers])
             if successful_servers > 0:
                 return True, f"Started {successful_servers}/{len(self.servers)} servers. " + "; ".join(results)
             else:
@@ -329,6 +357,8 @@ class MultiA2AServerManager:
                 success, message = server.stop()
                 results.append(f"Port {server.port}: {message}")
             
+            _notify_a2a_listeners("stopped", [s.port for s in self.servers])
+            
             return True, "All servers stopped. " + "; ".join(results)
     
     def _are_any_servers_running(self) -> bool:
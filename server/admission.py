@@ -0,0 +1,311 @@
+"""
+Admission control for KiloMarket model-backed requests
+Limits concurrent provider calls per provider and per model, with a bounded wait queue
+"""
+
+import asyncio
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict, List, Optional
+
+# Strands model base class, used by the admission-controlled model wrapper
+try:
+    from strands.models.model import Model
+except ImportError:
+    Model = object
+
+logger = logging.getLogger(__name__)
+
+# Limits (overridable per deployment)
+MAX_CONCURRENT_PER_PROVIDER = int(os.getenv("KILOMARKET_MAX_CONCURRENT_PER_PROVIDER", "16"))
+MAX_CONCURRENT_PER_MODEL = int(os.getenv("KILOMARKET_MAX_CONCURRENT_PER_MODEL", "8"))
+MAX_QUEUE_PER_MODEL = int(os.getenv("KILOMARKET_MAX_QUEUE_PER_MODEL", "32"))
+ADMISSION_TIMEOUT = float(os.getenv("KILOMARKET_ADMISSION_TIMEOUT", "30"))
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted (queue full or wait timed out)"""
+
+    def __init__(self, key: str, reason: str, retry_after: int):
+        super().__init__(f"{key} is at capacity ({reason}), retry after {retry_after}s")
+        self.key = key
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    """A queued request waiting for a slot"""
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.state = "waiting"  # waiting -> granted | abandoned
+        self.loop = loop
+        self.future: Optional[asyncio.Future] = loop.create_future() if loop else None
+        self.event: Optional[threading.Event] = None if loop else threading.Event()
+
+    def wake(self):
+        """Wake the waiter from any thread"""
+        if self.loop is not None:
+            future = self.future
+            self.loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+        else:
+            self.event.set()
+
+
+class ConcurrencyLimiter:
+    """Thread-safe limiter usable from any event loop or thread, with FIFO slot hand-off"""
+
+    def __init__(self, key: str, max_concurrent: int, max_queue: int):
+        self.key = key
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self._active = 0
+        self._waiters: deque = deque()
+        self._lock = threading.Lock()
+        self._avg_hold = 1.0
+        self._stats = {
+            "admitted": 0,
+            "rejected": 0,
+            "timeouts": 0,
+            "queued_total": 0,
+            "max_queue_depth": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0
+        }
+
+    def check(self):
+        """Fail fast if a new request would be rejected right now"""
+        with self._lock:
+            if self._active >= self.max_concurrent and len(self._waiters) >= self.max_queue:
+                self._stats["rejected"] += 1
+                raise AdmissionRejected(self.key, "queue full", self._retry_after_locked())
+
+    async def acquire(self, timeout: float = ADMISSION_TIMEOUT):
+        """Acquire a slot from async code"""
+        waiter = self._enter(asyncio.get_running_loop())
+        if waiter is None:
+            return
+
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter.future, timeout)
+        except asyncio.TimeoutError:
+            self._abandon(waiter, timed_out=True)
+        except asyncio.CancelledError:
+            if self._abandon(waiter, timed_out=False):
+                # The slot was handed to us just as we were cancelled - give it back
+                self.release()
+            raise
+        self._record_wait(time.monotonic() - started)
+
+    def acquire_sync(self, timeout: float = ADMISSION_TIMEOUT):
+        """Acquire a slot from a worker thread"""
+        waiter = self._enter(None)
+        if waiter is None:
+            return
+
+        started = time.monotonic()
+        if not waiter.event.wait(timeout):
+            self._abandon(waiter, timed_out=True)
+        self._record_wait(time.monotonic() - started)
+
+    def release(self, held_seconds: Optional[float] = None):
+        """Release a slot, handing it to the next waiter if any"""
+        with self._lock:
+            if held_seconds is not None:
+                self._avg_hold = 0.8 * self._avg_hold + 0.2 * held_seconds
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if waiter.state == "waiting":
+                    waiter.state = "granted"
+                    waiter.wake()
+                    return
+            self._active = max(0, self._active - 1)
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get limiter metrics"""
+        with self._lock:
+            admitted = self._stats["admitted"]
+            return {
+                "active": self._active,
+                "queued": len(self._waiters),
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "avg_hold_seconds": round(self._avg_hold, 3),
+                "avg_wait_seconds": round(self._stats["total_wait_seconds"] / admitted, 4) if admitted else 0.0,
+                **self._stats
+            }
+
+    def _enter(self, loop: Optional[asyncio.AbstractEventLoop]) -> Optional[_Waiter]:
+        """Take a free slot (returns None) or join the queue (returns the waiter)"""
+        with self._lock:
+            if self._active < self.max_concurrent and not self._waiters:
+                self._active += 1
+                self._stats["admitted"] += 1
+                return None
+            if len(self._waiters) >= self.max_queue:
+                self._stats["rejected"] += 1
+                raise AdmissionRejected(self.key, "queue full", self._retry_after_locked())
+
+            waiter = _Waiter(loop)
+            self._waiters.append(waiter)
+            self._stats["queued_total"] += 1
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], len(self._waiters))
+            return waiter
+
+    def _abandon(self, waiter: _Waiter, timed_out: bool) -> bool:
+        """Leave the queue; returns True if the slot had already been granted"""
+        with self._lock:
+            if waiter.state == "granted":
+                return True
+            waiter.state = "abandoned"
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+            if timed_out:
+                self._stats["timeouts"] += 1
+                self._stats["rejected"] += 1
+                raise AdmissionRejected(self.key, "wait timed out", self._retry_after_locked())
+            return False
+
+    def _record_wait(self, waited: float):
+        with self._lock:
+            self._stats["admitted"] += 1
+            self._stats["total_wait_seconds"] += waited
+            self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+
+    def _retry_after_locked(self) -> int:
+        """Estimate seconds until a slot frees up, from the average hold time and queue depth"""
+        estimate = self._avg_hold * (len(self._waiters) + 1) / self.max_concurrent
+        return max(1, math.ceil(estimate))
+
+
+class AdmissionController:
+    """Per-provider and per-model limiters for model-backed requests"""
+
+    def __init__(self, max_per_provider: int = MAX_CONCURRENT_PER_PROVIDER,
+                 max_per_model: int = MAX_CONCURRENT_PER_MODEL,
+                 max_queue: int = MAX_QUEUE_PER_MODEL, timeout: float = ADMISSION_TIMEOUT):
+        self.max_per_provider = max_per_provider
+        self.max_per_model = max_per_model
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._limiters: Dict[str, ConcurrencyLimiter] = {}
+        self._lock = threading.Lock()
+
+    def limiters_for(self, provider: str, model_id: Optional[str]) -> List[ConcurrencyLimiter]:
+        """Get the limiters a request must pass, in acquisition order
+
+        The model limiter comes first so a request queued behind a saturated model does not
+        hold a provider slot that sibling models on the same provider could use.
+        """
+        keys = []
+        if model_id:
+            keys.append((f"model:{provider}/{model_id}", self.max_per_model))
+        keys.append((f"provider:{provider}", self.max_per_provider))
+
+        limiters = []
+        with self._lock:
+            for key, limit in keys:
+                limiter = self._limiters.get(key)
+                if limiter is None:
+                    limiter = ConcurrencyLimiter(key, limit, self.max_queue)
+                    self._limiters[key] = limiter
+                limiters.append(limiter)
+        return limiters
+
+    def check(self, provider: str, model_id: Optional[str] = None):
+        """Raise AdmissionRejected if a request for this provider/model would be turned away"""
+        for limiter in self.limiters_for(provider, model_id):
+            limiter.check()
+
+    @asynccontextmanager
+    async def slot(self, provider: str, model_id: Optional[str] = None):
+        """Hold a provider/model slot for the duration of an async block"""
+        held = []
+        started = None
+        try:
+            for limiter in self.limiters_for(provider, model_id):
+                await limiter.acquire(self.timeout)
+                held.append(limiter)
+            started = time.monotonic()
+            yield
+        finally:
+            elapsed = time.monotonic() - started if started is not None else None
+            for limiter in reversed(held):
+                limiter.release(elapsed)
+
+    @contextmanager
+    def slot_sync(self, provider: str, model_id: Optional[str] = None):
+        """Hold a provider/model slot for the duration of a blocking block"""
+        held = []
+        started = None
+        try:
+            for limiter in self.limiters_for(provider, model_id):
+                limiter.acquire_sync(self.timeout)
+                held.append(limiter)
+            started = time.monotonic()
+            yield
+        finally:
+            elapsed = time.monotonic() - started if started is not None else None
+            for limiter in reversed(held):
+                limiter.release(elapsed)
+
+    def wrap_model(self, model: Any, provider: str, model_id: Optional[str]) -> Any:
+        """Wrap a Strands model so every provider call passes admission control"""
+        if model is None or isinstance(model, AdmissionControlledModel):
+            return model
+        return AdmissionControlledModel(model, provider, model_id, self)
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get queue depth and wait-time metrics for every limiter"""
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {
+            "max_per_provider": self.max_per_provider,
+            "max_per_model": self.max_per_model,
+            "max_queue": self.max_queue,
+            "timeout_seconds": self.timeout,
+            "limiters": {key: limiter.get_status() for key, limiter in limiters.items()}
+        }
+
+
+class AdmissionControlledModel(Model):
+    """Strands model wrapper that holds an admission slot while the provider is streaming"""
+
+    def __init__(self, model: Any, provider: str, model_id: Optional[str], controller: AdmissionController):
+        self._model = model
+        self._provider = provider
+        self._model_id = model_id
+        self._controller = controller
+
+    def update_config(self, **model_config):
+        return self._model.update_config(**model_config)
+
+    def get_config(self):
+        return self._model.get_config()
+
+    async def structured_output(self, output_model, prompt, system_prompt=None, **kwargs):
+        async with self._controller.slot(self._provider, self._model_id):
+            async for event in self._model.structured_output(output_model, prompt, system_prompt=system_prompt, **kwargs):
+                yield event
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs):
+        async with self._controller.slot(self._provider, self._model_id):
+            async for event in self._model.stream(messages, tool_specs, system_prompt, **kwargs):
+                yield event
+
+    def __getattr__(self, name):
+        # Delegate everything else (config, client, ...) to the wrapped model
+        if name == "_model":
+            raise AttributeError(name)
+        return getattr(self._model, name)
+
+
+# Global admission controller instance
+admission_controller = AdmissionController()
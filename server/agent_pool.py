@@ -0,0 +1,244 @@
+"""
+Agent pool for KiloMarket Interactive Mode
+Keeps warm Strands agents alive across chat turns, keyed by session
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Pool limits (overridable per deployment)
+DEFAULT_MAX_RESIDENT = int(os.getenv("KILOMARKET_AGENT_POOL_MAX_RESIDENT", "32"))
+DEFAULT_IDLE_TIMEOUT = float(os.getenv("KILOMARKET_AGENT_POOL_IDLE_TIMEOUT", "900"))
+
+
+class PooledAgent:
+    """A warm agent held by the pool"""
+
+    def __init__(self, agent: Any, fingerprint: str):
+        self.agent = agent
+        self.fingerprint = fingerprint
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.in_use = False
+        self.turns = 0
+
+
+class AgentPool:
+    """Session-keyed pool of warm interactive agents with idle-timeout and LRU eviction"""
+
+    def __init__(self, max_resident: int = DEFAULT_MAX_RESIDENT, idle_timeout: float = DEFAULT_IDLE_TIMEOUT):
+        self.max_resident = max_resident
+        self.idle_timeout = idle_timeout
+        self._entries: "OrderedDict[str, PooledAgent]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._reaper: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0, "transient": 0}
+
+    @staticmethod
+    def fingerprint(session_data: Dict[str, Any], a2a_status: Optional[dict] = None) -> str:
+        """Fingerprint the inputs an agent is built from (provider config, conversation manager and A2A servers)"""
+        running_ports = []
+        if a2a_status:
+            running_ports = sorted(
+                server.get("port") for server in a2a_status.get("servers", []) if server.get("running", False)
+            )
+        payload = {
+            "ai_provider": session_data.get("ai_provider", {}),
+            "conversation_manager": session_data.get("conversation_manager"),
+            "a2a_ports": running_ports
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def acquire(self, session_id: str, session_data: Dict[str, Any], a2a_status: Optional[dict],
+                factory: Callable[[], Any]) -> Any:
+        """Lease the warm agent for a session, building one with factory() if needed"""
+        self._ensure_reaper()
+        fingerprint = self.fingerprint(session_data, a2a_status)
+        stale: List[Any] = []
+        busy = False
+
+        with self._lock:
+            stale.extend(self._collect_idle_locked())
+            entry = self._entries.get(session_id)
+            if entry is not None and entry.fingerprint != fingerprint:
+                # Provider config or A2A topology changed - the warm agent is no longer valid
+                self._entries.pop(session_id)
+                self._stats["invalidations"] += 1
+                if not entry.in_use:
+                    stale.append(entry.agent)
+                entry = None
+            if entry is not None:
+                if entry.in_use:
+                    busy = True
+                else:
+                    entry.in_use = True
+                    entry.last_used = time.time()
+                    entry.turns += 1
+                    self._entries.move_to_end(session_id)
+                    self._stats["hits"] += 1
+                    self._dispose_all(stale)
+                    logger.info(f"Reusing warm agent for session {session_id} (turn {entry.turns})")
+                    return entry.agent
+
+        self._dispose_all(stale)
+
+        # Build outside the lock - agent setup is slow
+        agent = factory()
+
+        with self._lock:
+            if busy or session_id in self._entries:
+                # Another turn on this session holds the warm agent; serve this one un-pooled
+                self._stats["transient"] += 1
+                logger.info(f"Session {session_id} agent busy, using transient agent")
+                return agent
+
+            entry = PooledAgent(agent, fingerprint)
+            entry.in_use = True
+            entry.turns = 1
+            self._entries[session_id] = entry
+            self._stats["misses"] += 1
+            stale = self._collect_overflow_locked()
+
+        self._dispose_all(stale)
+        logger.info(f"Pooled new agent for session {session_id} ({len(self._entries)} resident)")
+        return agent
+
+    def release(self, session_id: str, agent: Any):
+        """Return a leased agent to the pool; agents the pool does not own are cleaned up"""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None and entry.agent is agent:
+                entry.in_use = False
+                entry.last_used = time.time()
+                self._entries.move_to_end(session_id)
+                stale = self._collect_overflow_locked()
+            else:
+                stale = [agent]
+
+        self._dispose_all(stale)
+
+    def invalidate(self, session_id: str) -> bool:
+        """Drop the warm agent for a session (e.g. when the session is deleted)"""
+        with self._lock:
+            entry = self._entries.pop(session_id, None)
+            if entry is None:
+                return False
+            self._stats["invalidations"] += 1
+
+        if not entry.in_use:
+            self._dispose(entry.agent)
+        return True
+
+    def is_resident(self, session_id: str) -> bool:
+        """Whether the session has a warm (possibly leased) agent"""
+        with self._lock:
+            return session_id in self._entries
+
+    def clear(self):
+        """Drop every idle warm agent; leased agents are cleaned up on release"""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+
+        self._dispose_all([entry.agent for entry in entries if not entry.in_use])
+
+    def evict_idle(self) -> int:
+        """Evict agents idle for longer than the idle timeout"""
+        with self._lock:
+            stale = self._collect_idle_locked()
+
+        self._dispose_all(stale)
+        return len(stale)
+
+    def shutdown(self):
+        """Stop the reaper thread and drop all warm agents"""
+        self._stop_event.set()
+        self.clear()
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get pool status and counters"""
+        with self._lock:
+            return {
+                "resident": len(self._entries),
+                "in_use": sum(1 for entry in self._entries.values() if entry.in_use),
+                "max_resident": self.max_resident,
+                "idle_timeout_seconds": self.idle_timeout,
+                **self._stats
+            }
+
+    def _collect_idle_locked(self) -> List[Any]:
+        """Remove idle entries (caller holds the lock) and return their agents"""
+        if self.idle_timeout <= 0:
+            return []
+
+        cutoff = time.time() - self.idle_timeout
+        expired = [
+            session_id for session_id, entry in self._entries.items()
+            if not entry.in_use and entry.last_used < cutoff
+        ]
+        stale = []
+        for session_id in expired:
+            stale.append(self._entries.pop(session_id).agent)
+            self._stats["evictions"] += 1
+            logger.info(f"Evicted idle agent for session {session_id}")
+        return stale
+
+    def _collect_overflow_locked(self) -> List[Any]:
+        """Remove least recently used idle entries above the resident cap (caller holds the lock)"""
+        stale = []
+        while len(self._entries) > self.max_resident:
+            victim = next((sid for sid, entry in self._entries.items() if not entry.in_use), None)
+            if victim is None:
+                # Every resident agent is mid-turn; allow a temporary overflow
+                break
+            stale.append(self._entries.pop(victim).agent)
+            self._stats["evictions"] += 1
+            logger.info(f"Evicted least recently used agent for session {victim}")
+        return stale
+
+    def _ensure_reaper(self):
+        """Start the background idle reaper on first use"""
+        if self._reaper is not None or self.idle_timeout <= 0:
+            return
+
+        def reap():
+            interval = max(self.idle_timeout / 4, 1.0)
+            while not self._stop_event.wait(interval):
+                try:
+                    self.evict_idle()
+                except Exception as e:
+                    logger.error(f"Agent pool reaper error: {e}")
+
+        with self._lock:
+            if self._reaper is not None:
+                return
+            self._reaper = threading.Thread(target=reap, name="agent-pool-reaper", daemon=True)
+            self._reaper.start()
+
+    def _dispose_all(self, agents: List[Any]):
+        """Clean up a batch of agents"""
+        for agent in agents:
+            self._dispose(agent)
+
+    @staticmethod
+    def _dispose(agent: Any):
+        """Release resources held by an agent"""
+        try:
+            if hasattr(agent, 'cleanup'):
+                agent.cleanup()
+        except Exception as e:
+            logger.error(f"Error cleaning up pooled agent: {e}")
+
+
+# Global agent pool instance
+agent_pool = AgentPool()
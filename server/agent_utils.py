@@ -4,26 +4,18 @@ Handles StrandsAgents SDK integration for interactive sessions
 """
 
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 # Try to import strands components, but handle gracefully if not available
 STRANDS_AVAILABLE = False
 Agent = None
 SlidingWindowConversationManager = None
 FileSessionManager = None
-BedrockModel = None
-AnthropicModel = None
-GeminiModel = None
-OpenAIModel = None
 
 try:
     from strands import Agent
     from strands.agent.conversation_manager import SlidingWindowConversationManager
     from strands.session.file_session_manager import FileSessionManager
-    from strands.models import BedrockModel
-    from strands.models.anthropic import AnthropicModel
-    from strands.models.gemini import GeminiModel
-    from strands.models.openai import OpenAIModel
     STRANDS_AVAILABLE = True
 except ImportError as e:
     logging.warning(f"StrandsAgents not available: {e}. Agent functionality will be limited.")
@@ -36,15 +28,24 @@ logger = logging.getLogger(__name__)
 # Global registry for MCP clients (to avoid JSON serialization issues)
 _mcp_client_registry = {}
 
-def create_conversation_manager() -> SlidingWindowConversationManager:
-    """Create conversation manager with fixed settings for all agents"""
+def create_conversation_manager(settings: Optional[Dict[str, Any]] = None):
+    """Create the conversation manager selected for a session (token-budgeted summarizing by default)"""
     if not STRANDS_AVAILABLE:
         raise ImportError("StrandsAgents SDK is not available. Please install strands-agents package.")
     
-    return SlidingWindowConversationManager(
-        window_size=15,  # Fixed window size
-        should_truncate_results=True  # Fixed truncation setting
+    from .conversation_manager import (
+        TokenBudgetConversationManager, resolve_conversation_settings,
+        STRATEGY_SLIDING_WINDOW, SLIDING_WINDOW_SIZE
     )
+    settings = resolve_conversation_settings(settings)
+    
+    if settings["strategy"] == STRATEGY_SLIDING_WINDOW:
+        return SlidingWindowConversationManager(
+            window_size=SLIDING_WINDOW_SIZE,
+            should_truncate_results=True
+        )
+    
+    return TokenBudgetConversationManager(token_budget=settings["token_budget"])
 
 def get_kilomarket_system_prompt(a2a_available: bool = False) -> str:
     """Get KiloMarket System Prompt with A2A awareness"""
@@ -145,8 +146,8 @@ def initialize_strands_agent(session_data: Dict[str, Any], session_id: str, stra
     agent_logger = logging.getLogger(f"strands.{session_id}")
     agent_logger.setLevel(logging.DEBUG)
     
-    # Create conversation manager with fixed settings
-    conversation_manager = create_conversation_manager()
+    # Create the conversation manager chosen for this session
+    conversation_manager = create_conversation_manager(session_data.get('conversation_manager'))
     
     # Create agent state (no sensitive data in session state)
     sanitized_config = {}
@@ -183,141 +184,33 @@ def initialize_strands_agent(session_data: Dict[str, Any], session_id: str, stra
         logger.warning(f"Failed to load MCP tools: {e}")
         _mcp_client_registry[session_id] = {}
     
-    # Initialize agent based on provider
-    if ai_provider == "anthropic":
-        api_key = config.get('api_key')
-        if not api_key:
-            raise ValueError("API key is required for Anthropic provider")
-        
-        model_id = config.get('model_id', 'claude-sonnet-4-5-20250929')
-        max_tokens = config.get('max_tokens', 4096)
-        
-        model = AnthropicModel(
-            client_args={"api_key": api_key},
-            model_id=model_id,
-            max_tokens=max_tokens
-        )
-        
-        # Create KiloMarket agent
-        kilomarket_agent = Agent(
-            name="kilomarket_interactive_agent",
-            agent_id=f"kilomarket_agent_{session_id}",
-            tools=additional_tools,  # Include MCP tools
-            model=model,
-            session_manager=strands_session_manager,
-            conversation_manager=conversation_manager,
-            callback_handler=None,
-            state=agent_state,
-            system_prompt=system_prompt
-        )
-        
-        logger.info(f"Initialized Anthropic agent: {model_id}")
-        return kilomarket_agent, session_id
+    # Get a shared model client for this provider configuration
+    from .model_pool import model_pool
+    model = model_pool.get_model(ai_provider, config)
     
-    elif ai_provider == "openai_compatible":
-        api_key = config.get('api_key')
-        if not api_key:
-            raise ValueError("API key is required for OpenAI Compatible provider")
-        
-        model_id = config.get('model_id', 'gpt-4o')
-        base_url = config.get('base_url')
-        max_tokens = config.get('max_tokens', 4000)
-        temperature = config.get('temperature', 0.7)
-        
-        client_args = {"api_key": api_key}
-        if base_url:
-            client_args["base_url"] = base_url
-        
-        model = OpenAIModel(
-            client_args=client_args,
-            model_id=model_id,
-            params={
-                "max_tokens": max_tokens,
-                "temperature": temperature
-            }
-        )
-        
-        # Create KiloMarket agent
-        kilomarket_agent = Agent(
-            name="kilomarket_interactive_agent",
-            agent_id=f"kilomarket_agent_{session_id}",
-            tools=additional_tools,  # Include MCP tools
-            model=model,
-            session_manager=strands_session_manager,
-            conversation_manager=conversation_manager,
-            callback_handler=None,
-            state=agent_state,
-            system_prompt=system_prompt
-        )
-        
-        logger.info(f"Initialized OpenAI Compatible agent: {model_id} (base_url: {base_url or 'default'})")
-        return kilomarket_agent, session_id
+    agent_kwargs = {
+        "name": "kilomarket_interactive_agent",
+        "agent_id": f"kilomarket_agent_{session_id}",
+        "tools": additional_tools,  # Include MCP tools
+        "model": model,
+        "session_manager": strands_session_manager,
+        "conversation_manager": conversation_manager,
+        "callback_handler": None,
+        "state": agent_state,
+        "system_prompt": system_prompt
+    }
     
-    elif ai_provider == "amazon_bedrock":
-        import boto3
-        
-        model_id = config.get('model_id', 'us.anthropic.claude-sonnet-4-5-20250929-v1:0')
-        region_name = config.get('region_name', 'us-east-1')
-        
-        boto_session = boto3.Session(region_name=region_name)
-        model = BedrockModel(model_id=model_id, boto_session=boto_session)
-        
-        # Create KiloMarket agent
-        kilomarket_agent = Agent(
-            name="kilomarket_interactive_agent",
-            agent_id=f"kilomarket_agent_{session_id}",
-            tools=additional_tools,  # Include MCP tools
-            model=model,
-            session_manager=strands_session_manager,
-            conversation_manager=conversation_manager,
-            callback_handler=None,
-            state=agent_state,
-            system_prompt=system_prompt
-        )
-        
-        logger.info(f"Initialized Amazon Bedrock agent: {model_id} in {region_name}")
-        return kilomarket_agent, session_id
+    # Run independent tool calls from one turn concurrently (payment tools stay sequential)
+    from .tool_executor import create_tool_executor
+    tool_executor = create_tool_executor()
+    if tool_executor is not None:
+        agent_kwargs["tool_executor"] = tool_executor
     
-    elif ai_provider == "gemini":
-        api_key = config.get('api_key')
-        if not api_key:
-            raise ValueError("API key is required for Gemini provider")
-        
-        model_id = config.get('model_id', 'gemini-2.5-flash')
-        max_output_tokens = config.get('max_output_tokens', 2048)
-        temperature = config.get('temperature', 0.7)
-        top_p = config.get('top_p', 0.9)
-        top_k = config.get('top_k', 40)
-        
-        model = GeminiModel(
-            client_args={"api_key": api_key},
-            model_id=model_id,
-            params={
-                "temperature": temperature,
-                "max_output_tokens": max_output_tokens,
-                "top_p": top_p,
-                "top_k": top_k
-            }
-        )
-        
-        # Create KiloMarket agent
-        kilomarket_agent = Agent(
-            name="kilomarket_interactive_agent",
-            agent_id=f"kilomarket_agent_{session_id}",
-            tools=additional_tools,  # Include MCP tools
-            model=model,
-            session_manager=strands_session_manager,
-            conversation_manager=conversation_manager,
-            callback_handler=None,
-            state=agent_state,
-            system_prompt=system_prompt
-        )
-        
-        logger.info(f"Initialized Gemini agent: {model_id}")
-        return kilomarket_agent, session_id
+    # Create KiloMarket agent
+    kilomarket_agent = Agent(**agent_kwargs)
     
-    else:
-        raise ValueError(f"Unsupported AI provider: {ai_provider}")
+    logger.info(f"Initialized {ai_provider} agent: {config.get('model_id', 'default model')}")
+    return kilomarket_agent, session_id
 
 def cleanup_agent_resources(agent_instance: Agent):
     """Clean up resources associated with an agent"""
@@ -352,3 +245,45 @@ def cleanup_agent_resources(agent_instance: Agent):
         logger.info("Agent resources cleaned up successfully")
     except Exception as e:
         logger.error(f"Error during agent cleanup: {e}")
+
+def repair_interrupted_conversation(agent_instance: Agent, reason: str = "Response cancelled"):
+    """Close out a conversation whose turn was cancelled mid-flight so the next turn is valid"""
+    messages = getattr(agent_instance, 'messages', None)
+    if not messages:
+        return
+    
+    repair_messages = []
+    last_message = messages[-1]
+    
+    # Tool calls that never got results need an (error) result for every toolUse
+    if last_message.get('role') == 'assistant':
+        tool_uses = [item['toolUse'] for item in last_message.get('content', []) if 'toolUse' in item]
+        if not tool_uses:
+            return
+        repair_messages.append({
+            "role": "user",
+            "content": [
+                {
+                    "toolResult": {
+                        "toolUseId": tool_use.get('toolUseId'),
+                        "status": "error",
+                        "content": [{"text": reason}]
+                    }
+                }
+                for tool_use in tool_uses
+            ]
+        })
+    
+    # Conversations must alternate roles - answer the dangling user message
+    repair_messages.append({"role": "assistant", "content": [{"text": f"({reason})"}]})
+    
+    strands_session_manager = getattr(agent_instance, '_session_manager', None)
+    for message in repair_messages:
+        messages.append(message)
+        if strands_session_manager is not None:
+            try:
+                strands_session_manager.append_message(message, agent_instance)
+            except Exception as e:
+                logger.error(f"Error persisting repaired message: {e}")
+    
+    logger.info(f"Repaired interrupted conversation with {len(repair_messages)} message(s)")
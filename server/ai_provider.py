@@ -64,6 +64,8 @@ class AIProviderManager:
                 if field not in config or not config[field]:
                     raise ValueError(f"Missing required field: {field}")
             
+            previous_provider = settings.get("ai_provider", {}).get("provider")
+            
             # Save configuration
             settings["ai_provider"] = {
                 "enabled": True,
@@ -71,7 +73,10 @@ class AIProviderManager:
                 "config": config
             }
             
-            return settings_manager.save_settings(settings)
+            saved = settings_manager.save_settings(settings)
+            if saved:
+                self._evict_model_clients(previous_provider, provider)
+            return saved
         except Exception as e:
             print(f"Error configuring AI provider: {e}")
             return False
@@ -96,13 +101,26 @@ class AIProviderManager:
             from .settings import settings_manager
             
             settings = settings_manager.load_settings()
+            previous_provider = settings.get("ai_provider", {}).get("provider")
             settings["ai_provider"] = {"enabled": False}
             
-            return settings_manager.save_settings(settings)
+            saved = settings_manager.save_settings(settings)
+            if saved:
+                self._evict_model_clients(previous_provider)
+            return saved
         except Exception as e:
             print(f"Error clearing AI provider: {e}")
             return False
 
+    def _evict_model_clients(self, *providers: Optional[str]):
+        """Drop pooled model clients built from a provider configuration that changed"""
+        try:
+            from .model_pool import model_pool
+            for provider in {p for p in providers if p}:
+                model_pool.evict(provider)
+        except Exception as e:
+            print(f"Error evicting model clients: {e}")
+
 # Global AI provider manager instance
 ai_provider_manager = AIProviderManager()
 
@@ -111,7 +129,8 @@ AI_PROVIDERS = [
     {"id": "amazon_bedrock", "name": "Amazon Bedrock"},
     {"id": "anthropic", "name": "Anthropic"},
     {"id": "gemini", "name": "Gemini"},
-    {"id": "openai_compatible", "name": "OpenAI Compatible"}
+    {"id": "openai_compatible", "name": "OpenAI Compatible"},
+    {"id": "replay", "name": "Replay (Recorded Streams)"}
 ]
 
 # Provider configuration specifications (simplified from tradearena-cc)
@@ -152,5 +171,19 @@ PROVIDER_CONFIGS = {
         "placeholders": {
             "base_url": "Leave blank for OpenAI server"
         }
+    },
+    "replay": {
+        "fields": ["recording_file", "mode", "speed"],
+        "defaults": {
+            "mode": "realtime",
+            "speed": "10"
+        },
+        "credentials_type": "none",
+        "display_name": "Replay (Recorded Streams)",
+        "placeholders": {
+            "recording_file": "Recorded .jsonl file, relative to KILOMARKET_RECORD_DIR",
+            "mode": "realtime, accelerated or instant",
+            "speed": "Speed-up factor for accelerated mode"
+        }
     }
 }
\ No newline at end of file
@@ -4,6 +4,7 @@ Provides HTML interface and API endpoints for configuration and monitoring
 """
 
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
@@ -14,12 +15,36 @@ from typing import Dict, Any
 from .routes import setup_routes
 from .settings import settings_manager
 from .ai_provider import ai_provider_manager
+from .blocking import loop_lag_monitor, shutdown_blocking_pool
+from .agent_pool import agent_pool
+from .batch_jobs import batch_job_manager
+from .session_maintenance import metadata_flusher, counter_verifier, session_archiver, retention_sweeper
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop background monitors with the server"""
+    loop_lag_monitor.start()
+    metadata_flusher.start()
+    counter_verifier.start()
+    session_archiver.start()
+    retention_sweeper.start()
+    yield
+    retention_sweeper.stop()
+    session_archiver.stop()
+    counter_verifier.stop()
+    batch_job_manager.shutdown()
+    # Warm agents hold MCP client processes; stop them with the reaper once batch workers are done
+    agent_pool.shutdown()
+    metadata_flusher.stop()
+    loop_lag_monitor.stop()
+    shutdown_blocking_pool()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="KiloMarket Web Terminal",
     description="Web terminal for KiloMarket",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -0,0 +1,293 @@
+"""
+Batch chat jobs for KiloMarket Interactive Mode
+Runs JSONL prompt batches on a bounded worker pool that reuses warm agents and model clients
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from .agent_pool import agent_pool
+from .blocking import run_blocking
+from .chat_events import TurnEventTracker
+
+logger = logging.getLogger(__name__)
+
+# Worker pool and retention settings (overridable per deployment)
+BATCH_WORKERS = int(os.getenv("KILOMARKET_BATCH_WORKERS", "4"))
+BATCH_MAX_ITEMS = int(os.getenv("KILOMARKET_BATCH_MAX_ITEMS", "1000"))
+BATCH_ITEM_TIMEOUT = float(os.getenv("KILOMARKET_BATCH_ITEM_TIMEOUT", "300"))
+BATCH_MAX_JOBS = int(os.getenv("KILOMARKET_BATCH_MAX_JOBS", "50"))
+
+# Job states
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATES = {JOB_COMPLETED, JOB_CANCELLED}
+
+
+def parse_jsonl_prompts(text: str) -> List[Dict[str, Any]]:
+    """Parse JSONL batch input: one {"prompt": ..., "id": optional} object (or bare string) per line"""
+    items = []
+    for line_number, line in enumerate(text.splitlines(), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Line {line_number}: invalid JSON ({e.msg})")
+
+        if isinstance(record, str):
+            record = {"prompt": record}
+        if not isinstance(record, dict) or not isinstance(record.get("prompt"), str) or not record["prompt"].strip():
+            raise ValueError(f"Line {line_number}: expected an object with a non-empty \"prompt\"")
+
+        items.append({
+            "index": len(items),
+            "id": record.get("id", len(items)),
+            "prompt": record["prompt"]
+        })
+
+    if not items:
+        raise ValueError("Batch contains no prompts")
+    if len(items) > BATCH_MAX_ITEMS:
+        raise ValueError(f"Batch has {len(items)} prompts, the limit is {BATCH_MAX_ITEMS}")
+    return items
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class BatchJob:
+    """One submitted batch: its items, per-item results and aggregate metrics"""
+
+    def __init__(self, items: List[Dict[str, Any]], session_data: Dict[str, Any], a2a_status: Optional[dict]):
+        self.job_id = str(uuid.uuid4())
+        self.items = items
+        self.session_data = session_data
+        self.a2a_status = a2a_status
+        self.status = JOB_QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.results: List[Dict[str, Any]] = []  # in completion order
+        self._changed = asyncio.Condition()
+
+    @property
+    def done_count(self) -> int:
+        return len(self.results)
+
+    async def add_result(self, result: Dict[str, Any]):
+        """Record an item result and wake result streams"""
+        async with self._changed:
+            self.results.append(result)
+            if self.done_count >= len(self.items) and self.status not in FINISHED_STATES:
+                self.status = JOB_COMPLETED
+                self.finished_at = time.time()
+            self._changed.notify_all()
+
+    async def cancel(self) -> bool:
+        """Stop dispatching further items; items already running finish normally"""
+        async with self._changed:
+            if self.status in FINISHED_STATES:
+                return False
+            self.status = JOB_CANCELLED
+            self.finished_at = time.time()
+            self._changed.notify_all()
+            return True
+
+    async def stream_results(self, follow: bool = True) -> AsyncIterator[str]:
+        """Yield results as JSONL lines, optionally waiting for items still in flight"""
+        sent = 0
+        while True:
+            async with self._changed:
+                while follow and sent >= len(self.results) and self.status not in FINISHED_STATES:
+                    await self._changed.wait()
+                pending = self.results[sent:]
+                finished = self.status in FINISHED_STATES
+            for result in pending:
+                yield json.dumps(result, default=str, ensure_ascii=False) + "\n"
+            sent += len(pending)
+            if not follow or (finished and sent >= len(self.results)):
+                return
+
+    def get_status(self) -> Dict[str, Any]:
+        """Job progress with latency percentiles and throughput"""
+        latencies = [r["latency_ms"] for r in self.results if r.get("latency_ms") is not None]
+        ttfts = [r["first_token_ms"] for r in self.results if r.get("first_token_ms") is not None]
+        failed = sum(1 for r in self.results if r["status"] != "completed")
+        output_tokens = sum(r.get("output_tokens", 0) or 0 for r in self.results)
+
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "total_items": len(self.items),
+            "completed_items": self.done_count - failed,
+            "failed_items": failed,
+            "elapsed_seconds": round(elapsed, 3) if elapsed is not None else None,
+            "throughput_items_per_second": round(self.done_count / elapsed, 3) if elapsed else None,
+            "throughput_output_tokens_per_second": round(output_tokens / elapsed, 1) if elapsed else None,
+            "latency_ms": {
+                "avg": round(sum(latencies) / len(latencies), 1) if latencies else None,
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "p99": percentile(latencies, 99)
+            },
+            "first_token_ms": {
+                "p50": percentile(ttfts, 50),
+                "p95": percentile(ttfts, 95)
+            }
+        }
+
+
+class BatchJobManager:
+    """Queues batch items onto a fixed set of workers, each leasing its own warm agent"""
+
+    def __init__(self, workers: int = BATCH_WORKERS, max_jobs: int = BATCH_MAX_JOBS):
+        self.workers = max(1, workers)
+        self.max_jobs = max(1, max_jobs)
+        self._jobs: "OrderedDict[str, BatchJob]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def submit(self, items: List[Dict[str, Any]], session_data: Dict[str, Any],
+               a2a_status: Optional[dict] = None) -> BatchJob:
+        """Create a job and queue its items (must be called on the server's event loop)"""
+        self._ensure_workers()
+        job = BatchJob(items, session_data, a2a_status)
+        self._jobs[job.job_id] = job
+        self._prune_jobs()
+        for item in items:
+            self._queue.put_nowait((job, item))
+        logger.info(f"Queued batch job {job.job_id} with {len(items)} prompt(s)")
+        return job
+
+    def get_job(self, job_id: str) -> Optional[BatchJob]:
+        return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        return [job.get_status() for job in reversed(self._jobs.values())]
+
+    def get_status(self) -> Dict[str, Any]:
+        """Worker pool status"""
+        return {
+            "workers": self.workers,
+            "workers_running": sum(1 for task in self._tasks if not task.done()),
+            "queued_items": self._queue.qsize() if self._queue else 0,
+            "jobs": len(self._jobs),
+            "active_jobs": sum(1 for job in self._jobs.values() if job.status not in FINISHED_STATES)
+        }
+
+    def shutdown(self):
+        """Stop the workers (queued items are dropped with the process)"""
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        self._queue = None
+
+    def _ensure_workers(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if not self._tasks:
+            loop = asyncio.get_running_loop()
+            self._tasks = [loop.create_task(self._worker(n)) for n in range(self.workers)]
+
+    def _prune_jobs(self):
+        """Forget the oldest finished jobs beyond the retention limit"""
+        while len(self._jobs) > self.max_jobs:
+            victim = next((job_id for job_id, job in self._jobs.items() if job.status in FINISHED_STATES), None)
+            if victim is None:
+                break
+            self._jobs.pop(victim)
+
+    async def _worker(self, worker_number: int):
+        # Each worker owns one pool key, so its agent (and MCP clients) stay warm across items and jobs
+        pool_key = f"batch-worker-{worker_number}"
+        while True:
+            job, item = await self._queue.get()
+            try:
+                if job.status == JOB_CANCELLED:
+                    continue
+                if job.status == JOB_QUEUED:
+                    job.status = JOB_RUNNING
+                    job.started_at = time.time()
+                await job.add_result(await self._run_item(pool_key, job, item))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Batch worker {worker_number} failed on job {job.job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run_item(self, pool_key: str, job: BatchJob, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Run one prompt on a fresh conversation and return its result record"""
+        from .agent_utils import initialize_strands_agent
+
+        def build_agent():
+            # Batch agents keep no session history on disk
+            agent, _ = initialize_strands_agent(job.session_data, pool_key, None, job.a2a_status)
+            return agent
+
+        tracker = TurnEventTracker()
+        result = {"job_id": job.job_id, "index": item["index"], "id": item["id"]}
+        agent = None
+        try:
+            agent = await run_blocking(agent_pool.acquire, pool_key, job.session_data, job.a2a_status, build_agent)
+            agent.messages.clear()
+
+            chunks = []
+
+            async def consume():
+                async for event in agent.stream_async(item["prompt"]):
+                    tracker.observe(event)
+                    if isinstance(event, dict) and isinstance(event.get("data"), str):
+                        chunks.append(event["data"])
+
+            await asyncio.wait_for(consume(), BATCH_ITEM_TIMEOUT)
+            result.update({"status": "completed", "output": "".join(chunks)})
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                e = TimeoutError(f"Item timed out after {BATCH_ITEM_TIMEOUT:.0f}s")
+            logger.error(f"Batch item {item['index']} of job {job.job_id} failed: {e}")
+            result.update({"status": "error", "error": str(e)})
+            if agent is not None:
+                agent_pool.invalidate(pool_key)
+        finally:
+            if agent is not None:
+                agent.messages.clear()
+                agent_pool.release(pool_key, agent)
+
+        result.update({
+            "latency_ms": tracker.elapsed_ms(),
+            "first_token_ms": tracker.first_token_ms,
+            "model_calls": tracker.model_calls,
+            "tool_calls": tracker.tool_calls,
+            "input_tokens": tracker.usage["inputTokens"],
+            "output_tokens": tracker.usage["outputTokens"]
+        })
+        return result
+
+
+# Global batch job manager instance
+batch_job_manager = BatchJobManager()
@@ -0,0 +1,87 @@
+"""
+Blocking work offloading for KiloMarket
+Runs file, subprocess and sleep-heavy calls on a bounded thread pool and tracks event-loop lag
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Pool and monitor settings (overridable per deployment)
+BLOCKING_WORKERS = int(os.getenv("KILOMARKET_BLOCKING_WORKERS", "16"))
+LOOP_LAG_INTERVAL = float(os.getenv("KILOMARKET_LOOP_LAG_INTERVAL", "0.5"))
+LOOP_LAG_WARN_SECONDS = float(os.getenv("KILOMARKET_LOOP_LAG_WARN", "0.25"))
+
+_executor = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="kilomarket-blocking")
+
+
+async def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking callable on the bounded thread pool without stalling the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+def shutdown_blocking_pool():
+    """Stop accepting work and let queued calls finish"""
+    _executor.shutdown(wait=False)
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes up from a fixed-interval sleep"""
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL, warn_threshold: float = LOOP_LAG_WARN_SECONDS):
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self._task: Optional[asyncio.Task] = None
+        self._samples = 0
+        self._last_lag = 0.0
+        self._max_lag = 0.0
+        self._total_lag = 0.0
+        self._slow_ticks = 0
+
+    def start(self):
+        """Start sampling on the running loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        """Stop sampling"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - started - self.interval)
+
+            self._samples += 1
+            self._last_lag = lag
+            self._total_lag += lag
+            self._max_lag = max(self._max_lag, lag)
+            if lag >= self.warn_threshold:
+                self._slow_ticks += 1
+                logger.warning(f"Event loop lag {lag * 1000:.0f}ms - blocking work is running on the loop")
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get lag metrics in milliseconds"""
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "samples": self._samples,
+            "last_lag_ms": round(self._last_lag * 1000, 2),
+            "avg_lag_ms": round(self._total_lag / self._samples * 1000, 2) if self._samples else 0.0,
+            "max_lag_ms": round(self._max_lag * 1000, 2),
+            "slow_ticks": self._slow_ticks,
+            "blocking_workers": BLOCKING_WORKERS
+        }
+
+
+# Global event-loop lag monitor instance
+loop_lag_monitor = LoopLagMonitor()
@@ -0,0 +1,231 @@
+"""
+Structured chat events for KiloMarket Interactive Mode
+Translates Strands stream events into typed SSE events with tool timing and token usage
+"""
+
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .prompt_cache import prompt_cache_stats
+
+# SSE event types emitted in structured mode
+EVENT_TEXT = "text"
+EVENT_TOOL_START = "tool_start"
+EVENT_TOOL_END = "tool_end"
+EVENT_A2A_CALL = "a2a_call"
+EVENT_USAGE = "usage"
+EVENT_DONE = "done"
+# Not "error": EventSource reserves that name for transport failures (onerror)
+EVENT_ERROR = "turn_error"
+
+# MCP tools that move funds or change payment channel state
+PAYMENT_TOOLS = {
+    "transfer_yellow_tokens",
+    "create_yellow_channel",
+    "resize_yellow_channel",
+    "close_yellow_channel",
+    "deposit_to_custody",
+    "withdraw_from_custody",
+    "ethereum_send_native_token",
+    "ethereum_send_erc20_token",
+    "ethereum_approve_token"
+}
+
+
+def encode_event(payload: Dict[str, Any]) -> str:
+    """Serialize a structured event payload"""
+    return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+def tool_category(tool_name: str) -> str:
+    """Classify a tool for the frontend (a2a, payment or tool)"""
+    if tool_name.startswith("a2a_"):
+        return "a2a"
+    if tool_name in PAYMENT_TOOLS:
+        return "payment"
+    return "tool"
+
+
+class TurnEventTracker:
+    """Follows one agent turn and derives tool, A2A and usage events with timings"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._started_monotonic = time.monotonic()
+        self.first_token_ms: Optional[float] = None
+        self.model_calls = 0
+        self.model_latency_ms = 0.0
+        self.tool_ms = 0.0
+        self.tool_calls = 0
+        self.usage = {"inputTokens": 0, "outputTokens": 0, "totalTokens": 0,
+                      "cacheReadInputTokens": 0, "cacheWriteInputTokens": 0}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_unknown = 0
+        self._open_tools: Dict[str, Tuple[str, float]] = {}  # toolUseId -> (name, started)
+
+    def elapsed_ms(self) -> float:
+        """Milliseconds since the turn started"""
+        return round((time.monotonic() - self._started_monotonic) * 1000, 1)
+
+    def _base(self, event_type: str) -> Dict[str, Any]:
+        return {"type": event_type, "ts": time.time(), "t_ms": self.elapsed_ms()}
+
+    def text(self, text: str) -> Dict[str, Any]:
+        """Build a text event"""
+        payload = self._base(EVENT_TEXT)
+        payload["text"] = text
+        return payload
+
+    def observe(self, event: Any) -> List[Tuple[str, Dict[str, Any]]]:
+        """Translate one Strands stream event into zero or more (event_type, payload) pairs"""
+        if not isinstance(event, dict):
+            return []
+
+        out: List[Tuple[str, Dict[str, Any]]] = []
+
+        if self.first_token_ms is None and isinstance(event.get("data"), str) and event["data"]:
+            self.first_token_ms = self.elapsed_ms()
+
+        # Raw model metadata carries per-call token usage and latency
+        metadata = event.get("event", {}).get("metadata") if isinstance(event.get("event"), dict) else None
+        if metadata:
+            usage = metadata.get("usage", {}) or {}
+            latency_ms = (metadata.get("metrics", {}) or {}).get("latencyMs")
+            self.model_calls += 1
+            if latency_ms:
+                self.model_latency_ms += latency_ms
+            for key in self.usage:
+                self.usage[key] += usage.get(key, 0) or 0
+            cache_result = prompt_cache_stats.record(usage)
+            if cache_result == "hit":
+                self.cache_hits += 1
+            elif cache_result == "miss":
+                self.cache_misses += 1
+            else:
+                self.cache_unknown += 1
+
+            payload = self._base(EVENT_USAGE)
+            payload.update({
+                "model_call": self.model_calls,
+                "input_tokens": usage.get("inputTokens", 0),
+                "output_tokens": usage.get("outputTokens", 0),
+                "total_tokens": usage.get("totalTokens", 0),
+                "cache_read_tokens": usage.get("cacheReadInputTokens", 0),
+                "cache_write_tokens": usage.get("cacheWriteInputTokens", 0),
+                "cache": cache_result,
+                "latency_ms": latency_ms
+            })
+            out.append((EVENT_USAGE, payload))
+
+        # The tool executor reports each call as it finishes, with its own duration
+        finished = event.get("tool_finished")
+        if isinstance(finished, dict):
+            out.extend(self._tool_finished(finished, finished.get("duration_ms")))
+
+        # Completed messages: assistant toolUse blocks start tools, user toolResult blocks end any
+        # the executor did not already report
+        message = event.get("message")
+        if isinstance(message, dict):
+            for item in message.get("content", []) or []:
+                if message.get("role") == "assistant" and "toolUse" in item:
+                    out.extend(self._tool_started(item["toolUse"]))
+                elif message.get("role") == "user" and "toolResult" in item:
+                    if item["toolResult"].get("toolUseId") in self._open_tools:
+                        out.extend(self._tool_finished(item["toolResult"]))
+
+        return out
+
+    def _tool_started(self, tool_use: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+        tool_use_id = tool_use.get("toolUseId")
+        name = tool_use.get("name", "unknown")
+        self._open_tools[tool_use_id] = (name, time.monotonic())
+        self.tool_calls += 1
+
+        payload = self._base(EVENT_TOOL_START)
+        payload.update({
+            "tool_use_id": tool_use_id,
+            "name": name,
+            "category": tool_category(name),
+            "input": tool_use.get("input")
+        })
+        out = [(EVENT_TOOL_START, payload)]
+
+        if tool_category(name) == "a2a":
+            tool_input = tool_use.get("input") or {}
+            a2a_payload = self._base(EVENT_A2A_CALL)
+            a2a_payload.update({
+                "tool_use_id": tool_use_id,
+                "action": name,
+                "target_agent_url": tool_input.get("target_agent_url") if isinstance(tool_input, dict) else None,
+                "phase": "start"
+            })
+            out.append((EVENT_A2A_CALL, a2a_payload))
+        return out
+
+    def _tool_finished(self, tool_result: Dict[str, Any],
+                       duration_ms: Optional[float] = None) -> List[Tuple[str, Dict[str, Any]]]:
+        tool_use_id = tool_result.get("toolUseId")
+        name, started = self._open_tools.pop(tool_use_id, ("unknown", None))
+        if duration_ms is None and started is not None:
+            duration_ms = round((time.monotonic() - started) * 1000, 1)
+        if duration_ms is not None:
+            self.tool_ms += duration_ms
+
+        payload = self._base(EVENT_TOOL_END)
+        payload.update({
+            "tool_use_id": tool_use_id,
+            "name": name,
+            "category": tool_category(name),
+            "status": tool_result.get("status"),
+            "duration_ms": duration_ms
+        })
+        out = [(EVENT_TOOL_END, payload)]
+
+        if tool_category(name) == "a2a":
+            a2a_payload = self._base(EVENT_A2A_CALL)
+            a2a_payload.update({
+                "tool_use_id": tool_use_id,
+                "action": name,
+                "status": tool_result.get("status"),
+                "duration_ms": duration_ms,
+                "phase": "end"
+            })
+            out.append((EVENT_A2A_CALL, a2a_payload))
+        return out
+
+    def summary(self) -> str:
+        """One-line latency breakdown for server logs"""
+        return (
+            f"total={self.elapsed_ms()}ms ttft={self.first_token_ms}ms "
+            f"model_calls={self.model_calls} model={round(self.model_latency_ms, 1)}ms "
+            f"tools={self.tool_calls} tool_time={round(self.tool_ms, 1)}ms "
+            f"tokens={self.usage['inputTokens']}/{self.usage['outputTokens']} "
+            f"cache={self.cache_hits}hit/{self.cache_misses}miss/{self.cache_unknown}unknown "
+            f"cache_tokens={self.usage['cacheReadInputTokens']}r/{self.usage['cacheWriteInputTokens']}w"
+        )
+
+    def done(self, status: str = "completed", error: Optional[str] = None) -> Dict[str, Any]:
+        """Build the closing event with the turn's latency breakdown and token totals"""
+        payload = self._base(EVENT_ERROR if error else EVENT_DONE)
+        payload.update({
+            "status": status,
+            "total_ms": self.elapsed_ms(),
+            "first_token_ms": self.first_token_ms,
+            "model_calls": self.model_calls,
+            "model_latency_ms": round(self.model_latency_ms, 1),
+            "tool_calls": self.tool_calls,
+            "tool_ms": round(self.tool_ms, 1),
+            "input_tokens": self.usage["inputTokens"],
+            "output_tokens": self.usage["outputTokens"],
+            "total_tokens": self.usage["totalTokens"],
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_unknown": self.cache_unknown,
+            "cache_read_tokens": self.usage["cacheReadInputTokens"],
+            "cache_write_tokens": self.usage["cacheWriteInputTokens"]
+        })
+        if error:
+            payload["error"] = error
+        return payload
@@ -0,0 +1,308 @@
+"""
+Resumable chat streams for KiloMarket Interactive Mode
+Buffers each chat turn's SSE events so a reconnecting EventSource can replay from Last-Event-ID
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Coroutine, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Replay settings (overridable per deployment)
+REPLAY_BUFFER_SIZE = int(os.getenv("KILOMARKET_SSE_REPLAY_BUFFER", "4096"))
+REPLAY_GRACE_SECONDS = float(os.getenv("KILOMARKET_SSE_REPLAY_GRACE", "60"))
+RETRY_MILLISECONDS = int(os.getenv("KILOMARKET_SSE_RETRY_MS", "2000"))
+
+# Cancel a turn when no client has been attached for this long (leaves room for an EventSource reconnect)
+CANCEL_GRACE_SECONDS = float(os.getenv("KILOMARKET_SSE_CANCEL_GRACE", "5"))
+DISCONNECT_POLL_SECONDS = 1.0
+
+# Delta coalescing (0 disables the corresponding trigger)
+COALESCE_WINDOW_MS = float(os.getenv("KILOMARKET_SSE_COALESCE_MS", "20"))
+COALESCE_MAX_BYTES = int(os.getenv("KILOMARKET_SSE_COALESCE_BYTES", "512"))
+
+
+class StreamMetrics:
+    """Process-wide counters for the chat SSE encoder"""
+
+    def __init__(self):
+        self.deltas_in = 0
+        self.delta_bytes_in = 0
+        self.events_published = 0
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.client_disconnects = 0
+        self.turns_cancelled = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get the current counter values"""
+        return {
+            "deltas_in": self.deltas_in,
+            "delta_bytes_in": self.delta_bytes_in,
+            "events_published": self.events_published,
+            "frames_sent": self.frames_sent,
+            "bytes_sent": self.bytes_sent,
+            "client_disconnects": self.client_disconnects,
+            "turns_cancelled": self.turns_cancelled,
+            "deltas_per_event": round(self.deltas_in / self.events_published, 2) if self.events_published else 0.0
+        }
+
+
+# Global stream metrics instance
+stream_metrics = StreamMetrics()
+
+
+def format_sse(data: str, event_id: Optional[str] = None, event: Optional[str] = None) -> str:
+    """Encode one SSE frame; multi-line data is split across data: lines"""
+    lines = []
+    if event:
+        lines.append(f"event: {event}")
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    for line in data.split("\n"):
+        lines.append(f"data: {line}")
+    return "\n".join(lines) + "\n\n"
+
+
+class ChatTurnStream:
+    """Buffered output of one chat turn, readable by any number of (re)connecting clients"""
+
+    def __init__(self, turn_id: str, session_id: str, capacity: int = REPLAY_BUFFER_SIZE):
+        self.turn_id = turn_id
+        self.session_id = session_id
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.done = False
+        # Set once the terminal event ([DONE], done or error) is published, before the producer winds down
+        self.completed = False
+        self.task: Optional[asyncio.Task] = None
+        self._events: deque = deque(maxlen=capacity)  # (seq, event, data)
+        self._next_seq = 1
+        self._condition = asyncio.Condition()
+        self._subscribers = 0
+        self._cancel_handle: Optional[asyncio.TimerHandle] = None
+        self.cancelled = False
+
+    def event_id(self, seq: int) -> str:
+        """Build the SSE event ID for a sequence number"""
+        return f"{self.turn_id}:{seq}"
+
+    def start(self, producer: Coroutine) -> asyncio.Task:
+        """Run the producer for this turn in the background, detached from any one connection"""
+        self.task = asyncio.create_task(producer)
+        return self.task
+
+    async def publish(self, data: str, event: Optional[str] = None, final: bool = False) -> int:
+        """Append an event to the ring buffer and wake subscribers; final marks the turn's terminal event"""
+        async with self._condition:
+            seq = self._next_seq
+            self._next_seq += 1
+            self._events.append((seq, event, data))
+            if final:
+                self.completed = True
+            self._condition.notify_all()
+        stream_metrics.events_published += 1
+        return seq
+
+    async def finish(self):
+        """Mark the turn complete"""
+        async with self._condition:
+            self.done = True
+            self.finished_at = time.time()
+            self._condition.notify_all()
+
+    async def frames(self, after_seq: int = 0,
+                     is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None) -> AsyncIterator[str]:
+        """Yield SSE frames after a sequence number, then follow the live turn until it finishes"""
+        self._attach()
+        try:
+            # Set the reconnect delay and the initial event ID so even an early reconnect resumes this turn
+            yield f"retry: {RETRY_MILLISECONDS}\nid: {self.event_id(after_seq)}\n\n"
+
+            seq = after_seq
+            while True:
+                timed_out = False
+                async with self._condition:
+                    pending = [item for item in self._events if item[0] > seq]
+                    if not pending:
+                        if self.done:
+                            return
+                        try:
+                            await asyncio.wait_for(self._condition.wait(), DISCONNECT_POLL_SECONDS)
+                        except asyncio.TimeoutError:
+                            timed_out = True
+
+                if not pending:
+                    # Nothing sent for a while (e.g. a slow tool call) - make sure the client is still there
+                    if timed_out and is_disconnected is not None and await is_disconnected():
+                        return
+                    continue
+
+                if pending[0][0] > seq + 1:
+                    logger.warning(f"Turn {self.turn_id}: events {seq + 1}-{pending[0][0] - 1} fell out of the replay buffer")
+
+                for item_seq, event, data in pending:
+                    frame = format_sse(data, event_id=self.event_id(item_seq), event=event)
+                    stream_metrics.frames_sent += 1
+                    stream_metrics.bytes_sent += len(frame)
+                    yield frame
+                    seq = item_seq
+        finally:
+            self._detach()
+
+    def _attach(self):
+        """Register a connected client and call off any pending cancellation"""
+        self._subscribers += 1
+        if self._cancel_handle is not None:
+            self._cancel_handle.cancel()
+            self._cancel_handle = None
+
+    def _detach(self):
+        """Unregister a client; once none are left, cancel the turn unless one reconnects in time"""
+        self._subscribers -= 1
+        # Clients close on the terminal event, usually before finish() runs; that is not a disconnect
+        if self._subscribers > 0 or self.done or self.completed:
+            return
+
+        stream_metrics.client_disconnects += 1
+        logger.info(f"Client left turn {self.turn_id} before it finished, cancelling in {CANCEL_GRACE_SECONDS}s unless it reconnects")
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._cancel_if_abandoned()
+            return
+        self._cancel_handle = loop.call_later(CANCEL_GRACE_SECONDS, self._cancel_if_abandoned)
+
+    def _cancel_if_abandoned(self):
+        """Cancel the producer if still nobody is listening"""
+        self._cancel_handle = None
+        if self._subscribers > 0 or self.done or self.completed or self.task is None or self.task.done():
+            return
+
+        self.cancelled = True
+        stream_metrics.turns_cancelled += 1
+        logger.info(f"Cancelling abandoned turn {self.turn_id} for session {self.session_id}")
+        self.task.cancel()
+
+
+class TokenCoalescer:
+    """Batches model text deltas into frames by time window or byte threshold, whichever comes first"""
+
+    def __init__(self, turn: ChatTurnStream, window_ms: float = COALESCE_WINDOW_MS,
+                 max_bytes: int = COALESCE_MAX_BYTES, event: Optional[str] = None,
+                 encode: Optional[Callable[[str], str]] = None):
+        self.turn = turn
+        self.event = event
+        self.encode = encode
+        self.window = window_ms / 1000.0
+        self.max_bytes = max_bytes
+        self._pending: list = []
+        self._pending_bytes = 0
+        self._last_flush: Optional[float] = None
+        self._timer: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def add(self, text: str):
+        """Queue a text delta; the first delta (or one after an idle gap) is flushed immediately"""
+        size = len(text.encode("utf-8"))
+        stream_metrics.deltas_in += 1
+        stream_metrics.delta_bytes_in += size
+
+        async with self._lock:
+            self._pending.append(text)
+            self._pending_bytes += size
+
+            now = time.monotonic()
+            idle = self._last_flush is None or now - self._last_flush >= self.window
+            if (idle and self._timer is None) or self.window <= 0 or (self.max_bytes and self._pending_bytes >= self.max_bytes):
+                await self._flush_locked()
+            elif self._timer is None:
+                self._timer = asyncio.create_task(self._flush_after_window())
+
+    async def flush(self):
+        """Publish any pending text now"""
+        async with self._lock:
+            await self._flush_locked()
+
+    async def publish(self, data: str, event: Optional[str] = None, final: bool = False):
+        """Flush pending text, then publish a control or structured message (e.g. [DONE]) as its own event"""
+        async with self._lock:
+            await self._flush_locked()
+            await self.turn.publish(data, event=event, final=final)
+
+    async def _flush_after_window(self):
+        await asyncio.sleep(self.window)
+        async with self._lock:
+            self._timer = None
+            await self._flush_locked()
+
+    async def _flush_locked(self):
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        text = "".join(self._pending)
+        self._pending = []
+        self._pending_bytes = 0
+        self._last_flush = time.monotonic()
+        await self.turn.publish(self.encode(text) if self.encode else text, event=self.event)
+
+
+class ChatStreamRegistry:
+    """Keeps in-flight and recently completed chat turns for replay"""
+
+    def __init__(self, grace_seconds: float = REPLAY_GRACE_SECONDS, capacity: int = REPLAY_BUFFER_SIZE):
+        self.grace_seconds = grace_seconds
+        self.capacity = capacity
+        self._turns: Dict[str, ChatTurnStream] = {}
+
+    def create(self, session_id: str) -> ChatTurnStream:
+        """Register a new turn for a session"""
+        self._evict_expired()
+        turn = ChatTurnStream(uuid.uuid4().hex, session_id, self.capacity)
+        self._turns[turn.turn_id] = turn
+        return turn
+
+    def resume(self, session_id: str, last_event_id: str) -> Optional[Tuple[ChatTurnStream, int]]:
+        """Find the turn and sequence number a Last-Event-ID refers to"""
+        self._evict_expired()
+        turn_id, _, seq = last_event_id.strip().rpartition(":")
+        turn = self._turns.get(turn_id)
+        if turn is None or turn.session_id != session_id:
+            return None
+        try:
+            return turn, int(seq)
+        except ValueError:
+            return None
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get registry status"""
+        return {
+            "turns": len(self._turns),
+            "active_turns": sum(1 for turn in self._turns.values() if not turn.done),
+            "coalesce_window_ms": COALESCE_WINDOW_MS,
+            "coalesce_max_bytes": COALESCE_MAX_BYTES,
+            **stream_metrics.snapshot(),
+            "grace_seconds": self.grace_seconds,
+            "buffer_size": self.capacity
+        }
+
+    def _evict_expired(self):
+        """Drop completed turns older than the grace period"""
+        cutoff = time.time() - self.grace_seconds
+        expired = [
+            turn_id for turn_id, turn in self._turns.items()
+            if turn.done and turn.finished_at is not None and turn.finished_at < cutoff
+        ]
+        for turn_id in expired:
+            del self._turns[turn_id]
+
+
+# Global chat stream registry instance
+chat_stream_registry = ChatStreamRegistry()
@@ -0,0 +1,294 @@
+"""
+Token-budgeted conversation management for KiloMarket
+Compacts older turns into a rolling summary in the background and keeps recent turns verbatim
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# Try to import strands components, but handle gracefully if not available
+STRANDS_AVAILABLE = False
+Agent = None
+ConversationManager = object
+SlidingWindowConversationManager = None
+
+try:
+    from strands import Agent
+    from strands.agent.conversation_manager import ConversationManager, SlidingWindowConversationManager
+    STRANDS_AVAILABLE = True
+except ImportError as e:
+    logging.warning(f"StrandsAgents not available: {e}. Conversation management will be limited.")
+    STRANDS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Strategies selectable per session
+STRATEGY_SUMMARIZING = "summarizing"
+STRATEGY_SLIDING_WINDOW = "sliding_window"
+CONVERSATION_STRATEGIES = [STRATEGY_SUMMARIZING, STRATEGY_SLIDING_WINDOW]
+
+# Defaults (overridable per deployment)
+DEFAULT_STRATEGY = os.getenv("KILOMARKET_CONVERSATION_MANAGER", STRATEGY_SUMMARIZING)
+DEFAULT_TOKEN_BUDGET = int(os.getenv("KILOMARKET_CONTEXT_TOKEN_BUDGET", "32000"))
+DEFAULT_PRESERVE_RATIO = float(os.getenv("KILOMARKET_CONTEXT_PRESERVE_RATIO", "0.5"))
+MIN_RECENT_MESSAGES = 2
+SLIDING_WINDOW_SIZE = 15
+# Summaries running at once across all sessions
+COMPACTION_WORKERS = int(os.getenv("KILOMARKET_COMPACTION_WORKERS", "2"))
+
+# Rough characters-per-token ratio used for estimates
+CHARS_PER_TOKEN = 4
+# Tool results are clipped to this many characters in the summarizer transcript
+TRANSCRIPT_TOOL_RESULT_CHARS = 2000
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:"
+SUMMARY_SYSTEM_PROMPT = """You compact conversations between a user and the KiloMarket Interactive Agent.
+Write a concise summary of the transcript you are given so the agent can continue the conversation without it.
+Keep: the user's goals and open requests, decisions made, wallet addresses, transaction hashes, channel ids,
+amounts, A2A agents contacted and what they returned, and any errors still unresolved.
+Drop: greetings, repeated tool output and formatting. Reply with the summary only."""
+
+_compaction_slots = asyncio.Semaphore(max(1, COMPACTION_WORKERS))
+
+
+def estimate_message_tokens(message: Dict[str, Any]) -> int:
+    """Estimate the prompt tokens a message contributes"""
+    encoded = json.dumps(message.get("content", []), default=str, ensure_ascii=False)
+    return len(encoded) // CHARS_PER_TOKEN + 4
+
+
+def render_transcript(messages: List[Dict[str, Any]]) -> str:
+    """Render messages as plain text for the summarizer, clipping large tool results"""
+    lines = []
+    for message in messages:
+        role = message.get("role", "user")
+        for item in message.get("content", []) or []:
+            if "text" in item:
+                lines.append(f"{role}: {item['text']}")
+            elif "toolUse" in item:
+                tool_use = item["toolUse"]
+                tool_input = json.dumps(tool_use.get("input"), default=str)
+                lines.append(f"{role} called tool {tool_use.get('name')}: {tool_input}")
+            elif "toolResult" in item:
+                tool_result = item["toolResult"]
+                parts = []
+                for block in tool_result.get("content", []) or []:
+                    if "text" in block:
+                        parts.append(block["text"])
+                    elif "json" in block:
+                        parts.append(json.dumps(block["json"], default=str))
+                text = " ".join(parts)
+                if len(text) > TRANSCRIPT_TOOL_RESULT_CHARS:
+                    text = text[:TRANSCRIPT_TOOL_RESULT_CHARS] + " ...[truncated]"
+                lines.append(f"tool result ({tool_result.get('status', 'success')}): {text}")
+    return "\n".join(lines)
+
+
+class TokenBudgetConversationManager(ConversationManager):
+    """Summarizes older turns once the estimated prompt crosses a token budget"""
+
+    def __init__(self, token_budget: int = DEFAULT_TOKEN_BUDGET, preserve_ratio: float = DEFAULT_PRESERVE_RATIO,
+                 min_recent_messages: int = MIN_RECENT_MESSAGES):
+        super().__init__()
+        self.token_budget = max(1000, token_budget)
+        self.preserve_ratio = min(max(preserve_ratio, 0.1), 0.9)
+        self.min_recent_messages = max(1, min_recent_messages)
+
+        self._summary_message: Optional[Dict[str, Any]] = None
+        self._estimates: Dict[int, tuple] = {}  # id(message) -> (message, tokens)
+        self._lock = threading.Lock()
+        self._job: Optional[asyncio.Task] = None  # in-flight compaction
+        self._job_snapshot: List[Dict[str, Any]] = []
+        self._job_started = 0.0
+        self._compactions = 0
+        self._last_compaction: Optional[Dict[str, Any]] = None
+        self._fallback = SlidingWindowConversationManager(
+            window_size=SLIDING_WINDOW_SIZE,
+            should_truncate_results=True
+        ) if SlidingWindowConversationManager else None
+
+    def estimate_tokens(self, messages: List[Dict[str, Any]]) -> int:
+        """Estimate prompt tokens for the conversation, reusing per-message estimates"""
+        estimates = {}
+        total = 0
+        for message in messages:
+            cached = self._estimates.get(id(message))
+            if cached is None or cached[0] is not message:
+                cached = (message, estimate_message_tokens(message))
+            estimates[id(message)] = cached
+            total += cached[1]
+        self._estimates = estimates
+        return total
+
+    def apply_management(self, agent: Any, **kwargs) -> None:
+        """Swap in a finished summary, then start a background compaction if over budget"""
+        self.apply_pending_compaction(agent)
+
+        if self.estimate_tokens(agent.messages) <= self.token_budget:
+            return
+
+        try:
+            # The summary runs on the loop driving the turn, the one the session's shared model client lives on
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        with self._lock:
+            if self._job is not None:
+                return
+            split = self._find_split(agent.messages)
+            if split is None:
+                return
+            self._job_snapshot = list(agent.messages[:split])
+            self._job_started = time.monotonic()
+            transcript = render_transcript(self._job_snapshot)
+            self._job = loop.create_task(self._summarize(agent.model, transcript))
+        logger.info(f"Started background compaction of {split} message(s) (budget {self.token_budget} tokens)")
+
+    def apply_pending_compaction(self, agent: Any) -> bool:
+        """Replace the compacted prefix with its summary once the background job is done"""
+        with self._lock:
+            job = self._job
+            if job is None or not job.done():
+                return False
+            snapshot = self._job_snapshot
+            started = self._job_started
+            self._job = None
+            self._job_snapshot = []
+
+        if job.cancelled():
+            logger.warning("Background compaction was cancelled")
+            return False
+        try:
+            summary = job.result()
+        except Exception as e:
+            logger.error(f"Background compaction failed: {e}")
+            return False
+
+        messages = agent.messages
+        split = len(snapshot)
+        # The conversation may have been trimmed by another path since the snapshot was taken
+        if len(messages) < split or any(messages[i] is not snapshot[i] for i in range(split)):
+            logger.warning("Discarding stale compaction: conversation changed underneath it")
+            return False
+
+        before = self.estimate_tokens(messages)
+        summary_message = {"role": "user", "content": [{"text": f"{SUMMARY_PREFIX}\n{summary}"}]}
+        folded_summary = self._summary_message is not None and snapshot[0] is self._summary_message
+        messages[:split] = [summary_message]
+
+        # The summary message is not persisted, so only count real messages as removed
+        self.removed_message_count += split - (1 if folded_summary else 0)
+        self._summary_message = summary_message
+        after = self.estimate_tokens(messages)
+
+        self._compactions += 1
+        self._last_compaction = {
+            "compacted_messages": split,
+            "prompt_tokens_before": before,
+            "prompt_tokens_after": after,
+            "duration_ms": round((time.monotonic() - started) * 1000, 1),
+            "at": time.time()
+        }
+        logger.info(f"Compacted {split} message(s): prompt ~{before} -> ~{after} tokens")
+        return True
+
+    def reduce_context(self, agent: Any, e: Optional[Exception] = None, **kwargs) -> None:
+        """Context overflow: use a finished summary if there is one, else trim like the sliding window"""
+        if self.apply_pending_compaction(agent):
+            return
+        if self._fallback is None:
+            raise e or RuntimeError("Cannot reduce conversation context")
+
+        # Summarizing synchronously here would block the turn; trim instead and let the budget catch up
+        summary_was_first = bool(agent.messages) and agent.messages[0] is self._summary_message
+        before_removed = self._fallback.removed_message_count
+        self._fallback.reduce_context(agent, e, **kwargs)
+        removed = self._fallback.removed_message_count - before_removed
+
+        if summary_was_first and (not agent.messages or agent.messages[0] is not self._summary_message):
+            removed -= 1
+            self._summary_message = None
+        self.removed_message_count += max(0, removed)
+        logger.warning(f"Context overflow: trimmed {removed} message(s) with the sliding window fallback")
+
+    def get_state(self) -> Dict[str, Any]:
+        """Session state: removed message offset plus the summary to prepend on restore"""
+        return {
+            "__name__": self.__class__.__name__,
+            "removed_message_count": self.removed_message_count,
+            "summary_message": self._summary_message
+        }
+
+    def restore_from_session(self, state: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """Restore the offset and summary; older sessions saved by the sliding window keep their offset"""
+        self.removed_message_count = state.get("removed_message_count", 0)
+        if state.get("__name__") != self.__class__.__name__:
+            return None
+
+        self._summary_message = state.get("summary_message")
+        return [self._summary_message] if self._summary_message else None
+
+    def get_status(self, agent: Any = None) -> Dict[str, Any]:
+        """Get budget, current estimate and compaction metrics"""
+        with self._lock:
+            pending = self._job is not None
+        status = {
+            "strategy": STRATEGY_SUMMARIZING,
+            "token_budget": self.token_budget,
+            "compaction_pending": pending,
+            "compactions": self._compactions,
+            "removed_message_count": self.removed_message_count,
+            "last_compaction": self._last_compaction
+        }
+        if agent is not None:
+            status["prompt_tokens"] = self.estimate_tokens(agent.messages)
+        return status
+
+    def _find_split(self, messages: List[Dict[str, Any]]) -> Optional[int]:
+        """Index of the first verbatim message, keeping about preserve_ratio of the budget"""
+        recent_budget = int(self.token_budget * self.preserve_ratio)
+        split = len(messages)
+        kept_tokens = 0
+        while split > 0:
+            tokens = self._estimates.get(id(messages[split - 1]), (None, 0))[1]
+            if len(messages) - split >= self.min_recent_messages and kept_tokens + tokens > recent_budget:
+                break
+            kept_tokens += tokens
+            split -= 1
+
+        # Kept turns must start at an assistant message so the summary (a user message)
+        # keeps roles alternating and no toolUse is separated from its toolResult
+        while split > 0 and messages[split].get("role") != "assistant":
+            split -= 1
+
+        has_summary = bool(messages) and messages[0] is self._summary_message
+        if split - (1 if has_summary else 0) < 2:
+            return None
+        return split
+
+    @staticmethod
+    async def _summarize(model: Any, transcript: str) -> str:
+        """Summarize a transcript with a private, tool-less agent on the session's model"""
+        async with _compaction_slots:
+            summarizer = Agent(model=model, system_prompt=SUMMARY_SYSTEM_PROMPT, callback_handler=None)
+            result = await summarizer.invoke_async(transcript)
+        return str(result).strip()
+
+
+def resolve_conversation_settings(settings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Validate per-session conversation manager settings and fill in defaults"""
+    settings = settings or {}
+    strategy = settings.get("strategy", DEFAULT_STRATEGY)
+    if strategy not in CONVERSATION_STRATEGIES:
+        raise ValueError(f"Unsupported conversation manager: {strategy}")
+
+    resolved = {"strategy": strategy}
+    if strategy == STRATEGY_SUMMARIZING:
+        resolved["token_budget"] = int(settings.get("token_budget", DEFAULT_TOKEN_BUDGET))
+    return resolved
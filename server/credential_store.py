@@ -0,0 +1,100 @@
+"""
+Session credential store for KiloMarket
+Keeps per-session passcodes in their own SQLite file with single-key writes and an in-memory read cache
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CREDENTIAL_STORE_FILE = "session_credentials.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS credentials (
+    session_id TEXT PRIMARY KEY,
+    passcode TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class SessionCredentialStore:
+    """Thread-safe keyed store of session passcodes
+
+    Every write is one committed upsert or delete of one key; reads are served from memory.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        # Secrets: readable by the server's user only
+        try:
+            os.chmod(db_path, 0o600)
+        except OSError:
+            pass
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            self._cache: Dict[str, str] = dict(
+                self._conn.execute("SELECT session_id, passcode FROM credentials").fetchall()
+            )
+
+    def get(self, session_id: str) -> Optional[str]:
+        return self._cache.get(session_id)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._cache
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def session_ids(self) -> List[str]:
+        return list(self._cache)
+
+    def set(self, session_id: str, passcode: str):
+        """Insert or replace one session's passcode"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO credentials (session_id, passcode, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET passcode = excluded.passcode, updated_at = excluded.updated_at",
+                (session_id, passcode, time.time())
+            )
+            self._cache[session_id] = passcode
+
+    def delete(self, session_id: str) -> bool:
+        """Remove one session's passcode; returns whether it existed"""
+        with self._lock:
+            self._conn.execute("DELETE FROM credentials WHERE session_id = ?", (session_id,))
+            return self._cache.pop(session_id, None) is not None
+
+    def import_passcodes(self, passcodes: Dict[str, str]) -> int:
+        """Bulk insert passcodes that are not stored yet (used to migrate from the settings file)"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO credentials (session_id, passcode, updated_at) VALUES (?, ?, ?)",
+                    [(session_id, str(passcode), now) for session_id, passcode in passcodes.items()]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            imported = 0
+            for session_id, passcode in passcodes.items():
+                if session_id not in self._cache:
+                    self._cache[session_id] = str(passcode)
+                    imported += 1
+            return imported
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
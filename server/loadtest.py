@@ -0,0 +1,475 @@
+"""
+Load-test harness for KiloMarket
+Drives /chat-stream and the A2A ports with simulated users against a stub model and writes a JSON report
+
+Usage:
+    python -m server.loadtest --users 20 --duration 60 --token-rate 50 --latency-ms 300 --output loadtest.json
+    python -m server.loadtest --users 10 --a2a-users 10 --distribution uniform --jitter-ms 200
+
+The server runs in a child process (in a scratch working directory, so sessions and settings never touch the
+real ones) with the stub provider registered; this process generates the load and samples the child's CPU and memory.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Nothing here may import the app or the session store: that happens in the child, inside its scratch directory
+from .batch_jobs import percentile
+from .stub_model import DEFAULT_STUB_CONFIG, LATENCY_DISTRIBUTIONS, STUB_PROVIDER
+
+READY_FILE = "loadtest-ready.json"
+SERVER_START_TIMEOUT = 60.0
+SAMPLE_INTERVAL = 1.0
+
+# Server-side metrics collected at the end of a run
+METRIC_ENDPOINTS = {
+    "chat_stream": "/api/chat-stream/metrics",
+    "event_loop": "/api/event-loop/status",
+    "admission": "/api/admission/status",
+    "agent_pool": "/api/agent-pool/status"
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m server.loadtest",
+        description="Load-test the KiloMarket chat and A2A paths with a stub model provider"
+    )
+    load = parser.add_argument_group("load")
+    load.add_argument("--users", type=int, default=10, help="concurrent chat users (one session each)")
+    load.add_argument("--a2a-users", type=int, default=0, help="concurrent A2A clients")
+    load.add_argument("--duration", type=float, default=30.0, help="seconds to generate load")
+    load.add_argument("--requests-per-user", type=int, default=0, help="stop each user after N requests (0 = no limit)")
+    load.add_argument("--think-time-ms", type=float, default=0.0, help="pause between a user's requests")
+    load.add_argument("--message", default="What can the KiloMarket service agents do for me?")
+    load.add_argument("--events", choices=["text", "structured"], default="text", help="chat stream event mode")
+    load.add_argument("--timeout", type=float, default=120.0, help="per-request timeout in seconds")
+
+    stub = parser.add_argument_group("stub model")
+    stub.add_argument("--token-rate", type=float, default=DEFAULT_STUB_CONFIG["token_rate"], help="tokens per second")
+    stub.add_argument("--latency-ms", type=float, default=DEFAULT_STUB_CONFIG["latency_ms"], help="mean first-token latency")
+    stub.add_argument("--jitter-ms", type=float, default=DEFAULT_STUB_CONFIG["jitter_ms"], help="latency spread")
+    stub.add_argument("--distribution", choices=LATENCY_DISTRIBUTIONS, default=DEFAULT_STUB_CONFIG["distribution"])
+    stub.add_argument("--output-tokens", type=int, default=DEFAULT_STUB_CONFIG["output_tokens"], help="tokens per response")
+    stub.add_argument("--seed", type=int, default=DEFAULT_STUB_CONFIG["seed"])
+
+    server = parser.add_argument_group("server")
+    server.add_argument("--host", default="127.0.0.1")
+    server.add_argument("--port", type=int, default=0, help="web server port (0 = pick a free port)")
+    server.add_argument("--a2a-servers", type=int, default=3, help="stub A2A servers to start when --a2a-users > 0")
+    server.add_argument("--a2a-base-port", type=int, default=9100)
+    server.add_argument("--output", default="loadtest-results.json", help="JSON report path")
+
+    # Internal: run the server side in the child process
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    return parser
+
+
+def stub_config(args: argparse.Namespace) -> Dict[str, Any]:
+    return {
+        "model_id": DEFAULT_STUB_CONFIG["model_id"],
+        "token_rate": args.token_rate,
+        "latency_ms": args.latency_ms,
+        "jitter_ms": args.jitter_ms,
+        "distribution": args.distribution,
+        "output_tokens": args.output_tokens,
+        "seed": args.seed
+    }
+
+
+def _free_port(host: str) -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind((host, 0))
+        return s.getsockname()[1]
+
+
+# Server side (child process)
+
+def serve(args: argparse.Namespace):
+    """Register the stub provider, create sessions and A2A servers, then run the web server"""
+    import uvicorn
+    from .app import app
+    from .model_pool import model_pool
+    from .sessions import session_manager
+    from .stub_model import build_stub_model
+
+    model_pool.register_provider(STUB_PROVIDER, build_stub_model)
+    config = stub_config(args)
+
+    session_ids = [
+        session_manager.create_session(
+            approval_data="",
+            passcode="0000",
+            ai_provider={"provider": STUB_PROVIDER, "config": config}
+        )
+        for _ in range(args.users)
+    ]
+
+    a2a_ports = []
+    if args.a2a_users > 0:
+        from .a2a_server import A2AServerInstance
+        model = model_pool.get_model(STUB_PROVIDER, config)
+        for index in range(args.a2a_servers):
+            instance = A2AServerInstance(
+                port=args.a2a_base_port + index,
+                agent_name=f"Stub Service Agent {index + 1}",
+                agent_description="Load-test service agent backed by the stub model",
+                tools=[],
+                host=args.host,
+                model=model
+            )
+            success, message = instance.start()
+            print(message, flush=True)
+            if success:
+                a2a_ports.append(instance.port)
+
+    ready_path = Path(args.workdir) / READY_FILE
+    temp_path = ready_path.with_suffix(".tmp")
+    temp_path.write_text(json.dumps({"sessions": session_ids, "a2a_ports": a2a_ports}))
+    os.replace(temp_path, ready_path)
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+# Resource sampling
+
+class ProcessSampler:
+    """Samples a process's CPU utilisation and resident memory (psutil if installed, else /proc)"""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.samples: List[Dict[str, float]] = []
+        try:
+            import psutil
+            self._process = psutil.Process(pid)
+        except Exception:
+            self._process = None
+        self._last_cpu: Optional[float] = None
+        self._last_time: Optional[float] = None
+
+    def _read(self):
+        """Return (cpu_seconds, rss_bytes) or None when unavailable"""
+        if self._process is not None:
+            times = self._process.cpu_times()
+            return times.user + times.system, self._process.memory_info().rss
+
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            ticks = os.sysconf("SC_CLK_TCK")
+            cpu_seconds = (int(fields[11]) + int(fields[12])) / ticks
+            rss_bytes = int(fields[21]) * os.sysconf("SC_PAGE_SIZE")
+            return cpu_seconds, rss_bytes
+        except (OSError, IndexError, ValueError):
+            return None
+
+    def sample(self):
+        reading = self._read()
+        if reading is None:
+            return
+        cpu_seconds, rss_bytes = reading
+        now = time.monotonic()
+        if self._last_cpu is not None and now > self._last_time:
+            self.samples.append({
+                "cpu_percent": round((cpu_seconds - self._last_cpu) / (now - self._last_time) * 100, 1),
+                "rss_mb": round(rss_bytes / (1024 * 1024), 1)
+            })
+        self._last_cpu, self._last_time = cpu_seconds, now
+
+    async def run(self, stop: asyncio.Event):
+        while not stop.is_set():
+            self.sample()
+            try:
+                await asyncio.wait_for(stop.wait(), SAMPLE_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    def summary(self) -> Dict[str, Any]:
+        cpu = [s["cpu_percent"] for s in self.samples]
+        rss = [s["rss_mb"] for s in self.samples]
+        if not self.samples:
+            return {"samples": 0}
+        return {
+            "samples": len(self.samples),
+            "cpu_percent": {"avg": round(sum(cpu) / len(cpu), 1), "p95": percentile(cpu, 95), "max": max(cpu)},
+            "rss_mb": {"avg": round(sum(rss) / len(rss), 1), "max": max(rss), "end": rss[-1]}
+        }
+
+
+# Load generation (this process)
+
+def _record(started: float, ttft: Optional[float], status: str, frames: int, error: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "status": status,
+        "latency_ms": round((time.monotonic() - started) * 1000, 1),
+        "ttft_ms": round((ttft - started) * 1000, 1) if ttft is not None else None,
+        "frames": frames,
+        "error": error
+    }
+
+
+async def _user_loop(run_once, args: argparse.Namespace, deadline: float, results: List[Dict[str, Any]]):
+    count = 0
+    while time.monotonic() < deadline and (not args.requests_per_user or count < args.requests_per_user):
+        results.append(await run_once())
+        count += 1
+        if args.think_time_ms:
+            await asyncio.sleep(args.think_time_ms / 1000)
+
+
+async def chat_request(client, base_url: str, session_id: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """One /chat-stream turn: time to first text frame and to the done marker"""
+    started = time.monotonic()
+    ttft = None
+    frames = 0
+    event_type = None
+    try:
+        async with client.stream(
+            "GET", f"{base_url}/chat-stream/{session_id}",
+            params={"message": args.message, "events": args.events},
+            timeout=args.timeout
+        ) as response:
+            if response.status_code == 429:
+                return _record(started, None, "rejected", 0)
+            if response.status_code != 200:
+                return _record(started, None, "error", 0, f"HTTP {response.status_code}")
+
+            async for line in response.aiter_lines():
+                if line.startswith("event:"):
+                    event_type = line[6:].strip()
+                    continue
+                if not line.startswith("data:"):
+                    if not line:
+                        event_type = None
+                    continue
+
+                data = line[5:].strip()
+                if data == "[DONE]" or event_type == "done":
+                    return _record(started, ttft, "ok", frames)
+                if data.startswith("[ERROR]") or event_type == "turn_error":
+                    return _record(started, ttft, "error", frames, data[:200])
+                if event_type in (None, "text"):
+                    frames += 1
+                    if ttft is None:
+                        ttft = time.monotonic()
+        return _record(started, ttft, "error", frames, "stream ended without a done marker")
+    except Exception as e:
+        return _record(started, ttft, "error", frames, f"{type(e).__name__}: {e}")
+
+
+async def a2a_request(client, url: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """One A2A message/stream call: time to the first streamed update and to the end of the stream"""
+    started = time.monotonic()
+    ttft = None
+    frames = 0
+    payload = {
+        "jsonrpc": "2.0",
+        "id": str(uuid.uuid4()),
+        "method": "message/stream",
+        "params": {
+            "message": {
+                "kind": "message",
+                "role": "user",
+                "messageId": str(uuid.uuid4()),
+                "parts": [{"kind": "text", "text": args.message}]
+            }
+        }
+    }
+    try:
+        async with client.stream("POST", url, json=payload, headers={"Accept": "text/event-stream"},
+                                 timeout=args.timeout) as response:
+            if response.status_code != 200:
+                return _record(started, None, "error", 0, f"HTTP {response.status_code}")
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                frames += 1
+                data = json.loads(line[5:].strip())
+                if "error" in data:
+                    return _record(started, ttft, "error", frames, str(data["error"])[:200])
+                if ttft is None:
+                    ttft = time.monotonic()
+                if (data.get("result") or {}).get("final"):
+                    break
+        return _record(started, ttft, "ok", frames)
+    except Exception as e:
+        return _record(started, ttft, "error", frames, f"{type(e).__name__}: {e}")
+
+
+def summarize(results: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    """Aggregate request records into throughput and latency percentiles"""
+    ok = [r for r in results if r["status"] == "ok"]
+    latencies = [r["latency_ms"] for r in ok]
+    ttfts = [r["ttft_ms"] for r in ok if r["ttft_ms"] is not None]
+    errors: Dict[str, int] = {}
+    for r in results:
+        if r["status"] == "error":
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+
+    def distribution(values):
+        if not values:
+            return None
+        return {
+            "avg": round(sum(values) / len(values), 1),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+            "max": max(values)
+        }
+
+    return {
+        "requests": len(results),
+        "ok": len(ok),
+        "errors": sum(errors.values()),
+        "rejected": sum(1 for r in results if r["status"] == "rejected"),
+        "throughput_rps": round(len(ok) / elapsed, 3) if elapsed else None,
+        "frames_per_second": round(sum(r["frames"] for r in ok) / elapsed, 1) if elapsed else None,
+        "latency_ms": distribution(latencies),
+        "ttft_ms": distribution(ttfts),
+        "error_samples": dict(sorted(errors.items(), key=lambda item: -item[1])[:5])
+    }
+
+
+async def generate_load(args: argparse.Namespace, base_url: str, ready: Dict[str, Any], pid: int) -> Dict[str, Any]:
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.users + args.a2a_users + 8)
+    async with httpx.AsyncClient(limits=limits) as client:
+        sampler = ProcessSampler(pid)
+        stop = asyncio.Event()
+        sampler_task = asyncio.create_task(sampler.run(stop))
+
+        chat_results: List[Dict[str, Any]] = []
+        a2a_results: List[Dict[str, Any]] = []
+        started = time.monotonic()
+        deadline = started + args.duration
+
+        users = [
+            _user_loop(lambda sid=session_id: chat_request(client, base_url, sid, args), args, deadline, chat_results)
+            for session_id in ready["sessions"]
+        ]
+        a2a_urls = [f"http://{args.host}:{port}/" for port in ready["a2a_ports"]]
+        if a2a_urls:
+            users += [
+                _user_loop(lambda url=a2a_urls[n % len(a2a_urls)]: a2a_request(client, url, args),
+                           args, deadline, a2a_results)
+                for n in range(args.a2a_users)
+            ]
+        await asyncio.gather(*users)
+        elapsed = time.monotonic() - started
+
+        stop.set()
+        await sampler_task
+
+        server_metrics = {}
+        for name, path in METRIC_ENDPOINTS.items():
+            try:
+                server_metrics[name] = (await client.get(f"{base_url}{path}", timeout=10)).json()
+            except Exception as e:
+                server_metrics[name] = {"error": str(e)}
+
+    report = {
+        "elapsed_seconds": round(elapsed, 3),
+        "chat": summarize(chat_results, elapsed),
+        "server": sampler.summary(),
+        "server_metrics": server_metrics
+    }
+    if a2a_urls:
+        report["a2a"] = summarize(a2a_results, elapsed)
+    return report
+
+
+def _wait_for_server(process: subprocess.Popen, workdir: Path, base_url: str) -> Dict[str, Any]:
+    import httpx
+
+    ready_path = workdir / READY_FILE
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server process exited with code {process.returncode}")
+        if ready_path.exists():
+            try:
+                httpx.get(f"{base_url}/api/event-loop/status", timeout=2).raise_for_status()
+                return json.loads(ready_path.read_text())
+            except httpx.HTTPError:
+                pass
+        time.sleep(0.25)
+    raise RuntimeError(f"Server did not start within {SERVER_START_TIMEOUT:.0f}s")
+
+
+def run(args: argparse.Namespace, argv: List[str]) -> Dict[str, Any]:
+    """Start the stub-backed server, generate load and return the report"""
+    args.port = args.port or _free_port(args.host)
+    workdir = Path(tempfile.mkdtemp(prefix="kilomarket-loadtest-"))
+    repo_root = Path(__file__).resolve().parent.parent
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(repo_root), os.getenv("PYTHONPATH")]))}
+
+    command = [sys.executable, "-m", "server.loadtest", "--serve", "--workdir", str(workdir)]
+    command += list(argv)
+    command += ["--port", str(args.port)]
+
+    base_url = f"http://{args.host}:{args.port}"
+    log_path = workdir / "server.log"
+    with open(log_path, "w") as log:
+        process = subprocess.Popen(command, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+        try:
+            ready = _wait_for_server(process, workdir, base_url)
+            print(f"Server ready at {base_url} ({len(ready['sessions'])} sessions, A2A ports {ready['a2a_ports']})")
+            report = asyncio.run(generate_load(args, base_url, ready, process.pid))
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    report = {
+        "timestamp": time.time(),
+        "config": {
+            "users": args.users,
+            "a2a_users": args.a2a_users,
+            "duration_seconds": args.duration,
+            "requests_per_user": args.requests_per_user,
+            "think_time_ms": args.think_time_ms,
+            "events": args.events,
+            "stub_model": stub_config(args)
+        },
+        **report,
+        "server_log": str(log_path)
+    }
+    return report
+
+
+def main(argv: Optional[List[str]] = None):
+    argv = sys.argv[1:] if argv is None else argv
+    args = build_parser().parse_args(argv)
+    if args.serve:
+        serve(args)
+        return
+
+    report = run(args, argv)
+    Path(args.output).write_text(json.dumps(report, indent=2, default=str))
+
+    chat = report["chat"]
+    print(f"Chat: {chat['ok']}/{chat['requests']} ok, {chat['throughput_rps']} req/s, "
+          f"TTFT p50/p95/p99 {(chat['ttft_ms'] or {}).get('p50')}/{(chat['ttft_ms'] or {}).get('p95')}/"
+          f"{(chat['ttft_ms'] or {}).get('p99')} ms")
+    if "a2a" in report:
+        a2a = report["a2a"]
+        print(f"A2A: {a2a['ok']}/{a2a['requests']} ok, {a2a['throughput_rps']} req/s")
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,8 +6,10 @@ Handles Ethereum MCP client and tool collection using existing wallet settings
 import json
 import os
 import logging
-from typing import Dict, List, Any, Optional, Tuple
-from contextlib import contextmanager
+import threading
+import time
+from typing import Dict, List, Any, Optional, Tuple, Callable
+from contextlib import contextmanager, asynccontextmanager
 
 try:
     from strands.tools.mcp import MCPClient
@@ -23,6 +25,51 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+TOOLS_LIST_CHANGED = "notifications/tools/list_changed"
+
+# How long a cached A2A client provider (and its resolved agent cards) stays valid
+A2A_PROVIDER_TTL = float(os.getenv("KILOMARKET_A2A_PROVIDER_TTL", "300"))
+
+
+class _ToolListChangeTap:
+    """Read-stream proxy that reports MCP tools/list_changed notifications"""
+    
+    def __init__(self, stream, on_change: Callable[[], None]):
+        self._stream = stream
+        self._on_change = on_change
+    
+    async def __aenter__(self):
+        await self._stream.__aenter__()
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        return await self._stream.__aexit__(*exc_info)
+    
+    def __aiter__(self):
+        return self
+    
+    async def __anext__(self):
+        message = await self._stream.__anext__()
+        self._inspect(message)
+        return message
+    
+    async def receive(self):
+        message = await self._stream.receive()
+        self._inspect(message)
+        return message
+    
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+    
+    def _inspect(self, message):
+        root = getattr(getattr(message, "message", None), "root", None)
+        if getattr(root, "method", None) == TOOLS_LIST_CHANGED:
+            try:
+                self._on_change()
+            except Exception as e:
+                logger.error(f"Error handling MCP tool list change: {e}")
+
+
 class MCPManager:
     """Manages Ethereum MCP client for KiloMarket"""
     
@@ -38,6 +85,17 @@ class MCPManager:
             self.config = self._load_config()
         
         self.active_clients: Dict[str, Tuple[MCPClient, Any]] = {}  # (client, session)
+        # Serialises lookup, start and close of active clients (agents are built on worker threads)
+        self._clients_lock = threading.Lock()
+        
+        # Tool catalog cache: mcp_name -> (process generation, tools)
+        self._client_generations: Dict[str, int] = {}
+        self._tool_catalog: Dict[str, Tuple[int, List[Any]]] = {}
+        self._catalog_lock = threading.Lock()
+        
+        # A2A client provider cache: server_url -> (created_at, provider, tools)
+        self._a2a_providers: Dict[str, Tuple[float, Any, List[Any]]] = {}
+        self._a2a_lock = threading.Lock()
     
     def _load_config(self) -> Dict[str, Any]:
         """Load MCP configuration from file"""
@@ -106,14 +164,21 @@ class MCPManager:
             # Add wallet credentials to environment
             env_vars.update(credentials)
             
+            server_parameters = StdioServerParameters(
+                command=server_config["command"],
+                args=server_config["args"],
+                env=env_vars if env_vars else None
+            )
+            
+            @asynccontextmanager
+            async def transport():
+                # Watch the server's notifications so the tool catalog is refreshed on change
+                async with stdio_client(server_parameters) as (read_stream, write_stream):
+                    tap = _ToolListChangeTap(read_stream, lambda: self.on_tools_list_changed(mcp_name))
+                    yield tap, write_stream
+            
             # Create MCP client with environment variables
-            client = MCPClient(lambda: stdio_client(
-                StdioServerParameters(
-                    command=server_config["command"],
-                    args=server_config["args"],
-                    env=env_vars if env_vars else None
-                )
-            ))
+            client = MCPClient(transport)
             logger.info(f"Created MCP client for {mcp_name}")
             return client
         except Exception as e:
@@ -139,11 +204,14 @@ class MCPManager:
         persistent_clients = {}
         
         for mcp_name in required_mcps:
-            if mcp_name in self.active_clients:
-                # Reuse existing client
-                persistent_clients[mcp_name] = self.active_clients[mcp_name]
-                logger.info(f"Reusing existing MCP client for {mcp_name}")
-            else:
+            # Held across check, create and start so concurrent cold turns share one subprocess
+            with self._clients_lock:
+                if mcp_name in self.active_clients:
+                    # Reuse existing client
+                    persistent_clients[mcp_name] = self.active_clients[mcp_name]
+                    logger.info(f"Reusing existing MCP client for {mcp_name}")
+                    continue
+                
                 # Create new persistent client
                 client = self.create_mcp_client(mcp_name)
                 if not client:
@@ -155,12 +223,46 @@ class MCPManager:
                     session = client.__enter__()
                     persistent_clients[mcp_name] = (client, session)
                     self.active_clients[mcp_name] = (client, session)
+                    with self._catalog_lock:
+                        self._client_generations[mcp_name] = self._client_generations.get(mcp_name, 0) + 1
+                        self._tool_catalog.pop(mcp_name, None)
                     logger.info(f"Initialized persistent MCP client for {mcp_name}")
                 except Exception as e:
                     logger.error(f"Failed to initialize MCP client {mcp_name}: {e}")
+                    continue
+            
+            try:
+                # Fill the tool catalog once at client start
+                self.get_client_tools(mcp_name, client)
+            except Exception as e:
+                logger.error(f"Failed to list tools for {mcp_name}: {e}")
         
         return persistent_clients
     
+    def get_client_tools(self, mcp_name: str, client: MCPClient) -> List[Any]:
+        """Get the tool catalog for an MCP client, listing tools only when the cache is cold"""
+        with self._catalog_lock:
+            generation = self._client_generations.get(mcp_name, 0)
+            cached = self._tool_catalog.get(mcp_name)
+            if cached is not None and cached[0] == generation:
+                return list(cached[1])
+        
+        tools = client.list_tools_sync()
+        
+        with self._catalog_lock:
+            # Only store if the client wasn't restarted while listing
+            if self._client_generations.get(mcp_name, 0) == generation:
+                self._tool_catalog[mcp_name] = (generation, list(tools))
+        
+        logger.info(f"Cached {len(tools)} tools for {mcp_name} (generation {generation})")
+        return list(tools)
+    
+    def on_tools_list_changed(self, mcp_name: str):
+        """Invalidate the cached tool catalog after a tools/list_changed notification"""
+        with self._catalog_lock:
+            if self._tool_catalog.pop(mcp_name, None) is not None:
+                logger.info(f"Tool list changed for {mcp_name}, catalog invalidated")
+    
     def get_a2a_client_tools(self, a2a_status: dict) -> List[Any]:
         """Get A2A client tools for running servers"""
         if not STRANDS_AVAILABLE or A2AClientToolProvider is None:
@@ -176,16 +278,10 @@ class MCPManager:
                     agent_name = server.get("agent_name", f"Agent-{port}")
                     
                     try:
-                        # Create A2A client provider for this specific server
-                        provider = A2AClientToolProvider(
-                            known_agent_urls=[f"http://127.0.0.1:{port}"]
-                        )
-                        
-                        # Get tools from this provider
-                        server_tools = provider.tools
+                        server_tools = self._get_a2a_provider_tools(f"http://127.0.0.1:{port}")
                         a2a_tools.extend(server_tools)
                         
-                        logger.info(f"Loaded {len(server_tools)} A2A tools from {agent_name} (port {port})")
+                        logger.debug(f"Using {len(server_tools)} A2A tools from {agent_name} (port {port})")
                         
                     except Exception as e:
                         logger.error(f"Failed to load A2A tools from {agent_name} (port {port}): {e}")
@@ -197,6 +293,39 @@ class MCPManager:
         
         return a2a_tools
     
+    def _get_a2a_provider_tools(self, server_url: str) -> List[Any]:
+        """Get tools for an A2A server from the provider cache, creating the provider when missing or expired"""
+        now = time.time()
+        with self._a2a_lock:
+            cached = self._a2a_providers.get(server_url)
+            if cached is not None and (A2A_PROVIDER_TTL <= 0 or now - cached[0] < A2A_PROVIDER_TTL):
+                return list(cached[2])
+        
+        # Create A2A client provider for this specific server; it keeps the
+        # agent cards it resolves, so sharing it avoids re-fetching them every turn
+        provider = A2AClientToolProvider(known_agent_urls=[server_url])
+        tools = list(provider.tools)
+        
+        with self._a2a_lock:
+            self._a2a_providers[server_url] = (now, provider, tools)
+        
+        logger.info(f"Cached A2A client provider for {server_url} ({len(tools)} tools)")
+        return list(tools)
+    
+    def invalidate_a2a_providers(self, server_urls: Optional[List[str]] = None):
+        """Drop cached A2A client providers for the given server URLs (or all of them)"""
+        with self._a2a_lock:
+            if server_urls is None:
+                self._a2a_providers.clear()
+            else:
+                for url in server_urls:
+                    self._a2a_providers.pop(url, None)
+        logger.info(f"Invalidated A2A client providers: {server_urls or 'all'}")
+    
+    def on_a2a_servers_changed(self, event: str, ports: List[int]):
+        """Refresh cached A2A providers when A2A servers start or stop"""
+        self.invalidate_a2a_providers([f"http://127.0.0.1:{port}" for port in ports])
+    
     def get_mcp_tools(self, trading_chain: str, a2a_status: dict = None) -> Tuple[List[Any], Dict[str, Tuple[MCPClient, Any]]]:
         """Get all tools for a specific trading chain and return persistent clients"""
         if not STRANDS_AVAILABLE:
@@ -210,8 +339,8 @@ class MCPManager:
         # Get MCP tools
         for mcp_name, (client, session) in persistent_clients.items():
             try:
-                # Extract tools from the persistent session
-                tools = client.list_tools_sync()
+                # Serve tools from the catalog cache (listed once per client process)
+                tools = self.get_client_tools(mcp_name, client)
                 all_tools.extend(tools)
                 logger.info(f"Successfully collected {len(tools)} tools from {mcp_name}")
             except Exception as e:
@@ -227,6 +356,10 @@ class MCPManager:
     
     def close_clients(self, trading_chain: str = None):
         """Close MCP clients for a specific chain or all clients"""
+        with self._clients_lock:
+            self._close_clients_locked(trading_chain)
+    
+    def _close_clients_locked(self, trading_chain: str = None):
         if trading_chain:
             # Close specific chain clients
             required_mcps = self.get_required_mcps_for_chain(trading_chain)
@@ -240,6 +373,7 @@ class MCPManager:
                         logger.error(f"Error closing MCP client {mcp_name}: {e}")
                     finally:
                         del self.active_clients[mcp_name]
+                        self._invalidate_tool_catalog(mcp_name)
         else:
             # Close all clients
             for mcp_name, (client, session) in self.active_clients.items():
@@ -248,8 +382,14 @@ class MCPManager:
                     logger.info(f"Closed MCP client for {mcp_name}")
                 except Exception as e:
                     logger.error(f"Error closing MCP client {mcp_name}: {e}")
+                self._invalidate_tool_catalog(mcp_name)
             self.active_clients.clear()
     
+    def _invalidate_tool_catalog(self, mcp_name: str):
+        """Drop the cached catalog for a client that is shutting down"""
+        with self._catalog_lock:
+            self._tool_catalog.pop(mcp_name, None)
+    
     def is_available(self) -> bool:
         """Check if MCP functionality is available"""
         return STRANDS_AVAILABLE and bool(self._get_wallet_credentials())
@@ -261,6 +401,11 @@ class MCPManager:
             "strands_available": STRANDS_AVAILABLE,
             "wallet_configured": bool(self._get_wallet_credentials()),
             "active_clients": len(self.active_clients),
+            "tool_catalog": {
+                name: {"generation": generation, "tools": len(tools)}
+                for name, (generation, tools) in self._tool_catalog.items()
+            },
+            "a2a_providers": len(self._a2a_providers),
             "supported_chains": list(self.config.get("chain_mappings", {}).keys())
         }
 
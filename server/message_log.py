@@ -0,0 +1,367 @@
+"""
+Segmented message log storage for KiloMarket sessions
+Appends an agent's messages to size-capped JSONL segments with a fixed-width offset index, instead of one file per message
+
+Layout under sessions/session_<id>/agents/agent_<id>/:
+    log/segment_000000.jsonl   one JSON record per line (the same content as a message_<id>.json file)
+    log/index.bin              one 16-byte entry per message id: segment number, byte offset, record length
+
+Message updates append a new version of the record, so segments keep superseded versions until compacted.
+
+Usage:
+    python -m server.message_log migrate [--sessions-dir sessions] [--session-id ID] [--keep-files]
+    python -m server.message_log reindex [--sessions-dir sessions]
+    python -m server.message_log compact [--sessions-dir sessions] [--session-id ID]   (with the server stopped)
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import shutil
+import struct
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+# Try to import the Strands file session storage, but handle gracefully if not available
+try:
+    from strands.session.file_session_manager import FileSessionManager
+    from strands.types.exceptions import SessionException
+    from strands.types.session import SessionMessage
+    FILE_SESSION_MANAGER_AVAILABLE = True
+except ImportError:
+    FileSessionManager = object
+    SessionException = Exception
+    SessionMessage = None
+    FILE_SESSION_MANAGER_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_LOG_DIR = "log"
+INDEX_FILE = "index.bin"
+SEGMENT_PREFIX = "segment_"
+SEGMENT_SUFFIX = ".jsonl"
+
+# A new segment is started once the current one reaches this size
+SEGMENT_MAX_BYTES = int(os.getenv("KILOMARKET_LOG_SEGMENT_BYTES", str(4 * 1024 * 1024)))
+
+# Index entry: segment number, byte offset, record length (0 = no message with this id)
+_ENTRY = struct.Struct("<IQI")
+
+# One lock per log directory, shared by every MessageLog opened on it
+_log_locks: Dict[str, threading.Lock] = {}
+_log_locks_guard = threading.Lock()
+
+
+def _lock_for(log_dir: str) -> threading.Lock:
+    key = os.path.realpath(log_dir)
+    with _log_locks_guard:
+        return _log_locks.setdefault(key, threading.Lock())
+
+
+class MessageLog:
+    """Append-only message log of one agent, addressed by message id through the offset index
+
+    Strands numbers an agent's messages 0, 1, 2, ..., so entry N of the index belongs to message N
+    and reads, ranges and counts are seeks rather than directory scans.
+    """
+
+    def __init__(self, log_dir: str, segment_max_bytes: int = SEGMENT_MAX_BYTES):
+        self.log_dir = log_dir
+        self.segment_max_bytes = segment_max_bytes
+        self._lock = _lock_for(log_dir)
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.log_dir, INDEX_FILE)
+
+    def segment_path(self, segment: int) -> str:
+        return os.path.join(self.log_dir, f"{SEGMENT_PREFIX}{segment:06d}{SEGMENT_SUFFIX}")
+
+    def exists(self) -> bool:
+        return os.path.exists(self.index_path)
+
+    def count(self) -> int:
+        """Number of message ids in the index (ids are contiguous, so this is the message count)"""
+        try:
+            return os.path.getsize(self.index_path) // _ENTRY.size
+        except OSError:
+            return 0
+
+    def segments(self) -> List[int]:
+        """Segment numbers present on disk, in order"""
+        try:
+            names = os.listdir(self.log_dir)
+        except OSError:
+            return []
+        return sorted(
+            int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+            for name in names if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+        )
+
+    def _read_entries(self, start: int, stop: int) -> List[Tuple[int, int, int]]:
+        if stop <= start:
+            return []
+        try:
+            with open(self.index_path, "rb") as f:
+                f.seek(start * _ENTRY.size)
+                data = f.read((stop - start) * _ENTRY.size)
+        except OSError:
+            return []
+        return [_ENTRY.unpack_from(data, position) for position in range(0, len(data) - _ENTRY.size + 1, _ENTRY.size)]
+
+    def record_size(self, message_id: int) -> int:
+        """Bytes taken by the current record of a message (0 if there is none)"""
+        entries = self._read_entries(message_id, message_id + 1)
+        return entries[0][2] if entries else 0
+
+    def read(self, message_id: int) -> Optional[Dict[str, Any]]:
+        """Current record of one message, or None"""
+        records = self.read_range(message_id, message_id + 1)
+        return records[0] if records else None
+
+    def read_range(self, start: int, stop: int) -> List[Dict[str, Any]]:
+        """Records of message ids start..stop-1 in id order (ids without a record are skipped)"""
+        start = max(0, start)
+        stop = min(stop, self.count())
+        records = []
+        handles = {}
+        try:
+            for segment, offset, length in self._read_entries(start, stop):
+                if not length:
+                    continue
+                handle = handles.get(segment)
+                if handle is None:
+                    handle = handles[segment] = open(self.segment_path(segment), "rb")
+                handle.seek(offset)
+                records.append(json.loads(handle.read(length)))
+        finally:
+            for handle in handles.values():
+                handle.close()
+        return records
+
+    def append(self, message_id: int, record: Dict[str, Any]) -> int:
+        """Append a message record (a new message or a new version of one); returns the bytes written"""
+        line = json.dumps(record, ensure_ascii=False, default=str).encode("utf-8") + b"\n"
+        with self._lock:
+            os.makedirs(self.log_dir, exist_ok=True)
+            segments = self.segments()
+            segment = segments[-1] if segments else 0
+            segment_path = self.segment_path(segment)
+            if os.path.exists(segment_path) and os.path.getsize(segment_path) >= self.segment_max_bytes:
+                segment += 1
+                segment_path = self.segment_path(segment)
+
+            with open(segment_path, "ab") as f:
+                offset = f.tell()
+                f.write(line)
+
+            # The record is durable before the index points at it; reindex recovers a lost entry
+            entry = _ENTRY.pack(segment, offset, len(line))
+            count = self.count()
+            if message_id >= count:
+                with open(self.index_path, "ab") as f:
+                    f.write(_ENTRY.pack(0, 0, 0) * (message_id - count) + entry)
+            else:
+                with open(self.index_path, "r+b") as f:
+                    f.seek(message_id * _ENTRY.size)
+                    f.write(entry)
+        return len(line)
+
+    def reindex(self) -> int:
+        """Rebuild the offset index from the segments (the last record of each id wins); returns the count"""
+        with self._lock:
+            entries: Dict[int, Tuple[int, int, int]] = {}
+            for segment in self.segments():
+                offset = 0
+                with open(self.segment_path(segment), "rb") as f:
+                    for line in f:
+                        try:
+                            message_id = int(json.loads(line)["message_id"])
+                        except (ValueError, KeyError, TypeError):
+                            # A torn final write; anything after it is not indexed
+                            logger.warning(f"Skipping unreadable record in {self.segment_path(segment)} at {offset}")
+                            offset += len(line)
+                            continue
+                        entries[message_id] = (segment, offset, len(line))
+                        offset += len(line)
+
+            count = max(entries) + 1 if entries else 0
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(b"".join(_ENTRY.pack(*entries.get(message_id, (0, 0, 0))) for message_id in range(count)))
+            os.replace(tmp_path, self.index_path)
+            return len(entries)
+
+    def compact(self) -> int:
+        """Copy the current record of every message into fresh segments and delete the old ones
+
+        Superseded versions left behind by updates are dropped. The new segments are numbered after the
+        old ones and the index is swapped in before anything is deleted, so an interrupted compaction
+        leaves a log that still reads (and reindexes) correctly. Readers are not locked out, so run it
+        while the server is stopped. Returns the bytes reclaimed.
+        """
+        with self._lock:
+            old_segments = self.segments()
+            if not old_segments:
+                return 0
+            old_bytes = sum(os.path.getsize(self.segment_path(segment)) for segment in old_segments)
+
+            entries = []
+            segment = old_segments[-1] + 1
+            out = None
+            handles = {}
+            try:
+                for source, offset, length in self._read_entries(0, self.count()):
+                    if not length:
+                        entries.append((0, 0, 0))
+                        continue
+                    handle = handles.get(source)
+                    if handle is None:
+                        handle = handles[source] = open(self.segment_path(source), "rb")
+                    handle.seek(offset)
+                    record = handle.read(length)
+
+                    if out is None or out.tell() >= self.segment_max_bytes:
+                        if out is not None:
+                            out.close()
+                            segment += 1
+                        out = open(self.segment_path(segment), "wb")
+                    entries.append((segment, out.tell(), length))
+                    out.write(record)
+            finally:
+                if out is not None:
+                    out.close()
+                for handle in handles.values():
+                    handle.close()
+
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(b"".join(_ENTRY.pack(*entry) for entry in entries))
+            os.replace(tmp_path, self.index_path)
+
+            for old in old_segments:
+                os.remove(self.segment_path(old))
+            new_bytes = sum(os.path.getsize(self.segment_path(new)) for new in self.segments())
+            return old_bytes - new_bytes
+
+
+def find_message_log(agent_dir: str) -> Optional[MessageLog]:
+    """The agent's message log, if the agent uses log storage"""
+    log = MessageLog(os.path.join(agent_dir, MESSAGE_LOG_DIR))
+    return log if log.exists() else None
+
+
+class SegmentedLogSessionManager(FileSessionManager):
+    """Strands session manager storing session and agent state as files and messages in a MessageLog"""
+
+    def _message_log(self, session_id: str, agent_id: str) -> MessageLog:
+        return MessageLog(os.path.join(self._get_agent_path(session_id, agent_id), MESSAGE_LOG_DIR))
+
+    def message_size(self, session_id: str, agent_id: str, message_id: int) -> int:
+        return self._message_log(session_id, agent_id).record_size(message_id)
+
+    def create_message(self, session_id: str, agent_id: str, session_message, **kwargs):
+        self._message_log(session_id, agent_id).append(session_message.message_id, session_message.to_dict())
+
+    def read_message(self, session_id: str, agent_id: str, message_id: int, **kwargs):
+        record = self._message_log(session_id, agent_id).read(message_id)
+        return SessionMessage.from_dict(record) if record else None
+
+    def update_message(self, session_id: str, agent_id: str, session_message, **kwargs):
+        log = self._message_log(session_id, agent_id)
+        if not log.record_size(session_message.message_id):
+            raise SessionException(f"Message {session_message.message_id} does not exist")
+        log.append(session_message.message_id, session_message.to_dict())
+
+    def list_messages(self, session_id: str, agent_id: str, limit: Optional[int] = None, offset: int = 0,
+                      **kwargs) -> List[Any]:
+        log = self._message_log(session_id, agent_id)
+        stop = log.count() if limit is None else offset + limit
+        return [SessionMessage.from_dict(record) for record in log.read_range(offset, stop)]
+
+
+def _message_files(messages_dir: str) -> List[Tuple[int, str]]:
+    files = []
+    for path in glob.glob(os.path.join(messages_dir, "message_*.json")):
+        try:
+            files.append((int(os.path.basename(path)[len("message_"):-len(".json")]), path))
+        except ValueError:
+            continue
+    return sorted(files)
+
+
+def migrate_agent(agent_dir: str, keep_files: bool = False) -> int:
+    """Move an agent's message_<id>.json files into a message log; returns the number migrated
+
+    The log is written to a temporary directory and renamed into place, so an interrupted
+    migration leaves the original files untouched.
+    """
+    messages_dir = os.path.join(agent_dir, "messages")
+    files = _message_files(messages_dir)
+    log_dir = os.path.join(agent_dir, MESSAGE_LOG_DIR)
+    if not files or os.path.exists(os.path.join(log_dir, INDEX_FILE)):
+        return 0
+
+    tmp_dir = log_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    log = MessageLog(tmp_dir)
+    for message_id, path in files:
+        with open(path, "r", encoding="utf-8") as f:
+            log.append(message_id, json.load(f))
+
+    # Check every message reads back before the originals go
+    migrated = {record.get("message_id") for record in log.read_range(0, log.count())}
+    missing = [message_id for message_id, _ in files if message_id not in migrated]
+    if missing:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise RuntimeError(f"Migration of {agent_dir} lost messages {missing[:10]}")
+
+    os.replace(tmp_dir, log_dir)
+    if not keep_files:
+        for _, path in files:
+            os.remove(path)
+    return len(files)
+
+
+def _agent_dirs(sessions_dir: str, session_id: Optional[str] = None) -> List[str]:
+    session_pattern = f"session_{session_id}" if session_id else "session_*"
+    return sorted(glob.glob(os.path.join(sessions_dir, session_pattern, "agents", "agent_*")))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m server.message_log",
+                                     description="Manage segmented message log storage")
+    parser.add_argument("command", choices=["migrate", "reindex", "compact"],
+                        help="migrate: convert message_<id>.json files to logs; reindex: rebuild offset indexes; "
+                             "compact: drop superseded message versions (run with the server stopped)")
+    parser.add_argument("--sessions-dir", default="sessions", help="sessions directory (default: ./sessions)")
+    parser.add_argument("--session-id", help="only this session")
+    parser.add_argument("--keep-files", action="store_true", help="keep the message files after migrating")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    agent_dirs = _agent_dirs(args.sessions_dir, args.session_id)
+
+    if args.command == "migrate":
+        total = 0
+        for agent_dir in agent_dirs:
+            migrated = migrate_agent(agent_dir, keep_files=args.keep_files)
+            if migrated:
+                logger.info(f"Migrated {migrated} message(s) in {agent_dir}")
+            total += migrated
+        print(f"Migrated {total} message(s) across {len(agent_dirs)} agent(s)")
+    elif args.command == "reindex":
+        logs = [log for log in (find_message_log(agent_dir) for agent_dir in agent_dirs) if log]
+        total = sum(log.reindex() for log in logs)
+        print(f"Reindexed {total} message(s) across {len(logs)} log(s)")
+    else:
+        logs = [log for log in (find_message_log(agent_dir) for agent_dir in agent_dirs) if log]
+        reclaimed = sum(log.compact() for log in logs)
+        # The session index picks up the smaller sizes on its next counter verification pass
+        print(f"Compacted {len(logs)} log(s), reclaimed {reclaimed} bytes")
+
+
+if __name__ == "__main__":
+    main()
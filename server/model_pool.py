@@ -0,0 +1,294 @@
+"""
+Model client pool for KiloMarket
+Shares Strands model instances (and their SDK clients / keep-alive connections) across agents
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Try to import strands model components, but handle gracefully if not available
+STRANDS_AVAILABLE = False
+BedrockModel = None
+AnthropicModel = None
+GeminiModel = None
+OpenAIModel = None
+
+try:
+    from strands.models import BedrockModel
+    from strands.models.anthropic import AnthropicModel
+    from strands.models.gemini import GeminiModel
+    from strands.models.openai import OpenAIModel
+    STRANDS_AVAILABLE = True
+except ImportError as e:
+    logging.warning(f"StrandsAgents models not available: {e}. Model pooling will be limited.")
+    STRANDS_AVAILABLE = False
+
+from .prompt_cache import anthropic_model_class, bedrock_cache_config
+from .replay_model import REPLAY_PROVIDER, RecordingModel, build_replay_model, resolve_recording_file, stream_recorder
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BEDROCK_REGION = "us-east-1"
+
+
+def credential_fingerprint(secret: Optional[str]) -> str:
+    """Short, non-reversible fingerprint of a credential for use in cache keys"""
+    if not secret:
+        return ""
+    return hashlib.sha256(secret.encode("utf-8")).hexdigest()[:16]
+
+
+def _aws_credential_fingerprint() -> str:
+    """Fingerprint the ambient AWS credentials used by Bedrock (env/profile based)"""
+    parts = [os.getenv("AWS_PROFILE", ""), os.getenv("AWS_ACCESS_KEY_ID", "")]
+    return credential_fingerprint("|".join(parts)) if any(parts) else ""
+
+
+class ModelClientPool:
+    """Process-wide registry of model clients keyed by provider configuration"""
+
+    def __init__(self):
+        self._models: Dict[Tuple, Any] = {}
+        self._boto_sessions: Dict[Tuple[str, str], Any] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+        # Extra providers (stub/replay models) registered at runtime: provider -> builder(spec)
+        self._builders: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+
+    def get_model(self, provider: str, config: Dict[str, Any]):
+        """Get a shared model for an AI provider configuration, building it on first use"""
+        if not STRANDS_AVAILABLE:
+            raise ImportError("StrandsAgents SDK is not available. Please install strands-agents package.")
+
+        spec = self._resolve_spec(provider, config)
+        key = self._model_key(spec)
+
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._stats["hits"] += 1
+                return model
+
+            # Every provider call made through a pooled model passes admission control
+            from .admission import admission_controller
+            model = self._build_model(spec)
+            if stream_recorder is not None and provider != REPLAY_PROVIDER and provider not in self._builders:
+                # Capture real provider streams for later replay
+                model = RecordingModel(model, provider, spec["model_id"], stream_recorder)
+            model = admission_controller.wrap_model(model, provider, spec["model_id"])
+            self._models[key] = model
+            self._stats["misses"] += 1
+            logger.info(f"Created pooled {provider} model client: {spec['model_id']}")
+            return model
+
+    def register_provider(self, provider: str, builder: Callable[[Dict[str, Any]], Any]):
+        """Register a model builder for a provider the pool does not know natively"""
+        with self._lock:
+            self._builders[provider] = builder
+        self.evict(provider)
+
+    def resolve_model_id(self, provider: str, config: Dict[str, Any]) -> Optional[str]:
+        """Get the model id a provider configuration resolves to (None if the config is invalid)"""
+        try:
+            return self._resolve_spec(provider, config)["model_id"]
+        except ValueError:
+            return None
+
+    def get_bedrock_model(self, model_id: str, region_name: str = DEFAULT_BEDROCK_REGION):
+        """Get a shared Bedrock model (used by the A2A service agents)"""
+        return self.get_model("amazon_bedrock", {"model_id": model_id, "region_name": region_name})
+
+    def get_boto_session(self, region_name: str = DEFAULT_BEDROCK_REGION):
+        """Get a shared boto3 session for a region"""
+        import boto3
+
+        key = (region_name, _aws_credential_fingerprint())
+        with self._lock:
+            session = self._boto_sessions.get(key)
+            if session is None:
+                session = boto3.Session(region_name=region_name)
+                self._boto_sessions[key] = session
+            return session
+
+    def evict(self, provider: Optional[str] = None) -> int:
+        """Evict pooled models for a provider (or all providers); agents already holding them are unaffected"""
+        with self._lock:
+            keys = [key for key in self._models if provider is None or key[0] == provider]
+            for key in keys:
+                del self._models[key]
+            if provider is None or provider == "amazon_bedrock":
+                self._boto_sessions.clear()
+            self._stats["evictions"] += len(keys)
+
+        if keys:
+            logger.info(f"Evicted {len(keys)} pooled model client(s) for {provider or 'all providers'}")
+        return len(keys)
+
+    def clear(self) -> int:
+        """Evict every pooled model"""
+        return self.evict()
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get pool status and counters"""
+        with self._lock:
+            return {
+                "models": len(self._models),
+                "boto_sessions": len(self._boto_sessions),
+                "providers": sorted({key[0] for key in self._models}),
+                **self._stats
+            }
+
+    def _resolve_spec(self, provider: str, config: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply provider defaults and validate credentials"""
+        if provider in self._builders:
+            return {
+                "provider": provider,
+                "model_id": config.get('model_id', provider),
+                "params": {key: value for key, value in config.items() if key not in ('model_id', 'api_key')}
+            }
+
+        elif provider == "anthropic":
+            api_key = config.get('api_key')
+            if not api_key:
+                raise ValueError("API key is required for Anthropic provider")
+            return {
+                "provider": provider,
+                "api_key": api_key,
+                "model_id": config.get('model_id', 'claude-sonnet-4-5-20250929'),
+                "params": {"max_tokens": config.get('max_tokens', 4096)}
+            }
+
+        elif provider == "openai_compatible":
+            api_key = config.get('api_key')
+            if not api_key:
+                raise ValueError("API key is required for OpenAI Compatible provider")
+            return {
+                "provider": provider,
+                "api_key": api_key,
+                "model_id": config.get('model_id', 'gpt-4o'),
+                "base_url": config.get('base_url') or None,
+                "params": {
+                    "max_tokens": config.get('max_tokens', 4000),
+                    "temperature": config.get('temperature', 0.7)
+                }
+            }
+
+        elif provider == "amazon_bedrock":
+            return {
+                "provider": provider,
+                "model_id": config.get('model_id', 'us.anthropic.claude-sonnet-4-5-20250929-v1:0'),
+                "region_name": config.get('region_name', DEFAULT_BEDROCK_REGION),
+                "params": {}
+            }
+
+        elif provider == "gemini":
+            api_key = config.get('api_key')
+            if not api_key:
+                raise ValueError("API key is required for Gemini provider")
+            return {
+                "provider": provider,
+                "api_key": api_key,
+                "model_id": config.get('model_id', 'gemini-2.5-flash'),
+                "params": {
+                    "temperature": config.get('temperature', 0.7),
+                    "max_output_tokens": config.get('max_output_tokens', 2048),
+                    "top_p": config.get('top_p', 0.9),
+                    "top_k": config.get('top_k', 40)
+                }
+            }
+
+        elif provider == REPLAY_PROVIDER:
+            recording_file = config.get('recording_file')
+            if not recording_file:
+                raise ValueError("Recording file is required for Replay provider")
+            # The path comes from the settings UI; only recordings under KILOMARKET_RECORD_DIR are readable
+            recording_file = resolve_recording_file(recording_file)
+            return {
+                "provider": provider,
+                "model_id": config.get('model_id') or f"replay:{os.path.basename(recording_file)}",
+                "params": {
+                    "recording_file": recording_file,
+                    "mode": config.get('mode') or "realtime",
+                    "speed": float(config.get('speed') or 10)
+                }
+            }
+
+        else:
+            raise ValueError(f"Unsupported AI provider: {provider}")
+
+    def _model_key(self, spec: Dict[str, Any]) -> Tuple:
+        """Build the pool key: (provider, model_id, base_url, region, credential fingerprint, params)"""
+        if spec["provider"] == "amazon_bedrock":
+            credentials = _aws_credential_fingerprint()
+        else:
+            credentials = credential_fingerprint(spec.get("api_key"))
+
+        return (
+            spec["provider"],
+            spec["model_id"],
+            spec.get("base_url"),
+            spec.get("region_name"),
+            credentials,
+            json.dumps(spec["params"], sort_keys=True, default=str)
+        )
+
+    def _build_model(self, spec: Dict[str, Any]):
+        """Construct the Strands model for a resolved spec"""
+        provider = spec["provider"]
+
+        if provider in self._builders:
+            return self._builders[provider](spec)
+
+        elif provider == "anthropic":
+            # The caching subclass marks the system prompt and tools with cache_control breakpoints
+            return anthropic_model_class()(
+                client_args={"api_key": spec["api_key"]},
+                model_id=spec["model_id"],
+                max_tokens=spec["params"]["max_tokens"]
+            )
+
+        elif provider == "openai_compatible":
+            # OpenAI-compatible endpoints reuse cached prefixes automatically; the stable
+            # system prompt and tool order are what make the prefix match across turns
+            client_args = {"api_key": spec["api_key"]}
+            if spec.get("base_url"):
+                client_args["base_url"] = spec["base_url"]
+            return OpenAIModel(
+                client_args=client_args,
+                model_id=spec["model_id"],
+                params=spec["params"]
+            )
+
+        elif provider == "amazon_bedrock":
+            # Called with the pool lock held; boto session creation must not re-enter it
+            import boto3
+            key = (spec["region_name"], _aws_credential_fingerprint())
+            boto_session = self._boto_sessions.get(key)
+            if boto_session is None:
+                boto_session = boto3.Session(region_name=spec["region_name"])
+                self._boto_sessions[key] = boto_session
+            return BedrockModel(
+                model_id=spec["model_id"],
+                boto_session=boto_session,
+                **bedrock_cache_config(spec["model_id"])
+            )
+
+        elif provider == "gemini":
+            return GeminiModel(
+                client_args={"api_key": spec["api_key"]},
+                model_id=spec["model_id"],
+                params=spec["params"]
+            )
+
+        elif provider == REPLAY_PROVIDER:
+            return build_replay_model(spec)
+
+        raise ValueError(f"Unsupported AI provider: {provider}")
+
+
+# Global model client pool instance
+model_pool = ModelClientPool()
@@ -0,0 +1,120 @@
+"""
+Provider prompt caching for KiloMarket
+Marks the static system prompt and tool list as a cacheable prefix and counts cache hits/misses
+"""
+
+import logging
+import os
+import threading
+from typing import Any, Dict
+
+# Try to import the Anthropic model, but handle gracefully if not available
+AnthropicModel = None
+try:
+    from strands.models.anthropic import AnthropicModel
+except ImportError:
+    AnthropicModel = None
+
+logger = logging.getLogger(__name__)
+
+PROMPT_CACHE_ENABLED = os.getenv("KILOMARKET_PROMPT_CACHE", "1").lower() not in ("0", "false", "no", "off")
+
+
+def bedrock_cache_config(model_id: str) -> Dict[str, Any]:
+    """BedrockModel config adding cache points after the system prompt (and tools, where supported)"""
+    if not PROMPT_CACHE_ENABLED:
+        return {}
+
+    model_id = model_id.lower()
+    if "anthropic.claude" in model_id:
+        return {"cache_prompt": "default", "cache_tools": "default"}
+    if "amazon.nova" in model_id:
+        # Nova caches system/message prefixes but not tool definitions
+        return {"cache_prompt": "default"}
+    return {}
+
+
+if AnthropicModel is not None:
+    class CachingAnthropicModel(AnthropicModel):
+        """AnthropicModel that adds cache_control breakpoints to the tools and system prompt"""
+
+        def format_request(self, *args, **kwargs) -> Dict[str, Any]:
+            request = super().format_request(*args, **kwargs)
+
+            # Tools come first in the prompt; a breakpoint on the last tool caches the whole list
+            tools = request.get("tools")
+            if tools:
+                tools[-1] = {**tools[-1], "cache_control": {"type": "ephemeral"}}
+
+            system = request.get("system")
+            if isinstance(system, str) and system:
+                request["system"] = [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}]
+            return request
+
+        def format_chunk(self, event: Dict[str, Any]):
+            chunk = super().format_chunk(event)
+            # Surface Anthropic's cache counters in the Strands usage block
+            try:
+                if event.get("type") == "metadata" and "metadata" in chunk:
+                    usage = event.get("usage") or {}
+                    chunk["metadata"]["usage"]["cacheReadInputTokens"] = usage.get("cache_read_input_tokens") or 0
+                    chunk["metadata"]["usage"]["cacheWriteInputTokens"] = usage.get("cache_creation_input_tokens") or 0
+            except Exception as e:
+                logger.debug(f"Could not read Anthropic cache usage: {e}")
+            return chunk
+else:
+    CachingAnthropicModel = None
+
+
+def anthropic_model_class():
+    """Model class to use for the Anthropic provider"""
+    if PROMPT_CACHE_ENABLED and CachingAnthropicModel is not None:
+        return CachingAnthropicModel
+    return AnthropicModel
+
+
+class PromptCacheStats:
+    """Process-wide prompt cache hit/miss counters, fed from model usage metadata"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.unknown = 0
+        self.cache_read_tokens = 0
+        self.cache_write_tokens = 0
+
+    def record(self, usage: Dict[str, Any]) -> str:
+        """Record one model call's usage; returns 'hit', 'miss', or 'unknown' if the provider reports no cache usage"""
+        read = usage.get("cacheReadInputTokens", 0) or 0
+        write = usage.get("cacheWriteInputTokens", 0) or 0
+        with self._lock:
+            self.cache_read_tokens += read
+            self.cache_write_tokens += write
+            if "cacheReadInputTokens" not in usage and "cacheWriteInputTokens" not in usage:
+                # OpenAI-compatible, Gemini and stub models do not say; counting these as misses skews the rate
+                self.unknown += 1
+                return "unknown"
+            if read > 0:
+                self.hits += 1
+                return "hit"
+            self.misses += 1
+            return "miss"
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get counter values"""
+        with self._lock:
+            calls = self.hits + self.misses
+            return {
+                "enabled": PROMPT_CACHE_ENABLED,
+                "hits": self.hits,
+                "misses": self.misses,
+                "unknown": self.unknown,
+                "hit_rate": round(self.hits / calls, 3) if calls else None,
+                "cache_read_tokens": self.cache_read_tokens,
+                "cache_write_tokens": self.cache_write_tokens
+            }
+
+
+# Global prompt cache stats instance
+prompt_cache_stats = PromptCacheStats()
@@ -0,0 +1,318 @@
+"""
+Record-and-replay model provider for KiloMarket
+Captures real provider streams (events and their timing) to JSONL and replays them as the "replay" AI provider
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Strands model base class, used by the recording and replay models
+try:
+    from strands.models.model import Model
+except ImportError:
+    Model = object
+
+logger = logging.getLogger(__name__)
+
+REPLAY_PROVIDER = "replay"
+
+# Replay timing modes
+REPLAY_REALTIME = "realtime"        # original inter-event timing
+REPLAY_ACCELERATED = "accelerated"  # original timing divided by speed
+REPLAY_INSTANT = "instant"          # no delays
+REPLAY_MODES = [REPLAY_REALTIME, REPLAY_ACCELERATED, REPLAY_INSTANT]
+DEFAULT_REPLAY_SPEED = 10.0
+
+# Set to a directory to record every pooled provider stream (one JSONL file per provider/model);
+# the replay provider only reads recordings from this directory
+RECORD_DIR = os.getenv("KILOMARKET_RECORD_DIR", "")
+
+# Recorded call kinds
+KIND_STREAM = "stream"
+KIND_STRUCTURED_OUTPUT = "structured_output"
+
+
+class ReplayUnavailable(Exception):
+    """Raised when a recording has nothing to replay for the requested kind of call"""
+
+
+def resolve_recording_file(recording_file: str, record_dir: str = RECORD_DIR) -> str:
+    """Resolve a recording path (relative to the record directory) and reject anything outside it"""
+    if not record_dir:
+        raise ValueError("Replay requires KILOMARKET_RECORD_DIR to be set to the directory holding recordings")
+    root = Path(record_dir).expanduser().resolve()
+    path = (root / Path(recording_file).expanduser()).resolve()
+    if not path.is_relative_to(root):
+        raise ValueError(f"Recording file must be inside the record directory: {recording_file}")
+    return str(path)
+
+
+def _digest(value: Any) -> str:
+    encoded = json.dumps(value, sort_keys=True, default=str, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:24]
+
+
+def request_key(messages: List[Dict[str, Any]], system_prompt: Optional[str] = None) -> str:
+    """Exact fingerprint of a model request (conversation plus system prompt)"""
+    return _digest({"system": system_prompt, "messages": messages})
+
+
+def request_shape(messages: List[Dict[str, Any]]) -> str:
+    """Coarse fingerprint: role and block kinds of each message, plus the latest user text
+
+    Matches a recorded request even when live tool results differ from the recorded ones.
+    """
+    shape = [[message.get("role")] + sorted(next(iter(item), "") for item in message.get("content", []) or [])
+             for message in messages]
+    last_text = next(
+        (item["text"] for message in reversed(messages) if message.get("role") == "user"
+         for item in message.get("content", []) or [] if "text" in item),
+        None
+    )
+    return _digest({"shape": shape, "last_user_text": last_text})
+
+
+class StreamRecorder:
+    """Appends recorded model calls to per-provider/model JSONL files"""
+
+    def __init__(self, record_dir: str):
+        self.record_dir = Path(record_dir)
+        self._lock = threading.Lock()
+
+    def path_for(self, provider: str, model_id: Optional[str]) -> Path:
+        safe_model = re.sub(r"[^A-Za-z0-9._-]+", "_", model_id or "default")
+        return self.record_dir / f"{provider}-{safe_model}.jsonl"
+
+    def write(self, provider: str, model_id: Optional[str], record: Dict[str, Any]):
+        line = json.dumps(record, default=str, ensure_ascii=False) + "\n"
+        path = self.path_for(provider, model_id)
+        with self._lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+class RecordingModel(Model):
+    """Strands model wrapper that records each stream's events with their offsets from the request start"""
+
+    def __init__(self, model: Any, provider: str, model_id: Optional[str], recorder: StreamRecorder):
+        self._model = model
+        self._provider = provider
+        self._model_id = model_id
+        self._recorder = recorder
+
+    def update_config(self, **model_config):
+        return self._model.update_config(**model_config)
+
+    def get_config(self):
+        return self._model.get_config()
+
+    async def structured_output(self, output_model, prompt, system_prompt=None, **kwargs):
+        key = request_key(prompt, system_prompt)
+        started = time.monotonic()
+        events = []
+        async for event in self._model.structured_output(output_model, prompt, system_prompt=system_prompt, **kwargs):
+            recorded = event
+            if isinstance(event, dict) and hasattr(event.get("output"), "model_dump"):
+                # The parsed result is stored as plain data and rebuilt with the output model on replay
+                recorded = {"output": event["output"].model_dump(mode="json")}
+            events.append([round((time.monotonic() - started) * 1000, 2), recorded])
+            yield event
+
+        self._record({
+            "kind": KIND_STRUCTURED_OUTPUT,
+            "key": key,
+            "shape": request_shape(prompt),
+            "output_model": output_model.__name__,
+            "events": events
+        })
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs):
+        # Fingerprint before streaming - the agent appends to the conversation afterwards
+        key = request_key(messages, system_prompt)
+        shape = request_shape(messages)
+        started = time.monotonic()
+        events = []
+        async for event in self._model.stream(messages, tool_specs, system_prompt, **kwargs):
+            events.append([round((time.monotonic() - started) * 1000, 2), event])
+            yield event
+
+        self._record({
+            "kind": KIND_STREAM,
+            "key": key,
+            "shape": shape,
+            "tools": sorted(spec.get("name", "") for spec in tool_specs or []),
+            "events": events
+        })
+
+    def _record(self, record: Dict[str, Any]):
+        # Only complete calls are recorded; a failed call raises before reaching here
+        try:
+            self._recorder.write(self._provider, self._model_id, {
+                "id": str(uuid.uuid4()),
+                "recorded_at": time.time(),
+                "provider": self._provider,
+                "model_id": self._model_id,
+                **record
+            })
+        except Exception as e:
+            logger.error(f"Failed to record {self._provider} stream: {e}")
+
+    def __getattr__(self, name):
+        # Delegate everything else (config, client, ...) to the wrapped model
+        if name == "_model":
+            raise AttributeError(name)
+        return getattr(self._model, name)
+
+
+class ReplayModel(Model):
+    """Strands model that replays recorded streams in real time, accelerated or without delays
+
+    Recordings are matched by exact request, then by conversation shape, then taken in recorded order.
+    Structured-output calls only replay recordings made for the same output model.
+    """
+
+    def __init__(self, recording_file: str, mode: str = REPLAY_REALTIME, speed: float = DEFAULT_REPLAY_SPEED,
+                 **model_config):
+        if mode not in REPLAY_MODES:
+            raise ValueError(f"Unsupported replay mode: {mode}")
+        self.config = {"recording_file": recording_file, "mode": mode, "speed": float(speed), **model_config}
+        self._lock = threading.Lock()
+        records = self._load(recording_file)
+        # Recordings made before structured output was recorded carry no kind; they are all streams
+        self._records = [record for record in records if record.get("kind", KIND_STREAM) == KIND_STREAM]
+        self._structured: Dict[str, List[Dict[str, Any]]] = {}
+        self._by_key: Dict[str, List[Dict[str, Any]]] = {}
+        self._by_shape: Dict[str, List[Dict[str, Any]]] = {}
+        for record in records:
+            if record.get("kind", KIND_STREAM) == KIND_STRUCTURED_OUTPUT:
+                self._structured.setdefault(record.get("output_model"), []).append(record)
+        for record in self._records:
+            self._by_key.setdefault(record.get("key"), []).append(record)
+            self._by_shape.setdefault(record.get("shape"), []).append(record)
+        self._cursors: Dict[str, int] = {}
+        self._stats = {"exact": 0, "shape": 0, "sequential": 0}
+
+    @staticmethod
+    def _load(recording_file: str) -> List[Dict[str, Any]]:
+        path = Path(recording_file).expanduser()
+        if not path.is_file():
+            raise ValueError(f"Recording file not found: {recording_file}")
+        records = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    records.append(json.loads(line))
+        if not records:
+            raise ValueError(f"Recording file has no recorded streams: {recording_file}")
+        logger.info(f"Loaded {len(records)} recorded stream(s) from {path}")
+        return records
+
+    def update_config(self, **model_config):
+        self.config.update(model_config)
+
+    def get_config(self) -> Dict[str, Any]:
+        return self.config
+
+    def get_status(self) -> Dict[str, Any]:
+        """Recording count and how requests were matched"""
+        with self._lock:
+            return {
+                "recordings": len(self._records),
+                "structured_recordings": sum(len(records) for records in self._structured.values()),
+                "mode": self.config["mode"],
+                "matches": dict(self._stats)
+            }
+
+    def _next(self, bucket: str, candidates: List[Dict[str, Any]]) -> Dict[str, Any]:
+        cursor = self._cursors.get(bucket, 0)
+        self._cursors[bucket] = cursor + 1
+        return candidates[cursor % len(candidates)]
+
+    def select(self, messages: List[Dict[str, Any]], system_prompt: Optional[str] = None) -> Dict[str, Any]:
+        """Pick the recording to replay for a request"""
+        key = request_key(messages, system_prompt)
+        shape = request_shape(messages)
+        with self._lock:
+            if not self._records:
+                raise ReplayUnavailable(f"No recorded streams in {self.config['recording_file']}")
+            if key in self._by_key:
+                self._stats["exact"] += 1
+                return self._next(f"key:{key}", self._by_key[key])
+            if shape in self._by_shape:
+                self._stats["shape"] += 1
+                return self._next(f"shape:{shape}", self._by_shape[shape])
+            self._stats["sequential"] += 1
+            return self._next("sequential", self._records)
+
+    def _delay_scale(self) -> Optional[float]:
+        mode = self.config["mode"]
+        if mode == REPLAY_INSTANT:
+            return None
+        if mode == REPLAY_ACCELERATED:
+            return 1.0 / max(self.config["speed"], 0.001)
+        return 1.0
+
+    def select_structured(self, output_model: Any, prompt: List[Dict[str, Any]],
+                          system_prompt: Optional[str] = None) -> Dict[str, Any]:
+        """Pick the structured-output recording to replay: same output model, exact request first"""
+        candidates = self._structured.get(output_model.__name__)
+        if not candidates:
+            raise ReplayUnavailable(
+                f"No structured output recorded for {output_model.__name__} in {self.config['recording_file']}"
+            )
+        key = request_key(prompt, system_prompt)
+        with self._lock:
+            exact = [record for record in candidates if record.get("key") == key]
+            if exact:
+                self._stats["exact"] += 1
+                return self._next(f"structured:{key}", exact)
+            self._stats["sequential"] += 1
+            return self._next(f"structured:{output_model.__name__}", candidates)
+
+    async def structured_output(self, output_model, prompt, system_prompt=None, **kwargs):
+        record = self.select_structured(output_model, prompt, system_prompt)
+        async for event in self._replay(record):
+            if isinstance(event, dict) and isinstance(event.get("output"), dict):
+                event = {"output": output_model.model_validate(event["output"])}
+            yield event
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs):
+        async for event in self._replay(self.select(messages, system_prompt)):
+            yield event
+
+    async def _replay(self, record: Dict[str, Any]):
+        scale = self._delay_scale()
+        started = time.monotonic()
+
+        for offset_ms, event in record["events"]:
+            if scale is None:
+                await asyncio.sleep(0)
+            else:
+                delay = offset_ms / 1000 * scale - (time.monotonic() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            yield event
+
+
+def build_replay_model(spec: Dict[str, Any]) -> ReplayModel:
+    """Model pool builder for the replay provider"""
+    params = spec["params"]
+    return ReplayModel(
+        recording_file=params["recording_file"],
+        mode=params.get("mode", REPLAY_REALTIME),
+        speed=params.get("speed", DEFAULT_REPLAY_SPEED)
+    )
+
+
+# Global recorder (None unless KILOMARKET_RECORD_DIR is set)
+stream_recorder = StreamRecorder(RECORD_DIR) if RECORD_DIR else None
@@ -7,7 +7,7 @@ from fastapi import Request, Query
 from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 import asyncio
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -18,32 +18,45 @@ from .templates.ai_provider import ai_provider_template
 from .templates.wallet_settings import wallet_settings_template
 from .templates.interactive import interactive_mode_template, new_session_template, chat_session_template
 from .templates.markets import markets_page_template
-from .a2a_server import get_a2a_manager
+from .a2a_server import get_a2a_manager, register_a2a_listener
 from .ai_provider import ai_provider_manager
 from .wallet_settings import wallet_settings_manager
-from .sessions import session_manager
+from .sessions import session_manager, DEFAULT_SESSION_PAGE_SIZE, RESUME_MESSAGE_LIMIT, MAX_MESSAGE_PAGE_SIZE
 from .mcp_manager import mcp_manager
+from .agent_pool import agent_pool
+from .chat_streams import chat_stream_registry, format_sse, TokenCoalescer
+from .admission import admission_controller, AdmissionRejected
+from .model_pool import model_pool
+from .chat_events import TurnEventTracker, encode_event, EVENT_TEXT, EVENT_DONE, EVENT_ERROR
+from .blocking import run_blocking, loop_lag_monitor
+from .prompt_cache import prompt_cache_stats
+from .batch_jobs import batch_job_manager, parse_jsonl_prompts
+from .session_maintenance import metadata_flusher, counter_verifier, session_archiver, retention_sweeper
   
 
 def setup_routes(app):
     """Setup all routes for the FastAPI app"""
+    
+    # Keep cached A2A client providers in step with A2A server start/stop
+    register_a2a_listener(mcp_manager.on_a2a_servers_changed)
 
     @app.get("/")
     async def root():
         """Main terminal interface"""
-        a2a_manager = get_a2a_manager()
-        a2a_status = a2a_manager.get_status()
-        ai_provider_status = ai_provider_manager.get_provider_status()
-        wallet_status = wallet_settings_manager.get_wallet_status()
+        a2a_manager = await run_blocking(get_a2a_manager)
+        a2a_status = await run_blocking(a2a_manager.get_status)
+        ai_provider_status = await run_blocking(ai_provider_manager.get_provider_status)
+        wallet_status = await run_blocking(wallet_settings_manager.get_wallet_status)
         return HTMLResponse(main_page_template(a2a_status, ai_provider_status, wallet_status))
     
     @app.post("/toggle-a2a")
     async def toggle_a2a():
         """Toggle A2A server on/off"""
-        a2a_manager = get_a2a_manager()
-        success, message = a2a_manager.toggle_servers()
+        a2a_manager = await run_blocking(get_a2a_manager)
+        # Starting servers sleeps while they come up - keep that off the event loop
+        success, message = await run_blocking(a2a_manager.toggle_servers)
         
-        status = a2a_manager.get_status()
+        status = await run_blocking(a2a_manager.get_status)
         return JSONResponse({
             "success": success,
             "message": message,
@@ -53,20 +66,20 @@ def setup_routes(app):
     @app.get("/a2a-status")
     async def a2a_status():
         """Get current A2A server status"""
-        a2a_manager = get_a2a_manager()
-        status = a2a_manager.get_status()
+        a2a_manager = await run_blocking(get_a2a_manager)
+        status = await run_blocking(a2a_manager.get_status)
         return JSONResponse(status)
     
     @app.get("/ai-provider")
     async def ai_provider_page():
         """AI Provider configuration page"""
-        current_provider = ai_provider_manager.get_configured_provider()
+        current_provider = await run_blocking(ai_provider_manager.get_configured_provider)
         return HTMLResponse(ai_provider_template(current_provider))
     
     @app.get("/api/ai-provider/status")
     async def get_ai_provider_status():
         """Get current AI provider status"""
-        status = ai_provider_manager.get_provider_status()
+        status = await run_blocking(ai_provider_manager.get_provider_status)
         return JSONResponse(status)
     
     @app.post("/api/ai-provider/configure")
@@ -103,7 +116,7 @@ def setup_routes(app):
                     # Use default value if not provided
                     config_data[field] = defaults[field]
             
-            success = ai_provider_manager.configure_provider(provider, config_data)
+            success = await run_blocking(ai_provider_manager.configure_provider, provider, config_data)
             
             if success:
                 return JSONResponse({
@@ -125,7 +138,7 @@ def setup_routes(app):
     async def clear_ai_provider():
         """Clear AI provider configuration"""
         try:
-            success = ai_provider_manager.clear_provider()
+            success = await run_blocking(ai_provider_manager.clear_provider)
             
             if success:
                 return JSONResponse({
@@ -153,13 +166,13 @@ def setup_routes(app):
     @app.get("/wallet-settings")
     async def wallet_settings_page():
         """Wallet settings configuration page"""
-        current_wallet = wallet_settings_manager.get_wallet_status()
+        current_wallet = await run_blocking(wallet_settings_manager.get_wallet_status)
         return HTMLResponse(wallet_settings_template(current_wallet))
     
     @app.get("/api/wallet-settings/status")
     async def get_wallet_status():
         """Get current wallet status"""
-        status = wallet_settings_manager.get_wallet_status()
+        status = await run_blocking(wallet_settings_manager.get_wallet_status)
         return JSONResponse(status)
     
     @app.post("/api/wallet-settings/configure")
@@ -182,7 +195,7 @@ def setup_routes(app):
                     "error": "Chain is required"
                 })
             
-            success = wallet_settings_manager.configure_wallet(private_key, chain)
+            success = await run_blocking(wallet_settings_manager.configure_wallet, private_key, chain)
             
             if success:
                 return JSONResponse({
@@ -204,7 +217,7 @@ def setup_routes(app):
     async def clear_wallet():
         """Clear wallet configuration"""
         try:
-            success = wallet_settings_manager.clear_wallet()
+            success = await run_blocking(wallet_settings_manager.clear_wallet)
             
             if success:
                 return JSONResponse({
@@ -237,7 +250,7 @@ def setup_routes(app):
     @app.get("/new-session")
     async def new_session():
         """New session creation page"""
-        ai_provider_status = ai_provider_manager.get_provider_status()
+        ai_provider_status = await run_blocking(ai_provider_manager.get_provider_status)
         return HTMLResponse(new_session_template(ai_provider_status))
     
     @app.post("/create-session")
@@ -245,7 +258,7 @@ def setup_routes(app):
         """Create new interactive session"""
         try:
             # Check if AI provider is configured
-            ai_provider_config = ai_provider_manager.get_configured_provider()
+            ai_provider_config = await run_blocking(ai_provider_manager.get_configured_provider)
             if not ai_provider_config:
                 return JSONResponse({
                     "success": False,
@@ -253,7 +266,7 @@ def setup_routes(app):
                 })
             
             # Check wallet configuration for MCP functionality
-            wallet_config = wallet_settings_manager.get_configured_wallet()
+            wallet_config = await run_blocking(wallet_settings_manager.get_configured_wallet)
             if not wallet_config:
                 return JSONResponse({
                     "success": False,
@@ -267,11 +280,27 @@ def setup_routes(app):
                     "error": "Only Ethereum Sepolia is supported for MCP tools"
                 })
             
+            # Optional per-session conversation manager ({"strategy": "summarizing", "token_budget": N})
+            try:
+                body = await request.json()
+            except Exception:
+                body = {}
+            try:
+                from .conversation_manager import resolve_conversation_settings
+                conversation_settings = resolve_conversation_settings((body or {}).get("conversation_manager"))
+            except (ValueError, TypeError) as e:
+                return JSONResponse({
+                    "success": False,
+                    "error": str(e)
+                })
+            
             # Create session with minimal required data
-            session_id = session_manager.create_session(
+            session_id = await run_blocking(
+                session_manager.create_session,
                 approval_data="",  # Empty approval data
                 passcode="0000",   # Default passcode
-                ai_provider=ai_provider_config
+                ai_provider=ai_provider_config,
+                conversation_manager=conversation_settings
             )
             
             return JSONResponse({
@@ -291,7 +320,7 @@ def setup_routes(app):
     async def resume_session(session_id: str):
         """Resume a specific session"""
         try:
-            session_data = session_manager.get_session(session_id)
+            session_data = await run_blocking(session_manager.get_session, session_id)
             if not session_data:
                 return HTMLResponse("""
 <!DOCTYPE html>
@@ -303,10 +332,18 @@ def setup_routes(app):
 </html>
                 """)
             
-            # Load session messages
-            messages = session_manager.get_session_messages(session_id)
+            # Load the most recent messages; older ones are fetched from the page on demand
+            page = await run_blocking(
+                session_manager.get_session_messages_page, session_id, limit=RESUME_MESSAGE_LIMIT
+            )
+            if page.get("error"):
+                raise RuntimeError(page["error"])
+            message_count = await run_blocking(session_manager.count_session_messages, session_id)
             
-            return HTMLResponse(chat_session_template(session_id, session_data, messages))
+            return HTMLResponse(chat_session_template(
+                session_id, session_data, page["messages"],
+                message_count=message_count, has_more=page["has_more"]
+            ))
             
         except Exception as e:
             logger.error(f"Error resuming session {session_id}: {e}")
@@ -324,7 +361,7 @@ def setup_routes(app):
     async def chat_session(session_id: str):
         """Chat session page"""
         try:
-            session_data = session_manager.get_session(session_id)
+            session_data = await run_blocking(session_manager.get_session, session_id)
             if not session_data:
                 return HTMLResponse("""
 <!DOCTYPE html>
@@ -351,45 +388,108 @@ def setup_routes(app):
             """)
     
     @app.get("/chat-stream/{session_id}")
-    async def chat_stream(session_id: str, message: str = Query(...)):
-        """Streaming endpoint for chat messages"""
+    async def chat_stream(request: Request, session_id: str, message: str = Query(...), events: str = Query("text")):
+        """Streaming endpoint for chat messages (events=structured opts into typed SSE events)"""
+        sse_headers = {"Cache-Control": "no-cache", "Connection": "keep-alive"}
+        
+        # An EventSource reconnect carries Last-Event-ID - replay the buffered turn instead of re-running it
+        last_event_id = request.headers.get("last-event-id")
+        if last_event_id:
+            resumed = chat_stream_registry.resume(session_id, last_event_id)
+            if resumed:
+                turn, after_seq = resumed
+                logger.info(f"Resuming turn {turn.turn_id} for session {session_id} after event {after_seq}")
+                return StreamingResponse(
+                    turn.frames(after_seq, request.is_disconnected),
+                    media_type="text/event-stream",
+                    headers=sse_headers
+                )
+            
+            # The turn has expired - never silently re-run (and re-bill) a message the client already sent
+            logger.warning(f"Cannot resume session {session_id} from event {last_event_id}: turn expired")
+            return StreamingResponse(
+                iter([format_sse("[ERROR] Stream expired, please resend your message")]),
+                media_type="text/event-stream",
+                headers=sse_headers
+            )
+        
         agent_instance = None
         try:
             # Get session data
-            session_data = session_manager.get_session(session_id)
+            session_data = await run_blocking(session_manager.get_session, session_id)
             if not session_data:
                 return {"error": "Session not found"}
             
-            # Get session manager for this session
-            strands_session_manager = session_manager.get_session_manager(session_id)
-            if not strands_session_manager:
-                return {"error": "Failed to create session manager"}
-            
-            # Initialize StrandsAgents agent
+            # Fast-fail when the session's provider/model is saturated and its wait queue is full
+            provider_data = session_data.get("ai_provider", {})
+            provider = provider_data.get("provider")
+            if provider:
+                try:
+                    model_id = model_pool.resolve_model_id(provider, provider_data.get("config", {}))
+                    admission_controller.check(provider, model_id)
+                except AdmissionRejected as e:
+                    logger.warning(f"Rejected chat turn for session {session_id}: {e}")
+                    return JSONResponse(
+                        {"error": str(e)},
+                        status_code=429,
+                        headers={"Retry-After": str(e.retry_after)}
+                    )
+            
+            # Lease a warm agent from the pool (built on first turn or after invalidation)
             try:
                 from .agent_utils import initialize_strands_agent
                 
                 # Get A2A status for agent initialization
-                a2a_manager = get_a2a_manager()
-                a2a_status = a2a_manager.get_status()
+                a2a_manager = await run_blocking(get_a2a_manager)
+                a2a_status = await run_blocking(a2a_manager.get_status)
                 
-                agent_instance, agent_session_id = initialize_strands_agent(
-                    session_data, session_id, strands_session_manager, a2a_status
+                def build_agent():
+                    # Get session manager for this session
+                    strands_session_manager = session_manager.get_session_manager(session_id)
+                    if not strands_session_manager:
+                        raise RuntimeError("Failed to create session manager")
+                    
+                    agent, _ = initialize_strands_agent(
+                        session_data, session_id, strands_session_manager, a2a_status
+                    )
+                    return agent
+                
+                # Building an agent spawns MCP subprocesses and reads session files - run it off the loop
+                agent_instance = await run_blocking(
+                    agent_pool.acquire, session_id, session_data, a2a_status, build_agent
                 )
             except ImportError as e:
                 logger.error(f"StrandsAgents not available: {e}")
                 return {"error": "StrandsAgents not available. Please install strands-agents package."}
             
-            logger.info(f"Initialized agent for session {session_id}")
+            logger.info(f"Acquired agent for session {session_id}")
             
-            async def generate_response():
+            structured = events == "structured"
+            tracker = TurnEventTracker()
+            turn = chat_stream_registry.create(session_id)
+            if structured:
+                coalescer = TokenCoalescer(turn, event=EVENT_TEXT, encode=lambda text: encode_event(tracker.text(text)))
+            else:
+                coalescer = TokenCoalescer(turn)
+            
+            async def run_turn():
                 try:
                     # Update session timestamp
-                    session_manager.update_session_timestamp(session_id)
+                    await run_blocking(session_manager.update_session_timestamp, session_id)
+                    
+                    # Swap in any summary the conversation manager finished compacting since the last turn
+                    conversation_manager = getattr(agent_instance, 'conversation_manager', None)
+                    if hasattr(conversation_manager, 'apply_pending_compaction'):
+                        await run_blocking(conversation_manager.apply_pending_compaction, agent_instance)
                     
-                    # Stream response from agent
+                    # Stream response from agent into the turn's replay buffer
                     agent_stream = agent_instance.stream_async(message)
                     async for event in agent_stream:
+                        # Derive tool / A2A / usage events (with timings) from the raw stream
+                        for event_type, payload in tracker.observe(event):
+                            if structured:
+                                await coalescer.publish(encode_event(payload), event=event_type)
+                        
                         # Extract text content
                         text_content = ""
                         if isinstance(event, dict):
@@ -400,26 +500,54 @@ def setup_routes(app):
                         
                         # Send non-empty text content
                         if text_content and text_content.strip():
-                            yield f"data: {text_content}\n\n"
+                            await coalescer.add(text_content)
                     
-                    yield "data: [DONE]\n\n"
+                    context_status = None
+                    if hasattr(conversation_manager, 'get_status'):
+                        context_status = conversation_manager.get_status(agent_instance)
+                    logger.info(f"Chat turn for session {session_id} completed: {tracker.summary()}"
+                                + (f" context~{context_status['prompt_tokens']} tokens" if context_status else ""))
+                    if structured:
+                        done_payload = tracker.done()
+                        if context_status:
+                            done_payload["context"] = context_status
+                        await coalescer.publish(encode_event(done_payload), event=EVENT_DONE, final=True)
+                    else:
+                        await coalescer.publish("[DONE]", final=True)
+                except asyncio.CancelledError:
+                    # Client went away and did not reconnect - stop paying for the model and tool calls
+                    logger.info(f"Chat turn cancelled for session {session_id}: client disconnected")
+                    try:
+                        from .agent_utils import repair_interrupted_conversation
+                        await run_blocking(
+                            repair_interrupted_conversation, agent_instance, "Response cancelled: client disconnected"
+                        )
+                    except Exception as e:
+                        logger.error(f"Error repairing cancelled conversation: {e}")
+                        agent_pool.invalidate(session_id)
+                    raise
                 except Exception as e:
                     logger.error(f"Stream error: {str(e)}")
                     import traceback
                     logger.error(f"Traceback: {traceback.format_exc()}")
-                    yield f"data: [ERROR] {str(e)}\n\n"
+                    # A failed turn may leave the agent in a bad state - don't keep it warm
+                    agent_pool.invalidate(session_id)
+                    if structured:
+                        await coalescer.publish(encode_event(tracker.done("error", str(e))), event=EVENT_ERROR, final=True)
+                    else:
+                        await coalescer.publish(f"[ERROR] {str(e)}", final=True)
                 finally:
-                    # Clean up agent resources when stream ends
-                    if agent_instance:
-                        try:
-                            agent_instance.cleanup()
-                        except:
-                            pass
+                    # Return the agent to the pool when the turn ends
+                    agent_pool.release(session_id, agent_instance)
+                    await turn.finish()
+            
+            # The turn runs independently of this connection so a reconnect can pick it up
+            turn.start(run_turn())
             
             return StreamingResponse(
-                generate_response(),
+                turn.frames(is_disconnected=request.is_disconnected),
                 media_type="text/event-stream",
-                headers={"Cache-Control": "no-cache", "Connection": "keep-alive"}
+                headers=sse_headers
             )
             
         except Exception as e:
@@ -427,22 +555,72 @@ def setup_routes(app):
             import traceback
             logger.error(f"Traceback: {traceback.format_exc()}")
             
-            # Clean up on error
+            # Return the agent on error
             if agent_instance:
-                try:
-                    agent_instance.cleanup()
-                except:
-                    pass
+                agent_pool.release(session_id, agent_instance)
                     
             return {"error": str(e)}
     
+    @app.get("/api/chat-stream/metrics")
+    async def chat_stream_metrics():
+        """Get chat stream replay and coalescing metrics"""
+        return JSONResponse(chat_stream_registry.get_status())
+    
+    @app.get("/api/event-loop/status")
+    async def event_loop_status():
+        """Get event-loop lag metrics"""
+        return JSONResponse(loop_lag_monitor.get_status())
+    
+    @app.get("/api/admission/status")
+    async def admission_status():
+        """Get provider/model concurrency, queue depth and wait-time metrics"""
+        return JSONResponse(admission_controller.get_status())
+    
+    @app.get("/api/agent-pool/status")
+    async def agent_pool_status():
+        """Get warm agent pool status"""
+        return JSONResponse(agent_pool.get_status())
+    
+    @app.get("/api/prompt-cache/status")
+    async def prompt_cache_status():
+        """Get provider prompt cache hit/miss counters"""
+        return JSONResponse(prompt_cache_stats.get_status())
+    
+    @app.get("/api/session-maintenance/status")
+    async def session_maintenance_status():
+        """Get session metadata flush, counter verification, archival and retention status"""
+        return JSONResponse({
+            "metadata_flusher": metadata_flusher.get_status(),
+            "counter_verifier": counter_verifier.get_status(),
+            "archiver": session_archiver.get_status(),
+            "retention": retention_sweeper.get_status()
+        })
+    
+    @app.post("/api/session-maintenance/verify")
+    async def verify_session_counters():
+        """Verify one batch of session counters now"""
+        return JSONResponse(await counter_verifier.run_once())
+    
+    @app.post("/api/session-maintenance/archive")
+    async def archive_idle_sessions():
+        """Archive one batch of idle sessions now"""
+        return JSONResponse(await session_archiver.run_once())
+    
+    @app.post("/api/session-maintenance/sweep")
+    async def sweep_sessions():
+        """Apply the retention policy to one batch now"""
+        if not retention_sweeper.enabled:
+            return JSONResponse({"error": "No retention policy configured"}, status_code=400)
+        return JSONResponse(await retention_sweeper.run_once())
+    
     @app.get("/delete-session/{session_id}")
     async def delete_session(session_id: str):
         """Delete a specific session"""
         try:
-            success = session_manager.delete_session(session_id)
+            success = await run_blocking(session_manager.delete_session, session_id)
             
             if success:
+                agent_pool.invalidate(session_id)
                 return HTMLResponse("""
 <!DOCTYPE html>
 <html>
@@ -485,7 +663,7 @@ def setup_routes(app):
         """Get all available agents and their capabilities"""
         try:
             from agents import AgentRegistry
-            agent_registry = AgentRegistry()
+            agent_registry = await run_blocking(AgentRegistry)
             agents_summary = agent_registry.get_agents_summary()
             return JSONResponse(agents_summary)
         except Exception as e:
@@ -526,7 +704,7 @@ def setup_routes(app):
         """Get specific agent information by port"""
         try:
             from agents import AgentRegistry
-            agent_registry = AgentRegistry()
+            agent_registry = await run_blocking(AgentRegistry)
             agent = agent_registry.get_agent_by_port(port)
             
             if agent:
@@ -542,7 +720,7 @@ def setup_routes(app):
         """Get specific agent capabilities by port"""
         try:
             from agents import AgentRegistry
-            agent_registry = AgentRegistry()
+            agent_registry = await run_blocking(AgentRegistry)
             agent = agent_registry.get_agent_by_port(port)
             
             if agent:
@@ -553,13 +731,100 @@ def setup_routes(app):
             logger.error(f"Error getting agent capabilities {port}: {e}")
             return JSONResponse({"error": str(e)})
     
+    # Batch Job API Endpoints
+    @app.post("/api/batch-jobs")
+    async def submit_batch_job(request: Request):
+        """Submit a JSONL batch of prompts ({"prompt": ..., "id": ...} per line)"""
+        try:
+            items = parse_jsonl_prompts((await request.body()).decode("utf-8"))
+        except (ValueError, UnicodeDecodeError) as e:
+            return JSONResponse({"success": False, "error": str(e)}, status_code=400)
+        
+        ai_provider_config = await run_blocking(ai_provider_manager.get_configured_provider)
+        if not ai_provider_config:
+            return JSONResponse({
+                "success": False,
+                "error": "AI Provider must be configured before submitting a batch"
+            }, status_code=400)
+        
+        a2a_manager = await run_blocking(get_a2a_manager)
+        a2a_status = await run_blocking(a2a_manager.get_status)
+        
+        # Every item starts from an empty conversation, so the plain sliding window is enough
+        session_data = {
+            "session_type": "batch",
+            "approval_data": "",
+            "ai_provider": ai_provider_config,
+            "conversation_manager": {"strategy": "sliding_window"}
+        }
+        job = batch_job_manager.submit(items, session_data, a2a_status)
+        return JSONResponse({"success": True, "job_id": job.job_id, "total_items": len(items)})
+    
+    @app.get("/api/batch-jobs")
+    async def list_batch_jobs():
+        """List batch jobs (newest first) and worker pool status"""
+        return JSONResponse({"jobs": batch_job_manager.list_jobs(), "pool": batch_job_manager.get_status()})
+    
+    @app.get("/api/batch-jobs/{job_id}")
+    async def get_batch_job(job_id: str):
+        """Get batch job progress, latency percentiles and throughput"""
+        job = batch_job_manager.get_job(job_id)
+        if not job:
+            return JSONResponse({"error": "Batch job not found"}, status_code=404)
+        return JSONResponse(job.get_status())
+    
+    @app.get("/api/batch-jobs/{job_id}/results")
+    async def get_batch_job_results(job_id: str, follow: bool = Query(True)):
+        """Stream item results as JSONL in completion order (follow=false returns what is done so far)"""
+        job = batch_job_manager.get_job(job_id)
+        if not job:
+            return JSONResponse({"error": "Batch job not found"}, status_code=404)
+        return StreamingResponse(job.stream_results(follow), media_type="application/x-ndjson")
+    
+    @app.post("/api/batch-jobs/{job_id}/cancel")
+    async def cancel_batch_job(job_id: str):
+        """Cancel a batch job; items already running are allowed to finish"""
+        job = batch_job_manager.get_job(job_id)
+        if not job:
+            return JSONResponse({"error": "Batch job not found"}, status_code=404)
+        cancelled = await job.cancel()
+        return JSONResponse({"success": cancelled, "status": job.status})
+    
     # Session API Endpoints
     @app.get("/api/sessions")
-    async def get_sessions():
-        """Get all available sessions"""
+    async def get_sessions(limit: int = Query(DEFAULT_SESSION_PAGE_SIZE), cursor: Optional[str] = Query(None),
+                           provider: Optional[str] = Query(None), session_type: Optional[str] = Query(None),
+                           updated_after: Optional[str] = Query(None), updated_before: Optional[str] = Query(None),
+                           fields: str = Query("full")):
+        """Get a page of sessions, most recent first (pass next_cursor back as cursor for the next page)"""
         try:
-            sessions = session_manager.list_sessions()
-            return {"sessions": sessions}
+            return await run_blocking(
+                session_manager.list_sessions_page, limit=limit, cursor=cursor, provider=provider,
+                session_type=session_type, updated_after=updated_after, updated_before=updated_before,
+                projection=fields
+            )
+        except ValueError as e:
+            return JSONResponse({"sessions": [], "next_cursor": None, "error": str(e)}, status_code=400)
         except Exception as e:
             logger.error(f"Error getting sessions: {e}")
-            return {"sessions": [], "error": str(e)}
\ No newline at end of file
+            return {"sessions": [], "next_cursor": None, "error": str(e)}
+    
+    @app.get("/api/sessions/{session_id}/messages")
+    async def get_session_message_page(session_id: str, limit: int = Query(RESUME_MESSAGE_LIMIT),
+                                      before: Optional[int] = Query(None), after: Optional[int] = Query(None),
+                                      count_only: bool = Query(False)):
+        """Get a page of session messages: the latest `limit` (before a message_id) or the next after one"""
+        try:
+            if count_only:
+                count = await run_blocking(session_manager.count_session_messages, session_id)
+                return {"session_id": session_id, "message_count": count}
+            
+            limit = max(1, min(limit, MAX_MESSAGE_PAGE_SIZE))
+            page = await run_blocking(
+                session_manager.get_session_messages_page, session_id,
+                limit=limit, before_id=before, after_id=after
+            )
+            return {"session_id": session_id, **page}
+        except Exception as e:
+            logger.error(f"Error getting messages for session {session_id}: {e}")
+            return {"session_id": session_id, "messages": [], "has_more": False, "error": str(e)}
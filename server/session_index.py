@@ -0,0 +1,345 @@
+"""
+Session index for KiloMarket
+SQLite table of session metadata, message counts and byte sizes, kept up to date on write
+
+Usage:
+    python -m server.session_index rebuild [--sessions-dir sessions]
+"""
+
+import argparse
+import base64
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SESSION_INDEX_FILE = "index.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    session_type TEXT NOT NULL DEFAULT 'interactive',
+    provider TEXT,
+    created_at TEXT,
+    updated_at TEXT,
+    data TEXT NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    byte_size INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at DESC, session_id DESC);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Columns added after the first release of the index, created on open when missing
+_ADDED_COLUMNS = {
+    "last_message_at": "TEXT",
+    "verified_at": "REAL NOT NULL DEFAULT 0",
+    "archived": "INTEGER NOT NULL DEFAULT 0"
+}
+
+
+def encode_cursor(updated_at: str, session_id: str) -> str:
+    """Opaque page cursor: the sort key of the last session on a page"""
+    raw = json.dumps([updated_at, session_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Inverse of encode_cursor; raises ValueError for a malformed cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        updated_at, session_id = json.loads(raw)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(updated_at, str) or not isinstance(session_id, str):
+        raise ValueError("Invalid cursor")
+    return updated_at, session_id
+
+
+class SessionIndex:
+    """Thread-safe SQLite index of sessions"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(sessions)")}
+            for column, definition in _ADDED_COLUMNS.items():
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE sessions ADD COLUMN {column} {definition}")
+
+    def is_built(self) -> bool:
+        """Whether the index has been built from the session directories at least once"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'built_at'").fetchone()
+        return row is not None
+
+    def upsert_session(self, session_data: Dict[str, Any], message_count: Optional[int] = None,
+                       byte_size: Optional[int] = None):
+        """Insert or update a session's metadata; counters are only replaced when given"""
+        session_id = session_data["session_id"]
+        values = {
+            "session_id": session_id,
+            "session_type": session_data.get("session_type", "interactive"),
+            "provider": (session_data.get("ai_provider") or {}).get("provider"),
+            "created_at": session_data.get("created_at"),
+            "updated_at": session_data.get("updated_at") or "",
+            "data": json.dumps(session_data, default=str),
+            "message_count": message_count or 0,
+            "byte_size": byte_size or 0
+        }
+        counters = []
+        if message_count is not None:
+            counters.append("message_count = excluded.message_count")
+        if byte_size is not None:
+            counters.append("byte_size = excluded.byte_size")
+
+        update = ", ".join([
+            "session_type = excluded.session_type",
+            "provider = excluded.provider",
+            "created_at = excluded.created_at",
+            "updated_at = excluded.updated_at",
+            "data = excluded.data"
+        ] + counters)
+        with self._lock:
+            self._conn.execute(
+                f"""INSERT INTO sessions (session_id, session_type, provider, created_at, updated_at, data,
+                                          message_count, byte_size)
+                    VALUES (:session_id, :session_type, :provider, :created_at, :updated_at, :data,
+                            :message_count, :byte_size)
+                    ON CONFLICT(session_id) DO UPDATE SET {update}""",
+                values
+            )
+
+    def touch(self, session_id: str, updated_at: str):
+        """Record new activity on a session"""
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if row is None:
+                return
+            data = json.loads(row["data"])
+            data["updated_at"] = updated_at
+            self._conn.execute(
+                "UPDATE sessions SET updated_at = ?, data = ? WHERE session_id = ?",
+                (updated_at, json.dumps(data, default=str), session_id)
+            )
+
+    def add_message(self, session_id: str, counted: bool, byte_delta: int, created_at: Optional[str] = None):
+        """Account for a message written to a session (counted = has displayable text)"""
+        with self._lock:
+            if counted and created_at:
+                self._conn.execute(
+                    "UPDATE sessions SET message_count = message_count + 1, byte_size = MAX(0, byte_size + ?), "
+                    "last_message_at = MAX(COALESCE(last_message_at, ''), ?) WHERE session_id = ?",
+                    (byte_delta, created_at, session_id)
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE sessions SET message_count = message_count + ?, byte_size = MAX(0, byte_size + ?) "
+                    "WHERE session_id = ?",
+                    (1 if counted else 0, byte_delta, session_id)
+                )
+
+    def add_bytes(self, session_id: str, byte_delta: int):
+        """Account for a change in a session's on-disk size"""
+        if not byte_delta:
+            return
+        with self._lock:
+            self._conn.execute(
+                "UPDATE sessions SET byte_size = MAX(0, byte_size + ?) WHERE session_id = ?",
+                (byte_delta, session_id)
+            )
+
+    def least_recently_verified(self, limit: int) -> List[Dict[str, Any]]:
+        """Sessions whose counters were checked longest ago"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT session_id, message_count, byte_size, last_message_at FROM sessions "
+                "ORDER BY verified_at, session_id LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def set_counters(self, session_id: str, message_count: int, byte_size: int, last_message_at: Optional[str],
+                     verified_at: float):
+        """Replace a session's counters with freshly measured values"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE sessions SET message_count = ?, byte_size = ?, last_message_at = ?, verified_at = ? "
+                "WHERE session_id = ?",
+                (message_count, byte_size, last_message_at, verified_at, session_id)
+            )
+
+    def mark_verified(self, session_id: str, verified_at: float):
+        with self._lock:
+            self._conn.execute("UPDATE sessions SET verified_at = ? WHERE session_id = ?", (verified_at, session_id))
+
+    def set_archived(self, session_id: str, archived: bool):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE sessions SET archived = ? WHERE session_id = ?", (1 if archived else 0, session_id)
+            )
+
+    def idle_sessions(self, updated_before: Optional[str], limit: int,
+                      archived: Optional[bool] = False) -> List[Dict[str, Any]]:
+        """Sessions last updated before a time (any time if None), least recently updated first"""
+        clauses, params = [], []
+        if updated_before is not None:
+            clauses.append("updated_at < ?")
+            params.append(updated_before)
+        if archived is not None:
+            clauses.append("archived = ?")
+            params.append(1 if archived else 0)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT session_id, updated_at, byte_size, archived FROM sessions "
+                f"{where} ORDER BY updated_at, session_id LIMIT ?",
+                params + [limit]
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def total_bytes(self, archived: Optional[bool] = None) -> int:
+        """Sum of the indexed (uncompressed) session sizes, optionally of archived or live sessions only"""
+        where = "" if archived is None else f"WHERE archived = {1 if archived else 0}"
+        with self._lock:
+            return self._conn.execute(f"SELECT COALESCE(SUM(byte_size), 0) FROM sessions {where}").fetchone()[0]
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list_all(self) -> List[Dict[str, Any]]:
+        """All indexed sessions, most recently updated first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM sessions ORDER BY updated_at DESC, session_id DESC"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def query(self, limit: int, cursor: Optional[str] = None, provider: Optional[str] = None,
+              session_type: Optional[str] = None, updated_after: Optional[str] = None,
+              updated_before: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One page of sessions, most recently updated first, and the cursor for the next page
+
+        Dates are ISO 8601 strings compared against updated_at (after is inclusive, before exclusive).
+        """
+        clauses, params = [], []
+        if cursor:
+            cursor_updated_at, cursor_session_id = decode_cursor(cursor)
+            clauses.append("(updated_at < ? OR (updated_at = ? AND session_id < ?))")
+            params += [cursor_updated_at, cursor_updated_at, cursor_session_id]
+        if provider:
+            clauses.append("provider = ?")
+            params.append(provider)
+        if session_type:
+            clauses.append("session_type = ?")
+            params.append(session_type)
+        if updated_after:
+            clauses.append("updated_at >= ?")
+            params.append(updated_after)
+        if updated_before:
+            clauses.append("updated_at < ?")
+            params.append(updated_before)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        # Fetch one extra row to know whether another page follows
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM sessions {where} ORDER BY updated_at DESC, session_id DESC LIMIT ?",
+                params + [limit + 1]
+            ).fetchall()
+
+        rows = [dict(row) for row in rows]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["updated_at"], rows[-1]["session_id"])
+        return rows, next_cursor
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def replace_all(self, entries: List[Dict[str, Any]]):
+        """Replace the whole index in one transaction (used by rebuild)"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute("DELETE FROM sessions")
+                self._conn.executemany(
+                    """INSERT INTO sessions (session_id, session_type, provider, created_at, updated_at, data,
+                                             message_count, byte_size, last_message_at, verified_at, archived)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    [
+                        (
+                            entry["session_data"]["session_id"],
+                            entry["session_data"].get("session_type", "interactive"),
+                            (entry["session_data"].get("ai_provider") or {}).get("provider"),
+                            entry["session_data"].get("created_at"),
+                            entry["session_data"].get("updated_at") or "",
+                            json.dumps(entry["session_data"], default=str),
+                            entry["message_count"],
+                            entry["byte_size"],
+                            entry.get("last_message_at"),
+                            now,
+                            1 if entry.get("archived") else 0
+                        )
+                        for entry in entries
+                    ]
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('built_at', ?)", (str(now),)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m server.session_index", description="Manage the session index")
+    parser.add_argument("command", choices=["rebuild"], help="rebuild: re-scan every session directory")
+    parser.add_argument("--sessions-dir", default="sessions", help="sessions directory (default: ./sessions)")
+    args = parser.parse_args(argv)
+
+    # The manager builds an index that was never built when it opens it, so only rebuild one already built
+    index_path = os.path.join(args.sessions_dir, SESSION_INDEX_FILE)
+    was_built = False
+    if os.path.exists(index_path):
+        existing = SessionIndex(index_path)
+        was_built = existing.is_built()
+        existing.close()
+
+    # Only the class is imported; the app's global session manager (and ./sessions) is never created
+    from .sessions import KiloMarketSessionManager
+    manager = KiloMarketSessionManager(args.sessions_dir)
+    indexed = manager.rebuild_index() if was_built else manager.index.count()
+    print(f"Indexed {indexed} session(s) into {manager.index.db_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+Background session maintenance for KiloMarket
+Periodically flushes held session metadata, verifies the session index counters against disk, archives
+sessions that have gone cold and enforces the retention policy
+"""
+
+import asyncio
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from .agent_pool import agent_pool
+from .blocking import run_blocking
+from .sessions import session_manager, METADATA_FLUSH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# Seconds between counter verification passes, and sessions checked per pass (overridable per deployment)
+COUNTER_VERIFY_INTERVAL = float(os.getenv("KILOMARKET_COUNTER_VERIFY_INTERVAL", "600"))
+COUNTER_VERIFY_BATCH = int(os.getenv("KILOMARKET_COUNTER_VERIFY_BATCH", "25"))
+
+# Sessions idle for this many days are archived (0 disables), checked every interval, at most batch per pass
+ARCHIVE_AFTER_DAYS = float(os.getenv("KILOMARKET_SESSION_ARCHIVE_DAYS", "30"))
+ARCHIVE_INTERVAL = float(os.getenv("KILOMARKET_SESSION_ARCHIVE_INTERVAL", "3600"))
+ARCHIVE_BATCH = int(os.getenv("KILOMARKET_SESSION_ARCHIVE_BATCH", "20"))
+
+# Retention: sessions idle longer than the TTL, and the oldest sessions while the total indexed size is over
+# the cap, are deleted or archived (0 disables either limit). At most batch sessions per pass, at rate per second.
+RETENTION_ACTIONS = ["delete", "archive"]
+RETENTION_TTL_DAYS = float(os.getenv("KILOMARKET_SESSION_TTL_DAYS", "0"))
+RETENTION_MAX_TOTAL_MB = float(os.getenv("KILOMARKET_SESSION_MAX_TOTAL_MB", "0"))
+RETENTION_ACTION = os.getenv("KILOMARKET_RETENTION_ACTION", "delete")
+RETENTION_INTERVAL = float(os.getenv("KILOMARKET_RETENTION_INTERVAL", "3600"))
+RETENTION_BATCH = int(os.getenv("KILOMARKET_RETENTION_BATCH", "50"))
+RETENTION_RATE = float(os.getenv("KILOMARKET_RETENTION_RATE", "5"))
+
+
+class PeriodicSessionTask(ABC):
+    """Runs one maintenance pass every interval on the running loop and keeps running totals"""
+
+    name = "maintenance"
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self._passes = 0
+        self._totals: Dict[str, Any] = {}
+        self._last_report: Dict[str, Any] = {}
+        self._last_run: Optional[float] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    def start(self):
+        """Start running passes on the running loop"""
+        if not self.enabled:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        """Stop running passes"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def run_once(self) -> Dict[str, Any]:
+        """Run one pass now"""
+        report = await self._pass()
+        self._passes += 1
+        self._last_run = time.time()
+        self._last_report = report
+        for key, value in report.items():
+            self._totals[key] = self._totals.get(key, 0) + value
+        return report
+
+    @abstractmethod
+    async def _pass(self) -> Dict[str, Any]:
+        """Run one pass; returns counters that are added to the running totals"""
+        pass
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Session {self.name} pass failed: {e}")
+
+    def get_status(self) -> Dict[str, Any]:
+        """Passes run and their totals"""
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "interval_seconds": self.interval,
+            "passes": self._passes,
+            "last_run": self._last_run,
+            "last_report": self._last_report,
+            "totals": dict(self._totals)
+        }
+
+
+class MetadataFlusher(PeriodicSessionTask):
+    """Writes session timestamps held by update_session_timestamp back to session.json"""
+
+    name = "metadata flush"
+
+    def __init__(self, interval: float = METADATA_FLUSH_INTERVAL):
+        super().__init__(interval)
+
+    async def _pass(self) -> Dict[str, Any]:
+        return {"written": await run_blocking(session_manager.flush_timestamps)}
+
+    def stop(self):
+        """Stop flushing and write out whatever is still held"""
+        super().stop()
+        session_manager.flush_timestamps()
+
+
+class CounterVerifier(PeriodicSessionTask):
+    """Re-measures a batch of sessions per pass, oldest verification first, so every session is revisited"""
+
+    name = "counter verification"
+
+    def __init__(self, interval: float = COUNTER_VERIFY_INTERVAL, batch_size: int = COUNTER_VERIFY_BATCH):
+        super().__init__(interval)
+        self.batch_size = batch_size
+
+    async def _pass(self) -> Dict[str, Any]:
+        return await run_blocking(session_manager.verify_counters, self.batch_size)
+
+    def get_status(self) -> Dict[str, Any]:
+        return {**super().get_status(), "batch_size": self.batch_size}
+
+
+class SessionArchiver(PeriodicSessionTask):
+    """Packs sessions idle beyond a threshold into compressed archives, a bounded batch per pass"""
+
+    name = "archival"
+
+    def __init__(self, interval: float = ARCHIVE_INTERVAL, archive_after_days: float = ARCHIVE_AFTER_DAYS,
+                 batch_size: int = ARCHIVE_BATCH):
+        super().__init__(interval)
+        self.archive_after_days = archive_after_days
+        self.batch_size = batch_size
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0 and self.archive_after_days > 0
+
+    async def _pass(self) -> Dict[str, Any]:
+        idle_before = (datetime.now() - timedelta(days=self.archive_after_days)).isoformat()
+        # Sessions with a warm agent are in use, whatever their timestamp says
+        return await run_blocking(
+            session_manager.archive_idle_sessions, idle_before, self.batch_size, agent_pool.is_resident
+        )
+
+    def get_status(self) -> Dict[str, Any]:
+        return {**super().get_status(), "archive_after_days": self.archive_after_days, "batch_size": self.batch_size}
+
+
+class RetentionSweeper(PeriodicSessionTask):
+    """Deletes or archives expired and over-quota sessions in rate-limited batches and reports reclaimed bytes"""
+
+    name = "retention"
+
+    def __init__(self, interval: float = RETENTION_INTERVAL, ttl_days: float = RETENTION_TTL_DAYS,
+                 max_total_mb: float = RETENTION_MAX_TOTAL_MB, action: str = RETENTION_ACTION,
+                 batch_size: int = RETENTION_BATCH, rate: float = RETENTION_RATE):
+        super().__init__(interval)
+        if action not in RETENTION_ACTIONS:
+            # Built at import time, so a bad setting disables retention rather than breaking startup
+            logger.error(f"Unsupported retention action {action!r} (expected one of {RETENTION_ACTIONS}), "
+                         f"retention is disabled")
+        self.ttl_days = ttl_days
+        self.max_total_bytes = int(max_total_mb * 1024 * 1024)
+        self.action = action
+        self.batch_size = batch_size
+        self.rate = rate
+
+    @property
+    def enabled(self) -> bool:
+        return (self.interval > 0 and self.action in RETENTION_ACTIONS
+                and (self.ttl_days > 0 or self.max_total_bytes > 0))
+
+    def _select(self) -> Dict[str, Tuple[str, str]]:
+        """Sessions to reclaim this pass, with their reason and the updated_at they were picked with
+
+        Expired sessions come first, then the oldest while over the size cap.
+        """
+        # Archiving an archived session reclaims nothing, so those are only candidates for deletion
+        archived = False if self.action == "archive" else None
+        selected: Dict[str, Tuple[str, str]] = {}
+
+        if self.ttl_days > 0:
+            expired_before = (datetime.now() - timedelta(days=self.ttl_days)).isoformat()
+            for entry in session_manager.index.idle_sessions(expired_before, self.batch_size, archived):
+                selected[entry["session_id"]] = ("expired", entry["updated_at"])
+
+        if self.max_total_bytes > 0 and len(selected) < self.batch_size:
+            excess = session_manager.index.total_bytes(archived) - self.max_total_bytes
+            if excess > 0:
+                for entry in session_manager.index.idle_sessions(None, self.batch_size, archived):
+                    if excess <= 0 or len(selected) >= self.batch_size:
+                        break
+                    if entry["session_id"] not in selected:
+                        selected[entry["session_id"]] = ("over_quota", entry["updated_at"])
+                    excess -= entry["byte_size"]
+
+        return selected
+
+    def _reclaim(self, session_id: str, updated_at: str) -> Optional[int]:
+        """Delete or archive one session; returns the bytes freed on disk, or None if it was skipped
+
+        Sessions with a warm agent, or used since they were picked, are left alone. Both are checked under
+        the session lock, so a session being opened cannot be removed underneath it.
+        """
+        before = session_manager.session_disk_usage(session_id)
+        if self.action == "archive":
+            done = session_manager.archive_session(session_id, updated_at=updated_at, is_busy=agent_pool.is_resident)
+        else:
+            done = session_manager.delete_session(session_id, updated_at=updated_at, is_busy=agent_pool.is_resident)
+        if not done:
+            return None
+        return max(0, before - session_manager.session_disk_usage(session_id))
+
+    async def _pass(self) -> Dict[str, Any]:
+        report = {"expired": 0, "over_quota": 0, "deleted": 0, "archived": 0, "skipped": 0,
+                  "reclaimed_bytes": 0, "orphan_passcodes": 0}
+        if self.action not in RETENTION_ACTIONS:
+            return report
+        selected = await run_blocking(self._select)
+        delay = 1.0 / self.rate if self.rate > 0 else 0.0
+
+        for index, (session_id, (reason, updated_at)) in enumerate(selected.items()):
+            report[reason] += 1
+            # Spread the deletes out so a large sweep does not saturate the disk
+            if index and delay:
+                await asyncio.sleep(delay)
+            try:
+                reclaimed = await run_blocking(self._reclaim, session_id, updated_at)
+            except Exception as e:
+                logger.error(f"Retention failed for session {session_id}: {e}")
+                report["skipped"] += 1
+                continue
+            if reclaimed is None:
+                # In use or failed; it will come up again next pass if it is still eligible
+                report["skipped"] += 1
+                continue
+            report["deleted" if self.action == "delete" else "archived"] += 1
+            report["reclaimed_bytes"] += reclaimed
+
+        report["orphan_passcodes"] = await run_blocking(session_manager.prune_orphan_passcodes, self.batch_size)
+        if selected or report["orphan_passcodes"]:
+            logger.info(f"Session retention: {report}")
+        return report
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            **super().get_status(),
+            "enabled": self.enabled,
+            "ttl_days": self.ttl_days,
+            "max_total_bytes": self.max_total_bytes,
+            "indexed_bytes": session_manager.index.total_bytes(),
+            "action": self.action,
+            "batch_size": self.batch_size,
+            "rate_per_second": self.rate
+        }
+
+
+# Global session maintenance instances
+metadata_flusher = MetadataFlusher()
+counter_verifier = CounterVerifier()
+session_archiver = SessionArchiver()
+retention_sweeper = RetentionSweeper()
@@ -4,18 +4,151 @@ Handles interactive session persistence using simple file storage (based on trad
 """
 
 import os
+import atexit
 import json
 import glob
 import logging
 import shutil
+import tarfile
+import threading
+import time
 import uuid
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 
+# Try to import the Strands file session storage, but handle gracefully if not available
+try:
+    from strands.session.file_session_manager import FileSessionManager
+    FILE_SESSION_MANAGER_AVAILABLE = True
+except ImportError:
+    FileSessionManager = object
+    FILE_SESSION_MANAGER_AVAILABLE = False
+
+from .session_index import SessionIndex, SESSION_INDEX_FILE
+from .credential_store import SessionCredentialStore, CREDENTIAL_STORE_FILE
+from .message_log import SegmentedLogSessionManager, find_message_log
+
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# Message storage for new sessions: "file" (one JSON file per message) or "log" (segmented message log)
+SESSION_STORAGE_BACKENDS = ["file", "log"]
+SESSION_STORAGE = os.getenv("KILOMARKET_SESSION_STORAGE", "file")
+
+# Session listing page sizes
+DEFAULT_SESSION_PAGE_SIZE = 50
+MAX_SESSION_PAGE_SIZE = 200
+
+# List projections: "summary" leaves out the message count and size
+SESSION_PROJECTIONS = ["full", "summary"]
+
+# Seconds session.json timestamp updates are held in memory before being written (0 writes them immediately)
+METADATA_FLUSH_INTERVAL = float(os.getenv("KILOMARKET_METADATA_FLUSH_INTERVAL", "5"))
+
+# Compressed archives of cold sessions live in sessions/archive/
+ARCHIVE_DIR = "archive"
+
+# Messages shown when a session is resumed, and the largest page the message API returns
+RESUME_MESSAGE_LIMIT = 50
+MAX_MESSAGE_PAGE_SIZE = 500
+
+
+def _message_text(message: Dict) -> str:
+    """Display text of a stored message: the first non-blank text block (reasoning blocks are skipped)"""
+    text_content = ""
+    for content_item in message.get("content", []) or []:
+        if isinstance(content_item, dict):
+            # Look for direct text content (not reasoningContent)
+            if "text" in content_item and content_item["text"].strip():
+                return content_item["text"]
+            # Handle old structure as fallback
+            elif "text" in content_item:
+                text_content = content_item["text"]
+    return text_content
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _disk_usage(path: str) -> int:
+    """Bytes used by every file under a directory"""
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            total += _file_size(os.path.join(root, name))
+    return total
+
+
+class _IndexedMessagesMixin:
+    """Reports message writes of a Strands session manager to the session index
+
+    The storage class provides message_size(session_id, agent_id, message_id). Storage that appends a new
+    record on update (instead of rewriting the message in place) sets updates_append.
+    """
+
+    updates_append = False
+
+    def __init__(self, session_id: str, storage_dir: str, index: SessionIndex, **kwargs):
+        # Set before the base constructor, which may already write the session and agent
+        self._index = index
+        super().__init__(session_id=session_id, storage_dir=storage_dir, **kwargs)
+
+    def create_message(self, session_id: str, agent_id: str, session_message, **kwargs):
+        super().create_message(session_id, agent_id, session_message, **kwargs)
+        try:
+            counted = bool(_message_text(session_message.message).strip())
+            size = self.message_size(session_id, agent_id, session_message.message_id)
+            self._index.add_message(session_id, counted, size, getattr(session_message, "created_at", None))
+        except Exception as e:
+            logger.error(f"Error indexing message for session {session_id}: {e}")
+
+    def update_message(self, session_id: str, agent_id: str, session_message, **kwargs):
+        before = self.message_size(session_id, agent_id, session_message.message_id)
+        super().update_message(session_id, agent_id, session_message, **kwargs)
+        try:
+            after = self.message_size(session_id, agent_id, session_message.message_id)
+            # An appended version leaves the old one on disk until the log is compacted
+            self._index.add_bytes(session_id, after if self.updates_append else after - before)
+        except Exception as e:
+            logger.error(f"Error indexing message update for session {session_id}: {e}")
+
+    def _agent_file_size(self, session_id: str, agent_id: str) -> int:
+        return _file_size(os.path.join(self._get_agent_path(session_id, agent_id), "agent.json"))
+
+    def create_agent(self, session_id: str, session_agent, **kwargs):
+        super().create_agent(session_id, session_agent, **kwargs)
+        try:
+            self._index.add_bytes(session_id, self._agent_file_size(session_id, session_agent.agent_id))
+        except Exception as e:
+            logger.error(f"Error indexing agent for session {session_id}: {e}")
+
+    def update_agent(self, session_id: str, session_agent, **kwargs):
+        before = self._agent_file_size(session_id, session_agent.agent_id)
+        super().update_agent(session_id, session_agent, **kwargs)
+        try:
+            self._index.add_bytes(session_id, self._agent_file_size(session_id, session_agent.agent_id) - before)
+        except Exception as e:
+            logger.error(f"Error indexing agent update for session {session_id}: {e}")
+
+
+class IndexedFileSessionManager(_IndexedMessagesMixin, FileSessionManager):
+    """FileSessionManager that reports message writes to the session index"""
+
+    def message_size(self, session_id: str, agent_id: str, message_id: int) -> int:
+        return _file_size(self._get_message_path(session_id, agent_id, message_id))
+
+
+class IndexedLogSessionManager(_IndexedMessagesMixin, SegmentedLogSessionManager):
+    """SegmentedLogSessionManager that reports message writes to the session index"""
+
+    updates_append = True
+
+
 class KiloMarketSessionManager:
     """Manages interactive sessions with simple file storage"""
     
@@ -23,32 +156,51 @@ class KiloMarketSessionManager:
         self.sessions_dir = sessions_dir
         os.makedirs(sessions_dir, exist_ok=True)
         
-        # Load session configurations  
-        self.session_configs = self._load_session_configs()
+        # Session passcodes, in their own store next to the settings file (opened on first use)
+        self._passcodes: Optional[SessionCredentialStore] = None
+        self._passcodes_lock = threading.Lock()
+        
+        # Timestamp updates waiting to be written to session.json (write-behind)
+        self._pending_timestamps: Dict[str, str] = {}
+        self._pending_lock = threading.Lock()
+        
+        # Per-session locks serialising archive and restore
+        self._session_locks: Dict[str, threading.Lock] = {}
+        self._session_locks_guard = threading.Lock()
+        
+        # Session metadata index; built from the session directories the first time it is opened
+        self.index = SessionIndex(os.path.join(sessions_dir, SESSION_INDEX_FILE))
+        if not self.index.is_built():
+            self.rebuild_index()
     
-    def _load_session_configs(self) -> Dict:
-        """Load session configurations from config file"""
-        try:
-            from .settings import settings_manager
-            settings = settings_manager.load_settings()
-            return settings.get("sessions", {}).get("passcodes", {})
-        except Exception as e:
-            logger.error(f"Error loading session configs: {e}")
-            return {}
+    @property
+    def passcodes(self) -> SessionCredentialStore:
+        """The passcode store"""
+        with self._passcodes_lock:
+            if self._passcodes is None:
+                self._passcodes = self._open_credential_store()
+            return self._passcodes
     
-    def _save_session_configs(self, configs: Dict):
-        """Save session configurations to config file"""
+    def _open_credential_store(self) -> SessionCredentialStore:
+        """Open the passcode store, moving passcodes still kept in the settings file into it"""
+        from .settings import settings_manager
+        store_dir = os.path.dirname(settings_manager.settings_file)
+        store = SessionCredentialStore(os.path.join(store_dir, CREDENTIAL_STORE_FILE))
         try:
-            from .settings import settings_manager
             settings = settings_manager.load_settings()
-            if "sessions" not in settings:
-                settings["sessions"] = {}
-            settings["sessions"]["passcodes"] = configs
-            settings_manager.save_settings(settings)
+            passcodes = settings.get("sessions", {}).pop("passcodes", None)
+            if passcodes:
+                imported = store.import_passcodes(passcodes)
+                if not settings["sessions"]:
+                    del settings["sessions"]
+                settings_manager.save_settings(settings)
+                logger.info(f"Moved {imported} session passcodes from the settings file to {store.db_path}")
         except Exception as e:
-            logger.error(f"Error saving session configs: {e}")
+            logger.error(f"Error migrating session passcodes: {e}")
+        return store
     
-    def create_session(self, approval_data: str, passcode: str, ai_provider: Dict) -> str:
+    def create_session(self, approval_data: str, passcode: str, ai_provider: Dict,
+                       conversation_manager: Optional[Dict] = None) -> str:
         """Create a new interactive session"""
         session_id = str(uuid.uuid4())
         
@@ -65,189 +217,591 @@ class KiloMarketSessionManager:
             "approval_data": approval_data,
             "ai_provider": ai_provider
         }
+        if conversation_manager:
+            session_data["conversation_manager"] = conversation_manager
         
         session_file = os.path.join(session_dir, "session.json")
         with open(session_file, 'w') as f:
             json.dump(session_data, f, indent=2)
+        self.index.upsert_session(session_data, message_count=0, byte_size=_file_size(session_file))
         
-        # Store passcode in config
-        self.session_configs[session_id] = passcode
-        self._save_session_configs(self.session_configs)
+        # Store passcode
+        self.passcodes.set(session_id, passcode)
         
         logger.info(f"Created new session: {session_id}")
         return session_id
     
     def get_session(self, session_id: str) -> Optional[Dict]:
-        """Get session metadata"""
+        """Get session metadata (archived sessions are answered from the index without restoring them)"""
         try:
             session_file = os.path.join(self.sessions_dir, f"session_{session_id}", "session.json")
             if os.path.exists(session_file):
                 with open(session_file, 'r') as f:
-                    return json.load(f)
+                    session_data = json.load(f)
+                # A newer timestamp may still be waiting to be written
+                with self._pending_lock:
+                    pending = self._pending_timestamps.get(session_id)
+                if pending:
+                    session_data["updated_at"] = pending
+                return session_data
+            if self.is_archived(session_id):
+                entry = self.index.get(session_id)
+                if entry:
+                    return json.loads(entry["data"])
+                return self._read_archive_meta(session_id)["session_data"]
             return None
         except Exception as e:
             logger.error(f"Error getting session {session_id}: {e}")
             return None
     
     def list_sessions(self) -> List[Dict]:
-        """List all available sessions with metadata (tradearena-cc style)"""
+        """List all available sessions with metadata (tradearena-cc style), served from the session index"""
         sessions = []
+        for row in self.index.list_all():
+            try:
+                sessions.append(self._session_info(row))
+            except Exception as e:
+                logger.error(f"Error loading indexed session {row.get('session_id')}: {e}")
+                continue
+        
+        # Already sorted by last activity (most recent first)
+        return sessions
+    
+    def list_sessions_page(self, limit: int = DEFAULT_SESSION_PAGE_SIZE, cursor: Optional[str] = None,
+                           provider: Optional[str] = None, session_type: Optional[str] = None,
+                           updated_after: Optional[str] = None, updated_before: Optional[str] = None,
+                           projection: str = "full") -> Dict[str, Any]:
+        """One page of sessions (most recent first) with the cursor for the next page
+        
+        Raises ValueError for an invalid cursor or projection.
+        """
+        if projection not in SESSION_PROJECTIONS:
+            raise ValueError(f"Unsupported projection: {projection}")
+        limit = max(1, min(limit, MAX_SESSION_PAGE_SIZE))
+        
+        rows, next_cursor = self.index.query(
+            limit, cursor=cursor, provider=provider, session_type=session_type,
+            updated_after=updated_after, updated_before=updated_before
+        )
+        sessions = []
+        for row in rows:
+            try:
+                sessions.append(self._session_info(row, projection))
+            except Exception as e:
+                logger.error(f"Error loading indexed session {row.get('session_id')}: {e}")
+                continue
+        return {"sessions": sessions, "next_cursor": next_cursor}
+    
+    def _session_info(self, row: Dict[str, Any], projection: str = "full") -> Dict[str, Any]:
+        """List entry for an index row"""
+        session_data = json.loads(row["data"])
+        session_id = row["session_id"]
+        session_info = {
+            "session_id": session_id,
+            "session_type": session_data.get("session_type", "interactive"),
+            "created_at": session_data.get("created_at"),
+            "updated_at": session_data.get("updated_at"),
+            "approval_data": session_data.get("approval_data", ""),
+            "ai_provider": session_data.get("ai_provider", {}),
+            "has_passcode": session_id in self.passcodes,
+            "archived": bool(row.get("archived"))
+        }
+        if projection == "full":
+            session_info["message_count"] = row["message_count"]
+            session_info["file_size"] = self._format_size(row["byte_size"])
+            session_info["last_message_at"] = row.get("last_message_at")
+        return session_info
+    
+    def rebuild_index(self) -> int:
+        """Re-scan every session directory into the session index; returns the number of sessions indexed"""
+        entries = []
         
         # Find all session directories
         session_dirs = glob.glob(os.path.join(self.sessions_dir, "session_*"))
         
         for session_dir in session_dirs:
+            if not os.path.isdir(session_dir):
+                continue
             session_file = os.path.join(session_dir, "session.json")
             if os.path.exists(session_file):
                 try:
                     with open(session_file, 'r') as f:
                         session_data = json.load(f)
                     
-                    # Calculate session size
-                    session_size = self._calculate_session_size(session_dir)
-                    
-                    # Get message count
-                    message_count = self._get_message_count(session_dir)
-                    
                     # Extract session ID from directory name
-                    session_id = os.path.basename(session_dir).replace("session_", "")
-                    
-                    session_info = {
-                        "session_id": session_id,
-                        "session_type": session_data.get("session_type", "interactive"),
-                        "created_at": session_data.get("created_at"),
-                        "updated_at": session_data.get("updated_at"),
-                        "approval_data": session_data.get("approval_data", ""),
-                        "ai_provider": session_data.get("ai_provider", {}),
-                        "message_count": message_count,
-                        "file_size": session_size,
-                        "has_passcode": session_id in self.session_configs
-                    }
+                    session_data["session_id"] = os.path.basename(session_dir).replace("session_", "")
                     
-                    sessions.append(session_info)
+                    entries.append({"session_data": session_data, **self._measure_counters(session_dir)})
                     
                 except Exception as e:
                     logger.error(f"Error loading session {session_dir}: {e}")
                     continue
         
-        # Sort by last activity (most recent first)
-        sessions.sort(key=lambda x: x.get("updated_at", ""), reverse=True)
-        return sessions
+        # Archived sessions are indexed from the metadata saved next to their archive
+        for meta_file in glob.glob(os.path.join(self.sessions_dir, ARCHIVE_DIR, "session_*.meta.json")):
+            try:
+                with open(meta_file, 'r') as f:
+                    entries.append({**json.load(f), "archived": True})
+            except Exception as e:
+                logger.error(f"Error loading archived session {meta_file}: {e}")
+                continue
+        
+        self.index.replace_all(entries)
+        logger.info(f"Rebuilt session index with {len(entries)} sessions")
+        return len(entries)
+    
+    def get_session_messages(self, session_id: str, limit: Optional[int] = None, before_id: Optional[int] = None,
+                             after_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Load messages from a specific session (all of them, or one page - see get_session_messages_page)"""
+        return self.get_session_messages_page(session_id, limit, before_id, after_id)["messages"]
     
-    def get_session_messages(self, session_id: str) -> List[Dict[str, Any]]:
-        """Load all messages from a specific session"""
+    def get_session_messages_page(self, session_id: str, limit: Optional[int] = None,
+                                  before_id: Optional[int] = None,
+                                  after_id: Optional[int] = None) -> Dict[str, Any]:
+        """Load one page of messages, oldest first within the page
+        
+        Without after_id the page is the latest `limit` messages (older than before_id, if given),
+        found by reading message files newest first; with after_id it is the next `limit` messages
+        after it. Only the files needed to fill the page are opened. has_more says whether further
+        messages exist beyond the page in the direction it was read.
+        """
+        try:
+            self.restore_session(session_id)
+        except Exception as e:
+            logger.error(f"Error restoring archived session {session_id}: {e}")
+            return {"messages": [], "has_more": False, "error": "Session archive could not be restored"}
+        return self._read_messages_page(session_id, limit, before_id, after_id)
+    
+    def _read_messages_page(self, session_id: str, limit: Optional[int] = None, before_id: Optional[int] = None,
+                            after_id: Optional[int] = None) -> Dict[str, Any]:
+        """get_session_messages_page on the session directory as it is on disk, without restoring it"""
+        agent_dir = self._get_agent_dir(session_id)
+        if not agent_dir:
+            return {"messages": [], "has_more": False}
+        
+        # Message ids come from the log index or the file names, so nothing is parsed to order them
+        message_log = find_message_log(agent_dir)
+        if message_log:
+            message_ids = list(range(message_log.count()))
+        else:
+            message_dir = os.path.join(agent_dir, "messages")
+            message_ids = self._list_message_ids(message_dir)
+        if before_id is not None:
+            message_ids = [message_id for message_id in message_ids if message_id < before_id]
+        if after_id is not None:
+            message_ids = [message_id for message_id in message_ids if message_id > after_id]
+        
+        # Tail-first unless paging forward
+        if after_id is None:
+            message_ids.reverse()
+        
+        messages = []
+        has_more = False
+        for message_id in message_ids:
+            if limit is not None and len(messages) >= limit:
+                has_more = True
+                break
+            if message_log:
+                message = self._format_message(message_log.read(message_id))
+            else:
+                message = self._load_message(os.path.join(message_dir, f"message_{message_id}.json"))
+            if message:
+                messages.append(message)
+        
+        if after_id is None:
+            messages.reverse()
+        return {"messages": messages, "has_more": has_more}
+    
+    def count_session_messages(self, session_id: str) -> int:
+        """Number of displayable messages in a session, without reading any message files"""
+        entry = self.index.get(session_id)
+        if entry is not None:
+            return entry["message_count"]
+        return len(self.get_session_messages(session_id))
+    
+    def _get_agent_dir(self, session_id: str) -> Optional[str]:
+        """Directory of the session's agent, if the session has one"""
         session_dir = os.path.join(self.sessions_dir, f"session_{session_id}")
         
         if not os.path.exists(session_dir):
-            return []
+            return None
         
         # Find agent directory
         agent_dirs = glob.glob(os.path.join(session_dir, "agents", "agent_*"))
         if not agent_dirs:
-            return []
-        
-        agent_dir = agent_dirs[0]
-        message_files = glob.glob(os.path.join(agent_dir, "messages", "message_*.json"))
-        
-        # Sort messages by ID
-        message_files.sort(key=lambda x: int(os.path.basename(x).split("_")[1].split(".")[0]))
-        
-        messages = []
-        for message_file in message_files:
-            try:
-                with open(message_file, 'r') as f:
-                    message_data = json.load(f)
-                    
-                # Extract text content
-                message = message_data.get("message", {})
-                content = message.get("content", [])
-                
-                text_content = ""
-                if content and len(content) > 0:
-                    # Handle new message structure with reasoningContent and text
-                    for content_item in content:
-                        if isinstance(content_item, dict):
-                            # Look for direct text content (not reasoningContent)
-                            if "text" in content_item and content_item["text"].strip():
-                                text_content = content_item["text"]
-                                logger.debug(f"Found text content: {text_content[:100]}...")
-                                break
-                            # Handle old structure as fallback
-                            elif "text" in content_item:
-                                text_content = content_item["text"]
-                
-                formatted_message = {
-                    "role": message.get("role", "unknown"),
-                    "content": text_content,
-                    "message_id": message_data.get("message_id"),
-                    "created_at": message_data.get("created_at"),
-                    "updated_at": message_data.get("updated_at")
-                }
-                
-                # Only add messages with actual content (filter out blank/empty messages)
-                if text_content and text_content.strip():
-                    messages.append(formatted_message)
-                else:
-                    logger.debug(f"Skipping blank message: {message_data.get('message_id')}")
-            except Exception as e:
-                logger.error(f"Error loading message {message_file}: {e}")
-                continue
+            return None
         
-        return messages
+        return agent_dirs[0]
+    
+    @staticmethod
+    def _list_message_ids(message_dir: str) -> List[int]:
+        """Sorted message ids from the message_<id>.json file names"""
+        message_ids = []
+        try:
+            with os.scandir(message_dir) as entries:
+                for entry in entries:
+                    name = entry.name
+                    if name.startswith("message_") and name.endswith(".json"):
+                        try:
+                            message_ids.append(int(name[len("message_"):-len(".json")]))
+                        except ValueError:
+                            continue
+        except OSError:
+            return []
+        message_ids.sort()
+        return message_ids
+    
+    @staticmethod
+    def _has_message_files(message_dir: str) -> bool:
+        """Whether any message_<id>.json file exists (stops at the first one)"""
+        try:
+            with os.scandir(message_dir) as entries:
+                return any(entry.name.startswith("message_") for entry in entries)
+        except OSError:
+            return False
+    
+    def _load_message(self, message_file: str) -> Optional[Dict[str, Any]]:
+        """Display form of one message file, or None for blank or unreadable messages"""
+        try:
+            with open(message_file, 'r') as f:
+                return self._format_message(json.load(f))
+        except Exception as e:
+            logger.error(f"Error loading message {message_file}: {e}")
+            return None
+    
+    def _format_message(self, message_data: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Display form of one stored message, or None for blank messages"""
+        if not message_data:
+            return None
+        try:
+            # Extract text content
+            message = message_data.get("message", {})
+            text_content = _message_text(message)
+            
+            # Only return messages with actual content (filter out blank/empty messages)
+            if not (text_content and text_content.strip()):
+                logger.debug(f"Skipping blank message: {message_data.get('message_id')}")
+                return None
+            
+            return {
+                "role": message.get("role", "unknown"),
+                "content": text_content,
+                "message_id": message_data.get("message_id"),
+                "created_at": message_data.get("created_at"),
+                "updated_at": message_data.get("updated_at")
+            }
+        except Exception as e:
+            logger.error(f"Error formatting message {message_data.get('message_id')}: {e}")
+            return None
     
     def get_session_manager(self, session_id: str):
         """Get FileSessionManager for a session"""
         try:
-            # Import here to avoid circular imports
-            try:
-                from strands.session.file_session_manager import FileSessionManager
-            except ImportError:
+            if not FILE_SESSION_MANAGER_AVAILABLE:
                 logger.error("StrandsAgents FileSessionManager not available")
                 return None
             
-            # Create session directory if it doesn't exist
-            session_dir = os.path.join(self.sessions_dir, f"session_{session_id}")
-            os.makedirs(session_dir, exist_ok=True)
-            
-            # Create and return FileSessionManager
-            return FileSessionManager(
-                session_id=session_id,
-                storage_dir=self.sessions_dir
-            )
+            # Held while the session is opened so archival or retention cannot remove it underneath
+            with self._session_lock(session_id):
+                # Inflate an archived session before Strands reads it
+                self._restore_locked(session_id)
+                
+                # Create session directory if it doesn't exist
+                session_dir = os.path.join(self.sessions_dir, f"session_{session_id}")
+                os.makedirs(session_dir, exist_ok=True)
+                
+                # Opening is activity: archival and retention re-check updated_at under this lock
+                self._mark_active(session_id)
+                
+                # Create and return the session manager for the session's storage (message writes update the index)
+                manager_class = IndexedLogSessionManager if self._session_storage(session_id) == "log" \
+                    else IndexedFileSessionManager
+                return manager_class(
+                    session_id=session_id,
+                    storage_dir=self.sessions_dir,
+                    index=self.index
+                )
         except Exception as e:
             logger.error(f"Error creating session manager for {session_id}: {e}")
             return None
     
+    def _session_storage(self, session_id: str) -> str:
+        """Message storage of a session: whatever its agent already uses, else the configured backend"""
+        agent_dir = self._get_agent_dir(session_id)
+        if agent_dir:
+            if find_message_log(agent_dir):
+                return "log"
+            if self._has_message_files(os.path.join(agent_dir, "messages")):
+                return "file"
+        return SESSION_STORAGE if SESSION_STORAGE in SESSION_STORAGE_BACKENDS else "file"
+    
+    def _session_lock(self, session_id: str) -> threading.Lock:
+        with self._session_locks_guard:
+            return self._session_locks.setdefault(session_id, threading.Lock())
+    
+    def _archive_path(self, session_id: str) -> str:
+        return os.path.join(self.sessions_dir, ARCHIVE_DIR, f"session_{session_id}.tar.gz")
+    
+    def _archive_meta_path(self, session_id: str) -> str:
+        return os.path.join(self.sessions_dir, ARCHIVE_DIR, f"session_{session_id}.meta.json")
+    
+    def _discard_path(self, session_id: str) -> str:
+        return os.path.join(self.sessions_dir, ARCHIVE_DIR, f".discard_{session_id}")
+    
+    def _read_archive_meta(self, session_id: str) -> Dict[str, Any]:
+        with open(self._archive_meta_path(session_id), 'r') as f:
+            return json.load(f)
+    
+    def is_archived(self, session_id: str) -> bool:
+        return os.path.exists(self._archive_path(session_id))
+    
+    def _still_idle(self, session_id: str, idle_before: Optional[str] = None, updated_at: Optional[str] = None,
+                    is_busy: Optional[Any] = None) -> bool:
+        """Re-check, with the session lock held, that a session picked for archival or retention is unused
+        
+        It must not be busy (is_busy(session_id)), must still be older than idle_before, and must still
+        have the updated_at it was picked with.
+        """
+        if is_busy is not None and is_busy(session_id):
+            return False
+        entry = self.index.get(session_id)
+        current = (entry or {}).get("updated_at") or ""
+        if idle_before is not None and current >= idle_before:
+            return False
+        if updated_at is not None and current != updated_at:
+            return False
+        return True
+    
+    def archive_session(self, session_id: str, idle_before: Optional[str] = None, updated_at: Optional[str] = None,
+                        is_busy: Optional[Any] = None) -> Optional[Dict[str, Any]]:
+        """Pack a session directory into a gzip archive; returns the bytes before and after, or None if skipped
+        
+        The session stays in the index (flagged archived) and is restored on first use. idle_before,
+        updated_at and is_busy are re-checked under the session lock (see _still_idle).
+        """
+        with self._session_lock(session_id):
+            session_dir = os.path.join(self.sessions_dir, f"session_{session_id}")
+            if not os.path.isdir(session_dir) or self.is_archived(session_id):
+                return None
+            if not self._still_idle(session_id, idle_before, updated_at, is_busy):
+                return None
+            self._flush_timestamp(session_id)
+            
+            entry = self.index.get(session_id)
+            if entry:
+                meta = {
+                    "session_data": json.loads(entry["data"]),
+                    "message_count": entry["message_count"],
+                    "byte_size": entry["byte_size"],
+                    "last_message_at": entry.get("last_message_at")
+                }
+            else:
+                with open(os.path.join(session_dir, "session.json"), 'r') as f:
+                    session_data = json.load(f)
+                session_data["session_id"] = session_id
+                meta = {"session_data": session_data, **self._measure_counters(session_dir)}
+            bytes_before = _disk_usage(session_dir)
+            
+            # Write to temporary names and rename, so a crash never leaves a partial archive in place
+            archive_path = self._archive_path(session_id)
+            os.makedirs(os.path.dirname(archive_path), exist_ok=True)
+            with tarfile.open(archive_path + ".tmp", "w:gz") as tar:
+                tar.add(session_dir, arcname=f"session_{session_id}")
+            meta_path = self._archive_meta_path(session_id)
+            with open(meta_path + ".tmp", 'w') as f:
+                json.dump(meta, f)
+            os.replace(meta_path + ".tmp", meta_path)
+            os.replace(archive_path + ".tmp", archive_path)
+            
+            # Move the directory aside in one rename before deleting it, so it is either whole or gone
+            discard_dir = self._discard_path(session_id)
+            os.replace(session_dir, discard_dir)
+            shutil.rmtree(discard_dir)
+            self.index.set_archived(session_id, True)
+            bytes_after = _file_size(archive_path) + _file_size(meta_path)
+        
+        logger.info(f"Archived session {session_id}: {bytes_before} -> {bytes_after} bytes")
+        return {"session_id": session_id, "bytes_before": bytes_before, "bytes_after": bytes_after}
+    
+    def restore_session(self, session_id: str) -> bool:
+        """Inflate an archived session back into its directory; returns whether it was archived"""
+        # Always take the lock: a session being archived only looks archived after the final rename
+        with self._session_lock(session_id):
+            restored = self._restore_locked(session_id)
+        if restored:
+            logger.info(f"Restored archived session {session_id}")
+        return restored
+    
+    def _restore_locked(self, session_id: str) -> bool:
+        """restore_session with the session lock already held"""
+        archive_path = self._archive_path(session_id)
+        if not os.path.exists(archive_path):
+            return False
+        
+        # Left over if the process died while archiving
+        shutil.rmtree(self._discard_path(session_id), ignore_errors=True)
+        
+        session_dir = os.path.join(self.sessions_dir, f"session_{session_id}")
+        if os.path.isdir(session_dir):
+            # The archive was written but the directory never removed; the directory is the live copy
+            logger.warning(f"Session {session_id} has both a directory and an archive, dropping the archive")
+            self._remove_archive_files(session_id)
+            self.index.set_archived(session_id, False)
+            return False
+        
+        staging_dir = os.path.join(self.sessions_dir, ARCHIVE_DIR, f".restore_{session_id}")
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        with tarfile.open(archive_path, "r:gz") as tar:
+            members = [
+                member for member in tar.getmembers()
+                if (member.isfile() or member.isdir())
+                and os.path.normpath(member.name).split(os.sep)[0] == f"session_{session_id}"
+                and ".." not in member.name.split("/")
+            ]
+            # Use the tarfile "data" filter where available
+            extract_options = {"filter": "data"} if hasattr(tarfile, "data_filter") else {}
+            tar.extractall(staging_dir, members=members, **extract_options)
+        os.replace(os.path.join(staging_dir, f"session_{session_id}"), session_dir)
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        
+        self._remove_archive_files(session_id)
+        self.index.set_archived(session_id, False)
+        
+        return True
+    
+    def _remove_archive_files(self, session_id: str):
+        for archive_file in (self._archive_path(session_id), self._archive_meta_path(session_id)):
+            if os.path.exists(archive_file):
+                os.remove(archive_file)
+    
+    def archive_idle_sessions(self, idle_before: str, limit: int,
+                              is_busy: Optional[Any] = None) -> Dict[str, Any]:
+        """Archive up to `limit` sessions last updated before idle_before (is_busy(session_id) skips one)"""
+        report = {"archived": 0, "skipped": 0, "bytes_before": 0, "bytes_after": 0}
+        for entry in self.index.idle_sessions(idle_before, limit):
+            session_id = entry["session_id"]
+            try:
+                # Busy and idle are checked under the session lock, so a session opened since it was picked is kept
+                result = self.archive_session(session_id, idle_before=idle_before, is_busy=is_busy)
+            except Exception as e:
+                logger.error(f"Error archiving session {session_id}: {e}")
+                result = None
+            if not result:
+                report["skipped"] += 1
+                continue
+            report["archived"] += 1
+            report["bytes_before"] += result["bytes_before"]
+            report["bytes_after"] += result["bytes_after"]
+        return report
+    
+    def session_disk_usage(self, session_id: str) -> int:
+        """Bytes a session occupies on disk, as a directory or an archive"""
+        return (_disk_usage(os.path.join(self.sessions_dir, f"session_{session_id}"))
+                + _file_size(self._archive_path(session_id)) + _file_size(self._archive_meta_path(session_id)))
+    
+    def prune_orphan_passcodes(self, limit: int) -> int:
+        """Remove up to `limit` passcodes whose session no longer exists; returns the number removed"""
+        removed = 0
+        for session_id in self.passcodes.session_ids():
+            if removed >= limit:
+                break
+            if self.index.get(session_id) is None and not self.is_archived(session_id) \
+                    and not os.path.isdir(os.path.join(self.sessions_dir, f"session_{session_id}")):
+                self.passcodes.delete(session_id)
+                removed += 1
+        return removed
+    
     def get_passcode(self, session_id: str) -> Optional[str]:
         """Get passcode for a session"""
-        return self.session_configs.get(session_id)
+        return self.passcodes.get(session_id)
     
     def update_session_timestamp(self, session_id: str):
-        """Update session timestamp"""
+        """Update session timestamp
+        
+        The index is updated at once; session.json is rewritten by the next flush_timestamps(), so a
+        busy session costs at most one file write per flush interval.
+        """
         try:
-            session_file = os.path.join(self.sessions_dir, f"session_{session_id}", "session.json")
-            if os.path.exists(session_file):
-                with open(session_file, 'r') as f:
-                    session_data = json.load(f)
-                session_data["updated_at"] = datetime.now().isoformat()
-                with open(session_file, 'w') as f:
-                    json.dump(session_data, f, indent=2)
-                
+            # One locked section, so an archiver holding the old updated_at cannot act between the two steps
+            with self._session_lock(session_id):
+                restored = self._restore_locked(session_id)
+                self._mark_active(session_id)
+            if restored:
+                logger.info(f"Restored archived session {session_id}")
         except Exception as e:
             logger.error(f"Error updating session timestamp {session_id}: {e}")
     
-    def delete_session(self, session_id: str) -> bool:
-        """Delete a session and its data"""
+    def _mark_active(self, session_id: str):
+        """Set updated_at to now in the index and hold it for session.json"""
+        session_file = os.path.join(self.sessions_dir, f"session_{session_id}", "session.json")
+        if os.path.exists(session_file):
+            updated_at = datetime.now().isoformat()
+            self.index.touch(session_id, updated_at)
+            with self._pending_lock:
+                self._pending_timestamps[session_id] = updated_at
+            if METADATA_FLUSH_INTERVAL <= 0:
+                self._flush_timestamp(session_id)
+    
+    def flush_timestamps(self) -> int:
+        """Write every pending timestamp to its session.json; returns the number of files written"""
+        with self._pending_lock:
+            session_ids = list(self._pending_timestamps)
+        return sum(1 for session_id in session_ids if self._flush_timestamp(session_id))
+    
+    def _flush_timestamp(self, session_id: str) -> bool:
+        """Write one session's pending timestamp with an atomic rename"""
+        with self._pending_lock:
+            updated_at = self._pending_timestamps.pop(session_id, None)
+        if updated_at is None:
+            return False
+        
+        session_file = os.path.join(self.sessions_dir, f"session_{session_id}", "session.json")
         try:
-            # Remove passcode from config
-            if session_id in self.session_configs:
-                del self.session_configs[session_id]
-                self._save_session_configs(self.session_configs)
-            
-            # Remove session directory
-            session_dir = os.path.join(self.sessions_dir, f"session_{session_id}")
-            if os.path.exists(session_dir):
-                shutil.rmtree(session_dir)
+            if not os.path.exists(session_file):
+                # Deleted since the update
+                return False
+            before = _file_size(session_file)
+            with open(session_file, 'r') as f:
+                session_data = json.load(f)
+            session_data["updated_at"] = max(updated_at, session_data.get("updated_at") or "")
+            tmp_file = session_file + ".tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(session_data, f, indent=2)
+            os.replace(tmp_file, session_file)
+            self.index.add_bytes(session_id, _file_size(session_file) - before)
+            return True
+        except Exception as e:
+            logger.error(f"Error writing session timestamp {session_id}: {e}")
+            # Keep it for the next flush unless a newer update has arrived
+            with self._pending_lock:
+                self._pending_timestamps.setdefault(session_id, updated_at)
+            return False
+    
+    def delete_session(self, session_id: str, updated_at: Optional[str] = None,
+                       is_busy: Optional[Any] = None) -> bool:
+        """Delete a session and its data
+        
+        updated_at and is_busy are optional and re-checked under the session lock (see _still_idle); the
+        session is left alone if it has been used since it was picked.
+        """
+        try:
+            with self._session_lock(session_id):
+                if not self._still_idle(session_id, None, updated_at, is_busy):
+                    return False
+                
+                # Remove passcode
+                self.passcodes.delete(session_id)
+                
+                # Drop any unwritten timestamp
+                with self._pending_lock:
+                    self._pending_timestamps.pop(session_id, None)
+                
+                # Remove session directory
+                session_dir = os.path.join(self.sessions_dir, f"session_{session_id}")
+                if os.path.exists(session_dir):
+                    shutil.rmtree(session_dir)
+                self._remove_archive_files(session_id)
+                self.index.delete(session_id)
             
             logger.info(f"Successfully deleted session: {session_id}")
             return True
@@ -256,20 +810,24 @@ class KiloMarketSessionManager:
             logger.error(f"Error deleting session {session_id}: {e}")
             return False
     
-    def _calculate_session_size(self, session_dir: str) -> str:
-        """Calculate total size of session files in human-readable format"""
+    def _calculate_session_size(self, session_dir: str) -> int:
+        """Calculate total size of session files in bytes"""
         total_size = 0
         
         for root, dirs, files in os.walk(session_dir):
             for file in files:
-                if file.endswith('.json'):
+                if file.endswith(('.json', '.jsonl')):
                     file_path = os.path.join(root, file)
                     try:
                         total_size += os.path.getsize(file_path)
                     except OSError:
                         continue
         
-        # Convert to human-readable format
+        return total_size
+    
+    @staticmethod
+    def _format_size(total_size: int) -> str:
+        """Convert a byte count to human-readable format"""
         if total_size < 1024:
             return f"{total_size}B"
         elif total_size < 1024 * 1024:
@@ -277,16 +835,53 @@ class KiloMarketSessionManager:
         else:
             return f"{total_size // (1024 * 1024)}MB"
     
-    def _get_message_count(self, session_dir: str) -> int:
-        """Get message count for a session"""
+    def _measure_counters(self, session_dir: str) -> Dict[str, Any]:
+        """Message count, byte size and last message time of a session, measured from disk"""
         try:
             # Extract session ID from directory name
             session_id = os.path.basename(session_dir).replace("session_", "")
-            messages = self.get_session_messages(session_id)
-            return len(messages)
+            # Read straight from disk: callers may hold the session lock, which restoring takes
+            messages = self._read_messages_page(session_id)["messages"]
         except Exception as e:
             logger.error(f"Error getting message count {session_dir}: {e}")
-            return 0
+            messages = []
+        return {
+            "message_count": len(messages),
+            "byte_size": self._calculate_session_size(session_dir),
+            "last_message_at": messages[-1].get("created_at") if messages else None
+        }
+    
+    def verify_counters(self, batch_size: int) -> Dict[str, Any]:
+        """Re-measure the counters of the least recently verified sessions and repair any drift"""
+        report = {"checked": 0, "repaired": 0, "removed": 0, "message_drift": 0, "byte_drift": 0}
+        for entry in self.index.least_recently_verified(batch_size):
+            session_id = entry["session_id"]
+            session_dir = os.path.join(self.sessions_dir, f"session_{session_id}")
+            report["checked"] += 1
+            if self.is_archived(session_id):
+                # Counters were frozen when the session was archived
+                self.index.mark_verified(session_id, time.time())
+                continue
+            if not os.path.isdir(session_dir):
+                # Removed behind the index's back
+                self.index.delete(session_id)
+                report["removed"] += 1
+                continue
+            
+            measured = self._measure_counters(session_dir)
+            message_drift = measured["message_count"] - entry["message_count"]
+            byte_drift = measured["byte_size"] - entry["byte_size"]
+            if message_drift or byte_drift or measured["last_message_at"] != entry["last_message_at"]:
+                logger.info(f"Repaired session {session_id} counters: "
+                            f"{message_drift:+d} messages, {byte_drift:+d} bytes")
+                report["repaired"] += 1
+                report["message_drift"] += abs(message_drift)
+                report["byte_drift"] += abs(byte_drift)
+                self.index.set_counters(session_id, measured["message_count"], measured["byte_size"],
+                                        measured["last_message_at"], time.time())
+            else:
+                self.index.mark_verified(session_id, time.time())
+        return report
     
     def _get_provider_display_name(self, provider_id: str) -> str:
         """Get display name for AI provider (tradearena-cc style)"""
@@ -324,5 +919,18 @@ class KiloMarketSessionManager:
         
         return provider_display
 
-# Global session manager instance
-session_manager = KiloMarketSessionManager()
\ No newline at end of file
+# Global session manager instance, created on first import of session_manager so that tools which
+# only need the class (python -m server.session_index) do not open ./sessions
+_session_manager_lock = threading.Lock()
+
+
+def __getattr__(name):
+    if name != "session_manager":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _session_manager_lock:
+        if "session_manager" not in globals():
+            manager = KiloMarketSessionManager()
+            # Write out held timestamps when the process exits without a server shutdown
+            atexit.register(manager.flush_timestamps)
+            globals()["session_manager"] = manager
+        return globals()["session_manager"]
@@ -0,0 +1,144 @@
+"""
+Stub model provider for KiloMarket load testing
+Streams deterministic tokens at a configurable rate and first-token latency without calling a real provider
+"""
+
+import asyncio
+import math
+import random
+import time
+import typing
+from typing import Any, Dict
+
+# Strands model base class, used by the stub model
+try:
+    from strands.models.model import Model
+except ImportError:
+    Model = object
+
+STUB_PROVIDER = "stub"
+
+# Latency distributions for the first token
+LATENCY_DISTRIBUTIONS = ["fixed", "uniform", "normal", "lognormal"]
+
+DEFAULT_STUB_CONFIG = {
+    "model_id": "stub-model",
+    "token_rate": 50.0,       # output tokens per second
+    "latency_ms": 300.0,      # mean time to first token
+    "jitter_ms": 100.0,       # spread of the latency distribution
+    "distribution": "lognormal",
+    "output_tokens": 120,     # tokens per response
+    "seed": 0
+}
+
+
+class StubModel(Model):
+    """Strands model that emits canned text with simulated provider timing"""
+
+    def __init__(self, **model_config):
+        self.config = {**DEFAULT_STUB_CONFIG, **model_config}
+        if self.config["distribution"] not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unsupported latency distribution: {self.config['distribution']}")
+        self._random = random.Random(self.config["seed"])
+
+    def update_config(self, **model_config):
+        self.config.update(model_config)
+
+    def get_config(self) -> Dict[str, Any]:
+        return self.config
+
+    def sample_latency(self) -> float:
+        """Draw a first-token latency in seconds"""
+        mean = max(0.0, float(self.config["latency_ms"]))
+        spread = max(0.0, float(self.config["jitter_ms"]))
+        distribution = self.config["distribution"]
+
+        if distribution == "uniform":
+            value = self._random.uniform(mean - spread, mean + spread)
+        elif distribution == "normal":
+            value = self._random.gauss(mean, spread)
+        elif distribution == "lognormal" and mean > 0:
+            # Parameterised so the distribution has the configured mean and standard deviation
+            sigma_squared = math.log(1 + (spread / mean) ** 2)
+            value = self._random.lognormvariate(math.log(mean) - sigma_squared / 2, math.sqrt(sigma_squared))
+        else:
+            value = mean
+        return max(0.0, value) / 1000
+
+    async def structured_output(self, output_model, prompt, system_prompt=None, **kwargs):
+        """Yield {"output": instance} after the simulated latency; fields are filled with fixed placeholder values"""
+        await asyncio.sleep(self.sample_latency())
+        yield {"output": stub_instance(output_model)}
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs):
+        started = time.monotonic()
+        output_tokens = int(self.config["output_tokens"])
+        token_rate = float(self.config["token_rate"])
+        interval = 1.0 / token_rate if token_rate > 0 else 0.0
+        input_tokens = sum(len(str(message.get("content", ""))) for message in messages) // 4
+
+        await asyncio.sleep(self.sample_latency())
+
+        yield {"messageStart": {"role": "assistant"}}
+        yield {"contentBlockStart": {"start": {}}}
+        for index in range(output_tokens):
+            if index and interval:
+                await asyncio.sleep(interval)
+            yield {"contentBlockDelta": {"delta": {"text": f"token{index} "}}}
+        yield {"contentBlockStop": {}}
+        yield {"messageStop": {"stopReason": "end_turn"}}
+        yield {
+            "metadata": {
+                "usage": {
+                    "inputTokens": input_tokens,
+                    "outputTokens": output_tokens,
+                    "totalTokens": input_tokens + output_tokens
+                },
+                "metrics": {"latencyMs": int((time.monotonic() - started) * 1000)}
+            }
+        }
+
+
+def _stub_value(annotation: Any) -> Any:
+    """Deterministic placeholder for a field type"""
+    origin = typing.get_origin(annotation)
+    if origin is typing.Union:
+        args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        if len(args) < len(typing.get_args(annotation)):
+            return None
+        return _stub_value(args[0]) if args else None
+    if origin is typing.Literal:
+        return typing.get_args(annotation)[0]
+    if origin in (list, set, tuple, frozenset):
+        return origin()
+    if origin is dict:
+        return {}
+    if annotation is str:
+        return "stub"
+    if annotation is bool:
+        return False
+    if annotation is int:
+        return 0
+    if annotation is float:
+        return 0.0
+    if hasattr(annotation, "model_fields"):
+        return stub_instance(annotation)
+    return None
+
+
+def stub_instance(output_model: Any) -> Any:
+    """Build an instance of a Pydantic model using field defaults, else fixed placeholders by type"""
+    values = {}
+    for name, field in output_model.model_fields.items():
+        if field.is_required():
+            values[name] = _stub_value(field.annotation)
+    try:
+        return output_model.model_validate(values)
+    except ValueError:
+        # Constrained fields may reject the placeholders; build the instance without validation instead
+        return output_model.model_construct(**values)
+
+
+def build_stub_model(spec: Dict[str, Any]) -> StubModel:
+    """Model pool builder for the stub provider"""
+    return StubModel(model_id=spec["model_id"], **spec["params"])
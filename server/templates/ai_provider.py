@@ -58,6 +58,11 @@ def ai_provider_template(current_provider: dict = None, error_message: str = Non
                     <div class="help-text">
                         <strong>Note:</strong> Use this for OpenAI API or compatible services like LocalAI, Ollama, etc.
                     </div>"""
+        elif provider_id == "replay":
+            help_text = """
+                    <div class="help-text">
+                        <strong>Note:</strong> Replays streams recorded with KILOMARKET_RECORD_DIR set; the recording file must be inside that directory. Modes: realtime, accelerated (divided by speed) or instant.
+                    </div>"""
         
         config_forms += f"""
         <div id="config-{provider_id}" class="provider-config" style="display: none;">
@@ -275,7 +280,8 @@ def ai_provider_template(current_provider: dict = None, error_message: str = Non
                 'amazon_bedrock': ['model_id', 'region_name'],
                 'anthropic': ['api_key', 'model_id'],
                 'gemini': ['api_key', 'model_id'],
-                'openai_compatible': ['api_key', 'base_url', 'model_id']
+                'openai_compatible': ['api_key', 'base_url', 'model_id'],
+                'replay': ['recording_file', 'mode', 'speed']
             };
             
             // Handle form submission
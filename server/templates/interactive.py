@@ -64,22 +64,29 @@ def interactive_mode_template() -> str:
     additional_js = f"""
 {SUBMENU_JS}
 
+// Sessions fetched per page of the session list
+const SESSION_PAGE_SIZE = 20;
+
 class InteractiveMenu extends SubMenu {{
     constructor() {{
         super();
         this.loadSessions();
     }}
     
-    async loadSessions() {{
+    async loadSessions(cursor = null) {{
         try {{
-            const response = await fetch('/api/sessions');
+            const params = new URLSearchParams({{ limit: SESSION_PAGE_SIZE }});
+            if (cursor) {{
+                params.set('cursor', cursor);
+            }}
+            const response = await fetch(`/api/sessions?${{params}}`);
             const data = await response.json();
             const sessions = data.sessions || [];
             
             const loadingItem = document.getElementById('loadingSessions');
             const sessionsList = document.getElementById('sessionsList');
             
-            if (sessions.length === 0) {{
+            if (sessions.length === 0 && !cursor) {{
                 loadingItem.innerHTML = '<span class="empty-state" style="color: #888888 !important; font-style: italic !important;">No previous sessions found</span>';
                 loadingItem.classList.remove('loading');
                 loadingItem.classList.add('empty-state');
@@ -89,8 +96,13 @@ class InteractiveMenu extends SubMenu {{
             // Hide loading item
             loadingItem.style.display = 'none';
             
+            // Replace the previous "load more" item with this page's sessions
+            const moreItem = document.getElementById('loadMoreSessions');
+            if (moreItem) {{
+                moreItem.remove();
+            }}
+            
             // Create session items
-            sessionsList.innerHTML = '';
             sessions.forEach(session => {{
                 const sessionDate = new Date(session.updated_at).toLocaleDateString();
                 const sessionTime = new Date(session.updated_at).toLocaleTimeString();
@@ -110,14 +122,29 @@ class InteractiveMenu extends SubMenu {{
                 sessionsList.appendChild(sessionItem);
             }});
             
+            if (data.next_cursor) {{
+                const loadMoreItem = document.createElement('div');
+                loadMoreItem.className = 'menu-item';
+                loadMoreItem.id = 'loadMoreSessions';
+                loadMoreItem.setAttribute('data-action', 'more');
+                loadMoreItem.setAttribute('data-cursor', data.next_cursor);
+                loadMoreItem.textContent = 'Load older sessions...';
+                sessionsList.appendChild(loadMoreItem);
+            }}
+            
             sessionsList.style.display = 'block';
             
             // Reinitialize menu items
             this.menuItems = document.querySelectorAll('#menuItems .menu-item:not([style*="display: none"])');
+            this.updateSelection();
             
         }} catch (error) {{
             console.error('Error loading sessions:', error);
             const loadingItem = document.getElementById('loadingSessions');
+            if (cursor) {{
+                alert('Failed to load more sessions');
+                return;
+            }}
             loadingItem.textContent = 'Failed to load sessions';
             loadingItem.classList.remove('loading');
         }}
@@ -127,6 +154,12 @@ class InteractiveMenu extends SubMenu {{
         const selectedItem = this.menuItems[this.selectedIndex];
         const action = selectedItem.getAttribute('data-action');
         
+        if (action === 'more') {{
+            selectedItem.textContent = 'Loading older sessions...';
+            this.loadSessions(selectedItem.getAttribute('data-cursor'));
+            return;
+        }}
+        
         if (action.startsWith('resume-')) {{
             const sessionId = action.replace('resume-', '');
             window.location.href = `/resume-session/${{sessionId}}`;
@@ -311,11 +344,21 @@ document.addEventListener('DOMContentLoaded', function() {{
     
     return base_template("KiloMarket Terminal - New Session", content, additional_css, additional_js)
 
-def chat_session_template(session_id: str, session_data: dict, messages: list = None) -> str:
-    """Chat session template for interactive mode"""
+def chat_session_template(session_id: str, session_data: dict, messages: list = None,
+                          message_count: int = None, has_more: bool = False) -> str:
+    """Chat session template for interactive mode
+    
+    messages may be only the latest page; has_more adds a control that fetches earlier pages.
+    """
     
     # Generate preloaded messages HTML if provided
     preloaded_messages_html = ""
+    if has_more:
+        preloaded_messages_html += """
+                <div class="message assistant load-earlier" id="loadEarlier" onclick="loadEarlierMessages()">
+                    <span class="message-content">[Load earlier messages]</span>
+                </div>
+                """
     if messages:
         for msg in messages:
             time_str = msg.get('created_at', '')
@@ -329,7 +372,7 @@ def chat_session_template(session_id: str, session_data: dict, messages: list =
             msg_class = msg.get('role', 'user')
             
             preloaded_messages_html += f"""
-                <div class="message {msg_class}">
+                <div class="message {msg_class}" data-message-id="{msg.get('message_id', '')}">
                     <span class="message-time">{time_str}:</span>
                     <span class="message-content">{content}</span>
                 </div>
@@ -351,7 +394,8 @@ def chat_session_template(session_id: str, session_data: dict, messages: list =
         created_date = created_at[:10] if len(created_at) > 10 else created_at
     else:
         created_date = "Unknown"
-    message_count = len(messages) if messages else 0
+    if message_count is None:
+        message_count = len(messages) if messages else 0
     
     additional_css = """
 .chat-container {
@@ -379,6 +423,12 @@ def chat_session_template(session_id: str, session_data: dict, messages: list =
     font-size: 14px;
 }
 
+.load-earlier {
+    cursor: pointer;
+    text-align: center;
+    color: #888888;
+}
+
 .chat-messages {
     flex: 1;
     overflow-y: auto;
@@ -615,6 +665,11 @@ async function sendMessage() {{
         }};
         
         eventSource.onerror = function(event) {{
+            // The browser reconnects with Last-Event-ID and the server replays the turn from there
+            if (eventSource.readyState === EventSource.CONNECTING) {{
+                console.warn('[DEBUG] EventSource reconnecting...', event);
+                return;
+            }}
             console.error('EventSource failed:', event);
             updateStreamingMessage('Connection error. Please try again.');
             eventSource.close();
@@ -654,6 +709,44 @@ document.addEventListener('keydown', function(e) {{
     }}
 }});
 
+// Prepend the page of messages before the oldest one shown
+async function loadEarlierMessages() {{
+    const loadEarlier = document.getElementById('loadEarlier');
+    const oldest = document.querySelector('#chatMessages [data-message-id]');
+    if (!loadEarlier || !oldest) return;
+    
+    loadEarlier.querySelector('.message-content').textContent = '[Loading...]';
+    try {{
+        const response = await fetch(`/api/sessions/${{currentSessionId}}/messages?before=${{oldest.dataset.messageId}}`);
+        const data = await response.json();
+        const chatMessages = document.getElementById('chatMessages');
+        const previousHeight = chatMessages.scrollHeight;
+        
+        (data.messages || []).forEach(msg => {{
+            const messageDiv = document.createElement('div');
+            messageDiv.className = `message ${{msg.role || 'user'}}`;
+            messageDiv.dataset.messageId = msg.message_id;
+            messageDiv.innerHTML = `
+                <span class="message-time">${{(msg.created_at || '').substring(0, 8)}}:</span>
+                <span class="message-content">${{(msg.content || '').replace(/\\n/g, '<br>')}}</span>
+            `;
+            chatMessages.insertBefore(messageDiv, oldest);
+        }});
+        
+        // Keep the messages that were on screen in place
+        chatMessages.scrollTop += chatMessages.scrollHeight - previousHeight;
+        
+        if (data.has_more) {{
+            loadEarlier.querySelector('.message-content').textContent = '[Load earlier messages]';
+        }} else {{
+            loadEarlier.remove();
+        }}
+    }} catch (error) {{
+        console.error('Error loading earlier messages:', error);
+        loadEarlier.querySelector('.message-content').textContent = '[Load earlier messages]';
+    }}
+}}
+
 // Delete session function
 function deleteSession() {{
     if (confirm('Are you sure you want to delete this entire session? This action cannot be undone.')) {{
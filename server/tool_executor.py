@@ -0,0 +1,129 @@
+"""
+Tool execution for KiloMarket agents
+Runs independent tool calls from one model turn concurrently, capped per turn, with results kept in request order
+"""
+
+import asyncio
+import importlib.util
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+# Try to import the Strands tool executor base, but handle gracefully if not available.
+# These are private Strands modules, checked against the strands-agents range pinned in requirements.txt;
+# if a release moves them the interactive agents fall back to the Strands default executor.
+ToolExecutor = object
+TypedEvent = None
+TOOL_EXECUTOR_AVAILABLE = False
+try:
+    from strands.tools.executors._executor import ToolExecutor
+    from strands.types._events import TypedEvent
+    if not hasattr(ToolExecutor, "_stream_with_trace"):
+        raise ImportError("strands ToolExecutor has no _stream_with_trace")
+    TOOL_EXECUTOR_AVAILABLE = True
+except ImportError as e:
+    if importlib.util.find_spec("strands") is not None:
+        logging.error(f"Installed strands-agents is not supported by the bounded tool executor ({e}); "
+                      f"tool calls will use the Strands default executor. Install the version in requirements.txt")
+    ToolExecutor = object
+    TypedEvent = None
+    TOOL_EXECUTOR_AVAILABLE = False
+
+from .chat_events import PAYMENT_TOOLS
+
+logger = logging.getLogger(__name__)
+
+# Maximum tool calls from one turn running at the same time (overridable per deployment)
+TOOL_CONCURRENCY = int(os.getenv("KILOMARKET_TOOL_CONCURRENCY", "4"))
+
+# Tools that change wallet, channel or faucet state run one at a time, in the order the model asked
+SERIAL_TOOLS = PAYMENT_TOOLS | {"request_yellow_faucet"}
+
+_DONE = object()
+
+
+def tool_finished_event(tool_use: Dict[str, Any], tool_results: List[Dict[str, Any]], started: float):
+    """Stream event reporting one finished tool call and how long it ran ({"tool_finished": {...}})"""
+    tool_use_id = tool_use.get("toolUseId")
+    result = next((result for result in tool_results if result.get("toolUseId") == tool_use_id), {})
+    return TypedEvent({
+        "tool_finished": {
+            "toolUseId": tool_use_id,
+            "status": result.get("status"),
+            "duration_ms": round((time.monotonic() - started) * 1000, 1)
+        }
+    })
+
+
+class BoundedConcurrentToolExecutor(ToolExecutor):
+    """Runs a turn's tool calls concurrently up to a cap; state-changing tools stay sequential"""
+
+    def __init__(self, max_concurrency: int = TOOL_CONCURRENCY):
+        super().__init__()
+        self.max_concurrency = max(1, max_concurrency)
+
+    async def _execute(self, agent: Any, tool_uses: List[Dict[str, Any]], tool_results: List[Dict[str, Any]],
+                       *args, **kwargs):
+        if len(tool_uses) <= 1:
+            for tool_use in tool_uses:
+                started = time.monotonic()
+                async for event in ToolExecutor._stream_with_trace(agent, tool_use, tool_results, *args, **kwargs):
+                    yield event
+                yield tool_finished_event(tool_use, tool_results, started)
+            return
+
+        slots = asyncio.Semaphore(self.max_concurrency)
+        # asyncio.Lock wakes waiters in FIFO order, so serial tools keep the model's ordering
+        serial_lock = asyncio.Lock()
+        events: asyncio.Queue = asyncio.Queue()
+
+        async def run(tool_use: Dict[str, Any]):
+            try:
+                if tool_use.get("name") in SERIAL_TOOLS:
+                    async with serial_lock, slots:
+                        await forward(tool_use)
+                else:
+                    async with slots:
+                        await forward(tool_use)
+            finally:
+                events.put_nowait(_DONE)
+
+        async def forward(tool_use: Dict[str, Any]):
+            # Timed from when the call gets its slot, so queued calls do not count their wait
+            started = time.monotonic()
+            async for event in ToolExecutor._stream_with_trace(agent, tool_use, tool_results, *args, **kwargs):
+                await events.put(event)
+            await events.put(tool_finished_event(tool_use, tool_results, started))
+
+        tasks = [asyncio.create_task(run(tool_use)) for tool_use in tool_uses]
+        remaining = len(tasks)
+        try:
+            while remaining:
+                event = await events.get()
+                if event is _DONE:
+                    remaining -= 1
+                    continue
+                yield event
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            # Surface the first tool failure that escaped the Strands error handling
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            raise errors[0]
+
+        # Results arrive in completion order; the model gets them in the order it asked
+        order = {tool_use.get("toolUseId"): index for index, tool_use in enumerate(tool_uses)}
+        tool_results.sort(key=lambda result: order.get(result.get("toolUseId"), len(order)))
+        logger.debug(f"Ran {len(tool_uses)} tool calls with concurrency {self.max_concurrency}")
+
+
+def create_tool_executor(max_concurrency: int = TOOL_CONCURRENCY) -> Optional[Any]:
+    """Tool executor for interactive agents (None falls back to the Strands default)"""
+    if not TOOL_EXECUTOR_AVAILABLE:
+        return None
+    return BoundedConcurrentToolExecutor(max_concurrency)